@@ -1,19 +1,91 @@
+import os
 from flask import Flask
 from config import Config
-from app.extensions import db, cors, jwt
+from app.extensions import db, cors, jwt, migrate, engine_options, replica_binds, StartupTimer
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
 
 def create_app(config_class=Config):
+    timer = StartupTimer()
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # jsonify through orjson when installed, stdlib json otherwise
+    from app.serializers import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
     # Initialize extensions
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    # Schema migrations (Alembic): flask --app run db upgrade
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
     # CORS: Allow requests from frontend (localhost:5173 and 127.0.0.1:5173)
     cors.init_app(app, resources={r"/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}})
     jwt.init_app(app)
+    timer.lap('core')
 
     # Import models
     from app import models
+    timer.lap('models')
+
+    # SQLite: WAL + pragmas on connect, group-committed writes through one writer thread
+    from app.sqlite import sqlite_tuning, write_queue
+    sqlite_tuning.init_app(app)
+    write_queue.init_app(app)
+
+    # Read-only views on DATABASE_REPLICA_URLS, sticky to the primary after a write
+    from app.replicas import replicas
+    replicas.init_app(app)
+
+    # Batch cart mutations, optionally buffered in memory/Redis and written back
+    from app.carts import cart_store
+    cart_store.init_app(app)
+
+    # Persistent background jobs (retries, backoff, dead-letter) run by worker threads
+    from app.jobs import jobs
+    jobs.init_app(app)
+
+    # pbkdf2 on a worker process pool + admission control for login/register
+    from app.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    # Cached token -> user resolution behind flask_jwt_extended.current_user
+    from app.identity import identity_cache
+    identity_cache.init_app(app)
+
+    # Product search index (FTS5 on SQLite, in-memory fallback otherwise)
+    from app.search import search
+    search.init_app(app)
+
+    # Versioned response cache for the read-only catalog endpoints
+    from app.cache import catalog_cache
+    catalog_cache.init_app(app)
+
+    # gzip/brotli by Accept-Encoding for JSON bodies over COMPRESS_MIN_SIZE
+    from app.compression import compression
+    compression.init_app(app)
+
+    # Versioned catalog change log: /products/changes deltas and the SSE stream
+    from app.changes import catalog_changes
+    catalog_changes.init_app(app)
+
+    # Frequently-bought-together tables, updated per checkout by a background job
+    from app.recommendations import recommendations
+    recommendations.init_app(app)
+
+    # Per-request SQL/timing instrumentation, Server-Timing headers and /metrics
+    from app.metrics import metrics
+    metrics.init_app(app)
+
+    # Local product images: originals + thumbnails on disk, served with sendfile
+    from app.images import images
+    images.init_app(app)
+
+    # Catalog snapshot, pool and cache warm-up (started by gunicorn.conf.py / run.py)
+    from app.warmup import warmup
+    warmup.init_app(app)
+    timer.lap('extensions')
 
     # Register blueprints
     from app.routes.main import bp as main_bp
@@ -31,4 +103,37 @@ def create_app(config_class=Config):
     from app.routes.orders import bp as orders_bp
     app.register_blueprint(orders_bp)
 
+    from app.routes.analytics import bp as analytics_bp
+    app.register_blueprint(analytics_bp)
+
+    from app.routes.images import bp as images_bp
+    app.register_blueprint(images_bp)
+
+    # CLI: flask --app run products import|export, analytics rebuild, money reconcile, jobs work|retry|purge,
+    # images ingest|fetch, catalog prune-changes, recommendations rebuild
+    from app.catalog_io import products_cli
+    app.cli.add_command(products_cli)
+
+    from app.analytics import analytics_cli
+    app.cli.add_command(analytics_cli)
+
+    from app.reconcile import money_cli
+    app.cli.add_command(money_cli)
+
+    from app.jobs import jobs_cli
+    app.cli.add_command(jobs_cli)
+
+    from app.images import images_cli
+    app.cli.add_command(images_cli)
+
+    from app.changes import catalog_cli
+    app.cli.add_command(catalog_cli)
+
+    from app.recommendations import recommendations_cli
+    app.cli.add_command(recommendations_cli)
+    timer.lap('blueprints')
+
+    from app.warmup import record_startup
+    record_startup(app, 'create_app', timer.phases)
+
     return app
@@ -0,0 +1,130 @@
+from datetime import date
+import click
+from flask.cli import AppGroup
+from sqlalchemy import cast, delete, func, insert, select
+from app.extensions import db
+from app.jobs import jobs
+from app.models import (DailyDepartmentSales, DailyProductSales, DailySales, Product,
+                        Purchase, PurchaseItem)
+
+
+def upsert_insert(model, bind=None):
+    # ON CONFLICT upserts are dialect specific in SQLAlchemy
+    dialect = (bind or db.session.get_bind()).dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT upserts are not supported on {dialect}")
+    return dialect_insert(model)
+
+
+def increment(model, keys, rows, counters=('units', 'revenue_cents')):
+    """Add each row's counters onto the rollup row with the same keys (or create it)."""
+    stmt = upsert_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={c: getattr(model, c) + stmt.excluded[c] for c in counters}
+    )
+    db.session.execute(stmt, rows)
+
+
+def record_purchase(day, lines):
+    """Fold one checkout into the daily rollups.
+
+    `lines` is a list of (product_id, department_id, quantity, price in cents).
+    Each statement is an atomic increment, so concurrent checkouts on the
+    same day never lose updates.
+    """
+    units = sum(qty for _, _, qty, _ in lines)
+    revenue = sum(qty * price for _, _, qty, price in lines)
+    increment(DailySales, ['day'], [{"day": day, "orders": 1, "units": units, "revenue_cents": revenue}],
+              counters=('orders', 'units', 'revenue_cents'))
+
+    by_dept = {}
+    for _, dept_id, qty, price in lines:
+        totals = by_dept.setdefault(dept_id, {"day": day, "department_id": dept_id, "units": 0, "revenue_cents": 0})
+        totals["units"] += qty
+        totals["revenue_cents"] += qty * price
+    increment(DailyDepartmentSales, ['day', 'department_id'], list(by_dept.values()))
+
+    increment(DailyProductSales, ['day', 'product_id'], [{
+        "day": day, "product_id": pid, "department_id": dept_id,
+        "units": qty, "revenue_cents": qty * price
+    } for pid, dept_id, qty, price in lines])
+
+
+@jobs.task('analytics.record_purchase')
+def record_purchase_job(day, lines):
+    # Enqueued by checkout in its own transaction, so every order is counted exactly once
+    record_purchase(date.fromisoformat(day), lines)
+
+
+def sale_day(column):
+    # SQLite stores dates as 'YYYY-MM-DD' text and CAST(... AS DATE) misbehaves there
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, db.Date)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from purchase history (backfill / repair); the caller commits.
+
+    Orders whose `analytics.record_purchase` job hasn't run yet are counted
+    here, so those jobs are marked done in the same transaction.
+    """
+    jobs.supersede('analytics.record_purchase')
+    day = sale_day(Purchase.timestamp)
+    line_revenue = PurchaseItem.quantity * PurchaseItem.price_at_purchase_cents
+
+    for model in (DailySales, DailyDepartmentSales, DailyProductSales):
+        db.session.execute(delete(model))
+
+    per_purchase = (
+        select(day.label('day'), Purchase.id.label('purchase_id'),
+               func.sum(PurchaseItem.quantity).label('units'),
+               func.sum(line_revenue).label('revenue'))
+        .join(PurchaseItem, PurchaseItem.purchase_id == Purchase.id)
+        .group_by(Purchase.id)
+        .subquery()
+    )
+    db.session.execute(insert(DailySales).from_select(
+        ['day', 'orders', 'units', 'revenue_cents'],
+        select(per_purchase.c.day, func.count(), func.sum(per_purchase.c.units),
+               func.sum(per_purchase.c.revenue)).group_by(per_purchase.c.day)
+    ))
+    # Historical lines use the product's current department
+    db.session.execute(insert(DailyProductSales).from_select(
+        ['day', 'product_id', 'department_id', 'units', 'revenue_cents'],
+        select(day, PurchaseItem.product_id, Product.department_id,
+               func.sum(PurchaseItem.quantity), func.sum(line_revenue))
+        .join(PurchaseItem, PurchaseItem.purchase_id == Purchase.id)
+        .join(Product, Product.id == PurchaseItem.product_id)
+        .group_by(day, PurchaseItem.product_id, Product.department_id)
+    ))
+    db.session.execute(insert(DailyDepartmentSales).from_select(
+        ['day', 'department_id', 'units', 'revenue_cents'],
+        select(DailyProductSales.day, DailyProductSales.department_id,
+               func.sum(DailyProductSales.units), func.sum(DailyProductSales.revenue_cents))
+        .group_by(DailyProductSales.day, DailyProductSales.department_id)
+    ))
+
+
+@jobs.task('analytics.rebuild')
+def rebuild_job():
+    # The queue commits the rebuild together with the job's status, if the job still holds its claim
+    rebuild_rollups()
+
+
+# --- CLI: flask --app run analytics rebuild ---
+
+analytics_cli = AppGroup('analytics', help="Sales rollup maintenance.")
+
+
+@analytics_cli.command('rebuild')
+def rebuild_command():
+    rebuild_rollups()
+    db.session.commit()
+    days = db.session.query(func.count(DailySales.day)).scalar()
+    click.echo(f"Rebuilt sales rollups for {days} days")
@@ -0,0 +1,235 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+from app.changes import catalog_changes
+from app.compression import compression
+
+
+class MemoryCache:
+    """Process-local LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        # Counters live outside the LRU so they are never evicted
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    def get_int(self, key):
+        return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Redis (or any RESP-compatible server, e.g. KeyDB/Valkey) backend.
+
+    Shared by all workers, so a version bump from one worker is seen by all.
+    """
+
+    def __init__(self, url, default_ttl=300, prefix='market:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self._client.set(self.prefix + key, value, ex=ttl or None)
+
+    def incr(self, key):
+        return self._client.incr(self.prefix + key)
+
+    def get_int(self, key):
+        value = self._client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+class LogPosition:
+    """How far a process-local cache has followed the catalog change log."""
+    __slots__ = ('version', 'checked_at', 'lock')
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+class CatalogCache:
+    """Read-through cache for catalog responses, keyed by a catalog version.
+
+    Admin writes call `bump()`, which makes every previously cached entry
+    unreachable (old keys simply age out), so reads never see stale data
+    and there is no per-key invalidation to get wrong.
+
+    With CACHE_BACKEND=memory the version is per process, so `version()`
+    also follows the catalog change log that every worker writes to: at
+    most every CATALOG_CHANGES_SYNC_INTERVAL seconds it checks the log and
+    bumps the local version if another worker changed the catalog.
+    """
+
+    VERSION_KEY = 'catalog:version'
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'redis':
+            store = RedisCache(app.config['CACHE_REDIS_URL'], app.config['CACHE_DEFAULT_TTL'])
+        elif backend == 'memory':
+            store = MemoryCache(app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_DEFAULT_TTL'])
+        elif backend == 'null':
+            store = None
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+        app.extensions['catalog_cache'] = store
+        app.extensions['catalog_cache_log'] = LogPosition() if backend == 'memory' else None
+
+    @property
+    def store(self):
+        return current_app.extensions['catalog_cache']
+
+    def version(self):
+        store = self.store
+        if store is None:
+            return 0
+        position = current_app.extensions['catalog_cache_log']
+        if position is not None:
+            self._follow_log(store, position)
+        return store.get_int(self.VERSION_KEY)
+
+    def _follow_log(self, store, position):
+        now = time.monotonic()
+        if now - position.checked_at < current_app.config['CATALOG_CHANGES_SYNC_INTERVAL']:
+            return
+        # One thread checks; the others use the version as it stands
+        if not position.lock.acquire(blocking=False):
+            return
+        try:
+            position.checked_at = now
+            latest = catalog_changes.latest(position.version) if position.version is not None else None
+            if latest is None:
+                # First check, or the log was pruned past us
+                latest = catalog_changes.latest(catalog_changes.current_version()) or 0
+            if latest != position.version:
+                if position.version is not None:
+                    store.incr(self.VERSION_KEY)
+                position.version = latest
+        finally:
+            position.lock.release()
+
+    def bump(self):
+        store = self.store
+        if store is None:
+            return
+        position = current_app.extensions['catalog_cache_log']
+        if position is not None and position.version is not None:
+            # Read the log before bumping: the bump covers every change up to there, this
+            # write's own included, so finding them later must not bump (and rebuild) again
+            with position.lock:
+                latest = catalog_changes.latest(position.version)
+                if latest is not None:
+                    position.version = latest
+        store.incr(self.VERSION_KEY)
+
+    def cached(self, ttl=None):
+        """Cache a GET view's 200 responses and answer If-None-Match with 304."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                store = self.store
+                if store is None:
+                    response = self._with_etag(make_response(fn(*args, **kwargs)))
+                    return response.make_conditional(request)
+
+                # Sorted args so ?a=1&b=2 and ?b=2&a=1 share an entry
+                args_key = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+                key = f'catalog:v{self.version()}:{request.path}?{args_key}'
+                packed = store.get(key)
+                if packed is not None:
+                    etag, mimetype, body = packed.split(b'\n', 2)
+                    response = current_app.response_class(body, mimetype=mimetype.decode())
+                    response.set_etag(etag.decode())
+                    return self._compressed(response.make_conditional(request), key, ttl)
+
+                response = self._with_etag(make_response(fn(*args, **kwargs)))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    store.set(key, b'\n'.join([response.get_etag()[0].encode(),
+                                               response.mimetype.encode(),
+                                               response.get_data()]), ttl)
+                return self._compressed(response.make_conditional(request), key, ttl)
+            return wrapper
+        return decorator
+
+    def _compressed(self, response, key, ttl):
+        # Encoded bodies are cached under the plain entry's key + encoding, so unchanged
+        # catalog responses are compressed once per version, not once per request
+        encoding = compression.negotiate(response)
+        if encoding is None:
+            return response
+        store = self.store
+        body = store.get(f'{key}:{encoding}')
+        if body is None:
+            body = compression.encode(response.get_data(), encoding)
+            store.set(f'{key}:{encoding}', body, ttl)
+        compression.apply(response, body, encoding)
+        return response
+
+    @staticmethod
+    def _with_etag(response):
+        # Strong ETag from the body, so identical catalogs share a tag across versions
+        if response.status_code == 200 and not response.direct_passthrough:
+            response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+        return response
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,285 @@
+import atexit
+import json
+import os
+import threading
+import time
+from itertools import chain
+from flask import current_app
+from sqlalchemy import case, delete, func, or_, select
+from app.analytics import upsert_insert
+from app.extensions import db
+from app.models import CartItem, Product
+from app.money import from_cents
+from app.sqlite import write_queue
+
+MAX_OPERATIONS = 200
+
+
+class CartError(ValueError):
+    pass
+
+
+def parse_operations(items):
+    """Validate a PATCH /cart body into a list of (op, product_id, quantity).
+
+    `add` adds `quantity` (default 1, may be negative), `set` replaces the
+    quantity and `remove` is `set` to 0; anything that ends at <= 0 is
+    dropped from the cart.
+    """
+    if not isinstance(items, list) or not items:
+        raise CartError("operations must be a non-empty list")
+    if len(items) > MAX_OPERATIONS:
+        raise CartError(f"At most {MAX_OPERATIONS} operations per request")
+    ops = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise CartError(f"operations[{i}] must be an object")
+        try:
+            ops.append(parse_operation(item))
+        except CartError as e:
+            raise CartError(f"operations[{i}]: {e}") from None
+    return ops
+
+
+def parse_operation(item):
+    """Validate one operation object into (op, product_id, quantity)."""
+    op = item.get('op')
+    product_id = item.get('product_id')
+    quantity = item.get('quantity', 1 if op == 'add' else None)
+    if op not in ('add', 'set', 'remove'):
+        raise CartError("op must be add, set or remove")
+    if not isinstance(product_id, int) or isinstance(product_id, bool):
+        raise CartError("product_id must be an integer")
+    if op == 'remove':
+        return 'set', product_id, 0
+    return op, product_id, parse_quantity(quantity, minimum=0 if op == 'set' else None)
+
+
+def parse_quantity(value, minimum=None):
+    """`value` as a quantity: an integer (not a bool), at least `minimum` if given."""
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise CartError("quantity must be an integer")
+    if minimum is not None and value < minimum:
+        raise CartError(f"quantity must be at least {minimum}")
+    return value
+
+
+def missing_products(ops):
+    ids = {product_id for _, product_id, _ in ops}
+    found = db.session.execute(select(Product.id).where(Product.id.in_(ids))).scalars()
+    return sorted(ids - set(found))
+
+
+def fold(ops):
+    """Collapse operations, in order, into absolute quantities and deltas per product."""
+    absolute, delta = {}, {}
+    for op, product_id, quantity in ops:
+        if op == 'set':
+            absolute[product_id] = quantity
+            delta.pop(product_id, None)
+        elif product_id in absolute:
+            absolute[product_id] += quantity
+        else:
+            delta[product_id] = delta.get(product_id, 0) + quantity
+    return absolute, delta
+
+
+def apply_operations(conn, user_id, ops):
+    """Apply cart operations with one upsert (plus one cleanup delete). A write_queue job."""
+    absolute, delta = fold(ops)
+    rows = [{"user_id": user_id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in chain(absolute.items(), delta.items())
+            if product_id not in absolute or quantity > 0]
+    if rows:
+        stmt = upsert_insert(CartItem, conn)
+        quantity = CartItem.quantity + stmt.excluded.quantity
+        if absolute:
+            quantity = case((CartItem.product_id.in_(list(absolute)), stmt.excluded.quantity), else_=quantity)
+        conn.execute(stmt.values(rows).on_conflict_do_update(
+            index_elements=['user_id', 'product_id'], set_={"quantity": quantity}
+        ))
+    removed = [product_id for product_id, quantity in absolute.items() if quantity <= 0]
+    conn.execute(delete(CartItem).where(
+        CartItem.user_id == user_id,
+        or_(CartItem.product_id.in_(removed), CartItem.quantity <= 0)
+    ))
+
+
+def cart_summary(user_id):
+    """Line count, units and total price of a cart, computed by the database."""
+    lines, units, total = db.session.execute(
+        select(func.count(CartItem.id),
+               func.coalesce(func.sum(CartItem.quantity), 0),
+               func.coalesce(func.sum(Product.price_cents * CartItem.quantity), 0))
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+    ).one()
+    return {"lines": lines, "units": units, "total": from_cents(total)}
+
+
+class MemoryCartBuffer:
+    """Pending cart operations per user, in this process only (single worker)."""
+
+    def __init__(self):
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def push(self, user_id, ops):
+        with self._lock:
+            self._ops.setdefault(user_id, []).extend(ops)
+
+    def restore(self, user_id, ops):
+        # Put operations that failed to apply back in front of newer ones
+        with self._lock:
+            self._ops[user_id] = ops + self._ops.get(user_id, [])
+
+    def take(self, user_id):
+        with self._lock:
+            return self._ops.pop(user_id, [])
+
+    def users(self):
+        with self._lock:
+            return list(self._ops)
+
+
+class RedisCartBuffer:
+    """Pending cart operations per user in Redis, shared by all workers."""
+
+    def __init__(self, url, prefix='market:cart:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CART_STORE=redis requires the 'redis' package")
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.users_key = prefix + 'pending'
+
+    def _key(self, user_id):
+        return f'{self.prefix}{user_id}'
+
+    def push(self, user_id, ops):
+        pipe = self._client.pipeline()
+        pipe.rpush(self._key(user_id), *(json.dumps(op) for op in ops))
+        pipe.sadd(self.users_key, user_id)
+        pipe.execute()
+
+    def restore(self, user_id, ops):
+        pipe = self._client.pipeline()
+        pipe.lpush(self._key(user_id), *(json.dumps(op) for op in reversed(ops)))
+        pipe.sadd(self.users_key, user_id)
+        pipe.execute()
+
+    def take(self, user_id):
+        # MULTI/EXEC: read and clear atomically so no pushed operation is lost or applied twice
+        pipe = self._client.pipeline()
+        pipe.lrange(self._key(user_id), 0, -1)
+        pipe.delete(self._key(user_id))
+        pipe.srem(self.users_key, user_id)
+        raw, _, _ = pipe.execute()
+        return [tuple(json.loads(op)) for op in raw]
+
+    def users(self):
+        return [int(user_id) for user_id in self._client.smembers(self.users_key)]
+
+
+class CartStore:
+    """Applies cart operations, optionally buffering add-to-cart clicks (write-behind).
+
+    With CART_STORE=db every operation is written straight away (through
+    the write queue). With CART_STORE=memory (single worker) or redis,
+    `buffer()` only records the operation; a user's pending operations are
+    written back to CartItem in one upsert the next time their cart is read
+    or checked out, or by a background thread every CART_WRITEBACK_INTERVAL
+    seconds, so a shopper adding ten products costs one database write.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pid = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CART_STORE', 'db')
+        app.config.setdefault('CART_REDIS_URL', app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        app.config.setdefault('CART_WRITEBACK_INTERVAL', 5.0)
+
+        backend = app.config['CART_STORE']
+        if backend == 'memory':
+            pending = MemoryCartBuffer()
+        elif backend == 'redis':
+            pending = RedisCartBuffer(app.config['CART_REDIS_URL'])
+        elif backend == 'db':
+            pending = None
+        else:
+            raise ValueError(f"Unknown CART_STORE: {backend}")
+        app.extensions['cart_store'] = pending
+
+    @property
+    def pending(self):
+        return current_app.extensions['cart_store']
+
+    def apply(self, user_id, ops):
+        """Write any pending operations plus `ops` now."""
+        user_id = int(user_id)
+        pending = self.pending
+        earlier = pending.take(user_id) if pending is not None else []
+        if not earlier and not ops:
+            return
+        try:
+            write_queue.submit(apply_operations, user_id, earlier + ops)
+        except Exception:
+            if earlier:
+                pending.restore(user_id, earlier)
+            raise
+
+    def buffer(self, user_id, ops):
+        """Record operations to be written back later (immediately with CART_STORE=db)."""
+        pending = self.pending
+        if pending is None:
+            return self.apply(user_id, ops)
+        self._ensure_writeback()
+        pending.push(int(user_id), ops)
+
+    def flush(self, user_id):
+        """Write back a user's pending operations before their cart is read."""
+        if self.pending is not None:
+            self.apply(user_id, [])
+
+    def discard(self, user_id):
+        if self.pending is not None:
+            self.pending.take(int(user_id))
+
+    def flush_all(self):
+        pending = self.pending
+        if pending is None:
+            return
+        for user_id in pending.users():
+            try:
+                self.apply(user_id, [])
+            except Exception:
+                current_app.logger.exception("Cart write-back failed for user %s", user_id)
+
+    def _ensure_writeback(self):
+        # Threads don't survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                app = current_app._get_current_object()
+                threading.Thread(target=self._writeback_loop, args=(app,),
+                                 name='cart-writeback', daemon=True).start()
+                atexit.register(self._flush_app, app)
+                self._pid = os.getpid()
+
+    def _writeback_loop(self, app):
+        while True:
+            time.sleep(app.config['CART_WRITEBACK_INTERVAL'])
+            self._flush_app(app)
+
+    def _flush_app(self, app):
+        with app.app_context():
+            self.flush_all()
+
+
+cart_store = CartStore()
@@ -0,0 +1,282 @@
+import csv
+import io
+import json
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from app.extensions import db
+from app.models import Department, Product
+from app.search import search
+from app.cache import catalog_cache
+from app.changes import catalog_changes
+from app.money import from_cents, to_cents
+
+FORMATS = ('csv', 'ndjson')
+EXPORT_COLUMNS = ['id', 'name', 'price', 'department_id', 'department', 'image_url', 'stock']
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def detect_format(fmt, content_type=None, filename=None):
+    if fmt:
+        return fmt if fmt in FORMATS else None
+    if content_type and 'json' in content_type:
+        return 'ndjson'
+    if filename and filename.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict) from a binary stream without reading it all."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            # Bad JSON becomes a row-level error instead of aborting the import
+            yield line_num, row if isinstance(row, dict) else {'__invalid__': True}
+
+
+def blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_row(row, departments):
+    if row.get('__invalid__'):
+        raise ValueError("Invalid JSON object")
+
+    values = {}
+    if not blank(row.get('id')):
+        try:
+            values['id'] = int(row['id'])
+        except (TypeError, ValueError):
+            raise ValueError("id must be an integer")
+
+    name = row.get('name')
+    if blank(name):
+        raise ValueError("name is required")
+    name = str(name).strip()
+    if len(name) > 100:
+        raise ValueError("name is longer than 100 characters")
+    values['name'] = name
+
+    try:
+        price = to_cents(row.get('price'))
+    except ValueError:
+        raise ValueError("price must be a number")
+    if price < 0:
+        raise ValueError("price must not be negative")
+    values['price_cents'] = price
+
+    # Department by id or by name, checked against the preloaded map
+    if not blank(row.get('department_id')):
+        try:
+            dept_id = int(row['department_id'])
+        except (TypeError, ValueError):
+            raise ValueError("department_id must be an integer")
+        if dept_id not in departments.values():
+            raise ValueError(f"Unknown department_id {dept_id}")
+    elif not blank(row.get('department')):
+        dept_id = departments.get(str(row['department']).strip())
+        if dept_id is None:
+            raise ValueError(f"Unknown department '{row['department']}'")
+    else:
+        raise ValueError("department or department_id is required")
+    values['department_id'] = dept_id
+
+    # Optional columns are only touched when the feed has them
+    if 'image_url' in row:
+        values['image_url'] = None if blank(row['image_url']) else str(row['image_url']).strip()
+
+    if 'stock' in row:
+        if blank(row['stock']):
+            values['stock'] = None
+        else:
+            try:
+                values['stock'] = int(row['stock'])
+            except (TypeError, ValueError):
+                raise ValueError("stock must be an integer")
+            if values['stock'] < 0:
+                raise ValueError("stock must not be negative")
+    return values
+
+
+def import_chunk(chunk, departments, names):
+    """Validate and upsert one chunk; returns a progress dict.
+
+    Rows with an `id` update that product; rows without one are matched by
+    name (like seed.py does), otherwise inserted.
+    """
+    errors = []
+    parsed = []
+    for line, row in chunk:
+        try:
+            parsed.append((line, parse_row(row, departments)))
+        except ValueError as e:
+            errors.append({"line": line, "message": str(e)})
+
+    wanted_ids = {v['id'] for _, v in parsed if 'id' in v}
+    existing = set(db.session.execute(
+        select(Product.id).where(Product.id.in_(wanted_ids))
+    ).scalars()) if wanted_ids else set()
+
+    inserts = {}
+    updates = {}
+    for line, values in parsed:
+        product_id = values.pop('id', None)
+        if product_id is not None and product_id not in existing:
+            errors.append({"line": line, "message": f"Unknown product id {product_id}"})
+            continue
+        if product_id is None:
+            product_id = names.get(values['name'])
+        if product_id is None:
+            # Last row wins for a name repeated within the chunk
+            inserts[values['name']] = dict({'image_url': None, 'stock': None}, **values)
+        else:
+            updates[product_id] = dict(values, id=product_id)
+
+    created = []
+    try:
+        if updates:
+            db.session.execute(update(Product), list(updates.values()))
+            catalog_changes.record('product', 'updated', updates)
+        if inserts:
+            created = db.session.execute(
+                insert(Product).returning(Product.id, Product.name), list(inserts.values())
+            ).all()
+            catalog_changes.record('product', 'created', [product_id for product_id, _ in created])
+        db.session.commit()
+    except SQLAlchemyError as e:
+        # Nothing of this chunk was saved; roll back so the next chunks can still run
+        db.session.rollback()
+        current_app.logger.exception("Product import chunk failed")
+        errors.append({"line": chunk[0][0], "message": f"Chunk not imported: {getattr(e, 'orig', None) or e}"})
+        return {"rows": len(chunk), "inserted": 0, "updated": 0, "errors": errors}
+    names.update((name, product_id) for product_id, name in created)
+
+    return {
+        "rows": len(chunk),
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "errors": errors
+    }
+
+
+def import_products(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Import an iterable of (line, row) in chunks, yielding progress per chunk.
+
+    The last item yielded is a summary with `done: true`.
+    """
+    departments = dict(db.session.execute(select(Department.name, Department.id)).all())
+    names = {}
+    for product_id, name in db.session.execute(select(Product.id, Product.name)).yield_per(10000):
+        names.setdefault(name, product_id)
+
+    totals = {"rows": 0, "inserted": 0, "updated": 0, "errors": 0}
+    chunk = []
+    chunk_no = 0
+
+    def flush():
+        nonlocal chunk, chunk_no
+        chunk_no += 1
+        progress = import_chunk(chunk, departments, names)
+        chunk = []
+        for key in ('rows', 'inserted', 'updated'):
+            totals[key] += progress[key]
+        totals['errors'] += len(progress['errors'])
+        return dict(progress, chunk=chunk_no)
+
+    try:
+        for item in rows:
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield flush()
+        if chunk:
+            yield flush()
+    finally:
+        if totals['inserted'] or totals['updated']:
+            # One full rebuild is far cheaper than per-row index updates here
+            search.rebuild()
+            catalog_cache.bump()
+
+    yield dict(totals, done=True, chunks=chunk_no)
+
+
+def export_products(fmt):
+    """Yield the catalog as CSV or NDJSON text, a batch of rows at a time.
+
+    Uses a streaming (server-side) cursor so the catalog is never held in
+    memory as a whole.
+    """
+    query = (
+        select(Product.id, Product.name, Product.price_cents, Product.department_id,
+               Department.name, Product.image_url, Product.stock)
+        .join(Department, Department.id == Product.department_id)
+        .order_by(Product.id)
+        .execution_options(stream_results=True, yield_per=DEFAULT_CHUNK_SIZE)
+    )
+    result = db.session.execute(query)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+
+    for rows in result.partitions():
+        for row in rows:
+            row = (row[0], row[1], from_cents(row[2]), *row[3:])
+            if writer:
+                writer.writerow(['' if v is None else v for v in row])
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))))
+                buffer.write('\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# --- CLI: flask --app run products import|export ---
+
+products_cli = AppGroup('products', help="Bulk product import/export.")
+
+
+@products_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None,
+              help="Defaults to the file extension (.ndjson/.jsonl) or csv.")
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True)
+def import_command(path, fmt, chunk_size):
+    fmt = detect_format(fmt, filename=path)
+    with open(path, 'rb') as f:
+        for progress in import_products(read_rows(f, fmt), chunk_size):
+            if progress.get('done'):
+                click.echo(f"Done: {progress['rows']} rows, {progress['inserted']} inserted, "
+                           f"{progress['updated']} updated, {progress['errors']} errors")
+                continue
+            click.echo(f"Chunk {progress['chunk']}: {progress['rows']} rows, "
+                       f"{progress['inserted']} inserted, {progress['updated']} updated")
+            for error in progress['errors']:
+                click.echo(f"  line {error['line']}: {error['message']}", err=True)
+
+
+@products_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default=None)
+def export_command(path, fmt):
+    fmt = detect_format(fmt, filename=path)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for part in export_products(fmt):
+            f.write(part)
+    click.echo(f"Exported catalog to {path}")
@@ -0,0 +1,327 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+from app.extensions import db, primary_reads
+from app.models import CatalogChange, Department, Product
+from app.serializers import DEPARTMENT, PRODUCT
+
+# Entity name -> (model, response schema of its `data`)
+ENTITIES = {'product': (Product, PRODUCT), 'department': (Department, DEPARTMENT)}
+ACTIONS = ('created', 'updated', 'deleted')
+
+
+class Change:
+    """One catalog change as sent to clients, with the entity's current data (None once deleted)."""
+    __slots__ = ('version', 'type', 'action', 'id', 'data', 'sse')
+
+    def __init__(self, version, type, action, id, data):
+        self.version = version
+        self.type = type
+        self.action = action
+        self.id = id
+        self.data = data
+        # Rendered once, then written to every subscriber as is
+        self.sse = f'id: {version}\ndata: {current_app.json.dumps(self.to_dict())}\n\n'
+
+    def to_dict(self):
+        return {"version": self.version, "type": self.type, "action": self.action, "id": self.id, "data": self.data}
+
+
+class CatalogChanges:
+    """A versioned log of product and department changes, for clients that keep a local catalog.
+
+    Admin writes call `record(entity, action, ids)` before committing, so a
+    change is logged exactly when it happens; the row id is the catalog
+    change version. Clients catch up with GET /products/changes?since=<v>
+    or follow GET /products/changes/stream (Server-Sent Events). Each
+    change carries the entity's current data, and repeated changes to one
+    entity within a read collapse into the latest.
+
+    On PostgreSQL ids can commit out of order. A read stops at a missing
+    version until it is CATALOG_CHANGES_GAP_SECONDS old (then it was rolled
+    back), so a client never skips past a change that is still committing.
+    Rows older than CATALOG_CHANGES_RETENTION_DAYS are deleted by
+    `flask --app run catalog prune-changes`; a client that was behind
+    that is told to reload (410 / `reset` event).
+
+    The log is always read from the primary, also in views that read from
+    a replica: a lagging replica would look pruned past a version this
+    process has already seen, and serve data older than the version.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_CHANGES_RETENTION_DAYS', 7)
+        app.config.setdefault('CATALOG_CHANGES_GAP_SECONDS', 5.0)
+        app.config.setdefault('CATALOG_CHANGES_PAGE_SIZE', 500)
+        # How often per-process copies of the catalog (warm-up snapshot, Python search index) check the log
+        app.config.setdefault('CATALOG_CHANGES_SYNC_INTERVAL', 1.0)
+        app.config.setdefault('CATALOG_STREAM_POLL_INTERVAL', 1.0)
+        app.config.setdefault('CATALOG_STREAM_HEARTBEAT', 15.0)
+        # Streams end after this long and the browser reconnects with Last-Event-ID, freeing the thread
+        app.config.setdefault('CATALOG_STREAM_MAX_SECONDS', 300.0)
+        # Each open stream holds a server thread; past this many per process clients get 503 and poll
+        app.config.setdefault('CATALOG_STREAM_MAX_CLIENTS', 2)
+        app.extensions['catalog_feed'] = ChangeFeed(self, app)
+        if not event.contains(Session, 'after_commit', _wake_feed):
+            event.listen(Session, 'after_commit', _wake_feed)
+
+    @property
+    def feed(self):
+        return current_app.extensions['catalog_feed']
+
+    def record(self, entity, action, ids):
+        """Log a change to the current session; it is published when the session commits."""
+        if entity not in ENTITIES or action not in ACTIONS:
+            raise ValueError(f"Unknown catalog change: {entity} {action}")
+        ids = list(ids)
+        if not ids:
+            return
+        now = datetime.utcnow()
+        db.session.execute(insert(CatalogChange), [
+            {"entity": entity, "entity_id": entity_id, "action": action, "created_at": now} for entity_id in ids
+        ])
+        db.session.info['catalog_changed'] = True
+
+    # --- Reading the log ---
+
+    def current_version(self):
+        """A version to start following from; at worst a few seconds early, never late."""
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['CATALOG_CHANGES_GAP_SECONDS'])
+        with primary_reads():
+            settled = db.session.execute(
+                select(func.max(CatalogChange.id)).where(CatalogChange.created_at <= cutoff)
+            ).scalar()
+            if settled is not None:
+                return settled
+            oldest = db.session.execute(select(func.min(CatalogChange.id))).scalar()
+        return oldest - 1 if oldest is not None else 0
+
+    @staticmethod
+    def in_log(since):
+        """Whether the log still has every change after version `since`."""
+        # Separate subqueries: SQLite only answers a lone min() or max() from the index
+        with primary_reads():
+            oldest, newest = db.session.execute(select(
+                select(func.min(CatalogChange.id)).scalar_subquery(),
+                select(func.max(CatalogChange.id)).scalar_subquery(),
+            )).one()
+        if oldest is None:
+            return since == 0
+        return oldest - 1 <= since <= newest
+
+    @staticmethod
+    def settled(rows, since):
+        """The leading `rows` (ordered by id, after `since`) that no uncommitted change can precede."""
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['CATALOG_CHANGES_GAP_SECONDS'])
+        accepted = []
+        expected = since + 1
+        for row in rows:
+            # The missing version was allocated before this row; give it until this row is old enough
+            if row.id != expected and row.created_at > cutoff:
+                break
+            accepted.append(row)
+            expected = row.id + 1
+        return accepted
+
+    def latest(self, since):
+        """The newest version from `since` on that has every change before it committed.
+
+        Reads ids only; None if `since` is no longer in the log.
+        """
+        if not self.in_log(since):
+            return None
+        page = current_app.config['CATALOG_CHANGES_PAGE_SIZE']
+        while True:
+            with primary_reads():
+                rows = db.session.execute(
+                    select(CatalogChange.id, CatalogChange.created_at)
+                    .where(CatalogChange.id > since).order_by(CatalogChange.id).limit(page)
+                ).all()
+            accepted = self.settled(rows, since)
+            if accepted:
+                since = accepted[-1].id
+            if len(accepted) < page:
+                return since
+
+    def read(self, since, limit=None):
+        """(changes, version to continue from, has_more), or None if `since` is no longer in the log."""
+        with primary_reads():
+            return self._read(since, limit)
+
+    def _read(self, since, limit):
+        limit = limit or current_app.config['CATALOG_CHANGES_PAGE_SIZE']
+        if not self.in_log(since):
+            return None
+
+        rows = db.session.execute(
+            select(CatalogChange.id, CatalogChange.entity, CatalogChange.entity_id,
+                   CatalogChange.action, CatalogChange.created_at)
+            .where(CatalogChange.id > since).order_by(CatalogChange.id).limit(limit)
+        ).all()
+        accepted = self.settled(rows, since)
+        if not accepted:
+            return [], since, False
+
+        # Latest change per entity, in version order
+        latest = {}
+        for row in accepted:
+            latest.pop((row.entity, row.entity_id), None)
+            latest[(row.entity, row.entity_id)] = row
+        current = {}
+        for entity, (model, schema) in ENTITIES.items():
+            ids = [entity_id for (kind, entity_id), row in latest.items()
+                   if kind == entity and row.action != 'deleted']
+            if ids:
+                found = db.session.execute(schema.select().where(model.id.in_(ids)))
+                current[entity] = {item['id']: item for item in schema.dump_rows(found)}
+        changes = []
+        for (entity, entity_id), row in latest.items():
+            data = current.get(entity, {}).get(entity_id)
+            # Gone by now: a later delete is on its way, report it already
+            action = row.action if data is not None else 'deleted'
+            changes.append(Change(row.id, entity, action, entity_id, data))
+        return changes, accepted[-1].id, len(accepted) == len(rows) == limit
+
+    def stream(self, since):
+        """Server-Sent Events from `since` on: one `data:` event per change, `reset` if too far behind."""
+        config = current_app.config
+        feed = self.feed
+        feed.ensure_started()
+        deadline = time.monotonic() + config['CATALOG_STREAM_MAX_SECONDS']
+        # Browsers reconnect after this many ms, resuming from the last event id
+        yield 'retry: 3000\n\n'
+        last = since
+        while time.monotonic() < deadline:
+            changes = feed.wait(last, config['CATALOG_STREAM_HEARTBEAT'])
+            if changes is None:
+                # Further behind than this process keeps in memory: read the log itself
+                result = self.read(last)
+                db.session.close()
+                if result is None:
+                    yield 'event: reset\ndata: {}\n\n'
+                    return
+                changes, last, _ = result
+            if changes:
+                last = max(last, changes[-1].version)
+                yield ''.join(change.sse for change in changes)
+            else:
+                yield ': keep-alive\n\n'
+
+    def prune(self, days=None):
+        days = current_app.config['CATALOG_CHANGES_RETENTION_DAYS'] if days is None else days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        newest = db.session.execute(select(func.max(CatalogChange.id))).scalar()
+        if newest is None:
+            return 0
+        # The newest row stays, so versions keep counting from it
+        count = db.session.execute(
+            delete(CatalogChange).where(CatalogChange.created_at < cutoff, CatalogChange.id < newest)
+        ).rowcount
+        db.session.commit()
+        return count
+
+
+class ChangeFeed:
+    """Recent catalog changes in this process, for its SSE streams.
+
+    One thread polls the log every CATALOG_STREAM_POLL_INTERVAL seconds (at
+    once after a local commit) and keeps the last changes in memory, so any
+    number of open streams cost one query per interval, not one each.
+    """
+
+    BUFFER_SIZE = 1000
+
+    def __init__(self, changes, app):
+        self.changes = changes
+        self.app = app
+        self.cond = threading.Condition()
+        self.wake = threading.Event()
+        self.events = deque()
+        self.floor = 0  # the buffer holds every change after this version
+        self.version = 0
+        self.slots = threading.BoundedSemaphore(app.config['CATALOG_STREAM_MAX_CLIENTS'])
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads don't survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                version = self.changes.current_version()
+                db.session.close()
+                with self.cond:
+                    self.events.clear()
+                    self.floor = self.version = version
+                self.wake = threading.Event()
+                threading.Thread(target=self._poll, name='catalog-feed', daemon=True).start()
+                self._pid = os.getpid()
+
+    def wait(self, after, timeout):
+        """Buffered changes after version `after` (waiting up to `timeout` for one), or None if not buffered."""
+        with self.cond:
+            if after < self.floor:
+                return None
+            if self.version <= after:
+                self.cond.wait(timeout)
+            return [change for change in self.events if change.version > after]
+
+    def _poll(self):
+        app = self.app
+        while True:
+            self.wake.wait(app.config['CATALOG_STREAM_POLL_INTERVAL'])
+            self.wake.clear()
+            try:
+                with app.app_context():
+                    result = self.changes.read(self.version)
+                    if result is None:
+                        # The log was reset under us (restored database): start over from its head
+                        result = [], self.changes.current_version(), False
+                    changes, version, has_more = result
+            except Exception:
+                app.logger.exception("Catalog change feed poll failed")
+                continue
+            if version == self.version:
+                continue
+            with self.cond:
+                self.events.extend(changes)
+                while len(self.events) > self.BUFFER_SIZE:
+                    self.floor = self.events.popleft().version
+                if not changes:
+                    self.floor = version
+                self.version = version
+                self.cond.notify_all()
+            if has_more:
+                self.wake.set()
+
+
+def _wake_feed(session):
+    if session.info.pop('catalog_changed', False) and has_app_context():
+        catalog_changes.feed.wake.set()
+
+
+catalog_changes = CatalogChanges()
+
+
+# --- CLI: flask --app run catalog prune-changes ---
+
+catalog_cli = AppGroup('catalog', help="Catalog change log.")
+
+
+@catalog_cli.command('prune-changes')
+@click.option('--days', type=int, default=None, help="Keep this many days (default CATALOG_CHANGES_RETENTION_DAYS).")
+def prune_changes_command(days):
+    count = catalog_changes.prune(days)
+    click.echo(f"Deleted {count} catalog changes")
@@ -0,0 +1,79 @@
+import gzip
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional - only gzip is offered then
+    brotli = None
+
+
+class Compression:
+    """gzip / brotli response bodies, negotiated with Accept-Encoding.
+
+    Applies to 200 responses of COMPRESS_MIMETYPES of at least
+    COMPRESS_MIN_SIZE bytes (smaller bodies gain less than the header
+    costs). Streamed responses (the SSE change stream, NDJSON import
+    progress) and files sent with sendfile are left alone. Cached catalog
+    responses keep their encoded bodies next to the plain one (see
+    `CatalogCache.cached`), so a cache hit is never compressed again.
+
+    The ETag of an encoded response is made weak: it is the same resource
+    as the plain body, and If-None-Match keeps matching either way.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Turn off when a proxy in front (nginx gzip) already compresses
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_MIMETYPES', ('application/json', 'text/csv', 'text/plain'))
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        # 4-6 is near gzip -9 in size at gzip -6 speed; 11 is for static assets only
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def encodings():
+        # Server preference when the client rates several equally
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self, response):
+        """The content coding to send `response` with, or None to send it as is."""
+        config = current_app.config
+        if not config['COMPRESS_ENABLED'] or response.direct_passthrough or response.is_streamed \
+                or 'Content-Encoding' in response.headers \
+                or response.mimetype not in config['COMPRESS_MIMETYPES']:
+            return None
+        # Caches must key on Accept-Encoding even for the plain variant
+        response.vary.add('Accept-Encoding')
+        if response.status_code != 200 or len(response.get_data()) < config['COMPRESS_MIN_SIZE']:
+            return None
+        return request.accept_encodings.best_match(self.encodings())
+
+    def encode(self, body, encoding):
+        config = current_app.config
+        if encoding == 'br':
+            return brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY'])
+        # mtime=0 keeps the output byte-identical for identical bodies
+        return gzip.compress(body, compresslevel=config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+    @staticmethod
+    def apply(response, body, encoding):
+        """Swap in an already encoded body."""
+        etag, weak = response.get_etag()
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def _after_request(self, response):
+        encoding = self.negotiate(response)
+        if encoding is not None:
+            self.apply(response, self.encode(response.get_data(), encoding), encoding)
+        return response
+
+
+compression = Compression()
@@ -1,7 +1,82 @@
+import time
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql import Select
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    """db.session that sends plain SELECTs to session.info['replica'] when a view opted in.
+
+    Everything else - flushes, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE,
+    raw connections, and any read after the session has written - goes to
+    the primary as usual. See app/replicas.py.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if (replica is not None and bind is None and not self._flushing and not self.info.get('wrote')
+                and isinstance(clause, Select) and clause._for_update_arg is None):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def primary_reads():
+    """Send db.session's reads in this block to the primary, even in a view that opted into a replica."""
+    session = db.session()
+    replica = session.info.pop('replica', None)
+    try:
+        yield
+    finally:
+        if replica is not None:
+            session.info['replica'] = replica
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 cors = CORS()
 jwt = JWTManager()
+migrate = Migrate()
+
+
+def engine_options(config):
+    """SQLAlchemy engine options with the DB_POOL_* connection pool settings applied.
+
+    In-memory SQLite runs on a single StaticPool connection, which takes no
+    pool sizing, so it is left alone. Explicit SQLALCHEMY_ENGINE_OPTIONS win.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 5))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 10))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    return options
+
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS plus one `replicaN` engine per DATABASE_REPLICA_URLS entry (same pool settings)."""
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    for i, url in enumerate(config.get('DATABASE_REPLICA_URLS') or ()):
+        binds[f'replica{i}'] = dict(engine_options(dict(config, SQLALCHEMY_DATABASE_URI=url)), url=url)
+    return binds
+
+
+class StartupTimer:
+    """Wall time of each create_app() phase, imports included (see app/warmup.py)."""
+
+    def __init__(self):
+        self.phases = {}
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
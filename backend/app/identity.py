@@ -0,0 +1,125 @@
+from itertools import chain
+from flask import current_app, has_app_context, jsonify
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from app.cache import MemoryCache
+from app.extensions import db, jwt
+from app.models import User
+
+
+class CachedUser:
+    """What authenticated routes need to know about the caller (flask_jwt_extended.current_user)."""
+    __slots__ = ('id', 'email', 'is_admin')
+
+    def __init__(self, id, email, is_admin):
+        self.id = id
+        self.email = email
+        self.is_admin = bool(is_admin)
+
+
+class IdentityCache:
+    """Token (jti) -> user identity and role, so authenticated requests skip the users table.
+
+    Entries expire after AUTH_CACHE_TTL seconds (0 disables the cache) and
+    the cache holds at most AUTH_CACHE_MAX_ENTRIES tokens. Committing a
+    change to a user's role or email, or deleting the user, bumps that
+    user's generation, which invalidates every cached token of theirs at
+    once. The cache is per process: other workers pick the change up within
+    AUTH_CACHE_TTL, except for admin rights, which `still_admin` re-checks
+    against the users table on every admin request.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUTH_CACHE_TTL', 60)
+        app.config.setdefault('AUTH_CACHE_MAX_ENTRIES', 10000)
+        store = None
+        if app.config['AUTH_CACHE_TTL']:
+            store = MemoryCache(app.config['AUTH_CACHE_MAX_ENTRIES'], app.config['AUTH_CACHE_TTL'])
+        app.extensions['identity_cache'] = store
+
+        jwt.user_lookup_loader(self.load_user)
+        jwt.user_lookup_error_loader(user_not_found)
+        if not event.contains(Session, 'after_flush', _collect_user_changes):
+            event.listen(Session, 'after_flush', _collect_user_changes)
+            event.listen(Session, 'after_commit', _invalidate_changed_users)
+            event.listen(Session, 'after_rollback', _discard_user_changes)
+
+    @property
+    def store(self):
+        return current_app.extensions['identity_cache']
+
+    @staticmethod
+    def generation_key(user_id):
+        return f'user:{user_id}:generation'
+
+    def load_user(self, jwt_header, jwt_data):
+        store = self.store
+        if store is None:
+            return fetch_user(jwt_data['sub'])
+        generation = store.get_int(self.generation_key(jwt_data['sub']))
+        entry = store.get(jwt_data['jti'])
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+        user = fetch_user(jwt_data['sub'])
+        if user is not None:
+            store.set(jwt_data['jti'], (generation, user))
+        return user
+
+    def invalidate_user(self, user_id):
+        store = self.store
+        if store is not None:
+            store.incr(self.generation_key(user_id))
+
+    def still_admin(self, user):
+        """Whether the users table still makes `user` (an admin per the cache) an admin.
+
+        Another worker's demotion may not have reached this process's cache
+        yet; admin requests are few, so they pay one primary-key read.
+        """
+        is_admin = db.session.execute(select(User.is_admin).where(User.id == user.id)).scalar()
+        if not is_admin:
+            self.invalidate_user(str(user.id))
+        return bool(is_admin)
+
+
+def fetch_user(user_id):
+    row = db.session.execute(
+        select(User.id, User.email, User.is_admin).where(User.id == user_id)
+    ).first()
+    return CachedUser(*row) if row else None
+
+
+def user_not_found(jwt_header, jwt_data):
+    return jsonify(message="User not found"), 401
+
+
+# Invalidate after commit, not at flush: a request reading the old row in
+# between would otherwise re-cache it under the new generation.
+
+def _collect_user_changes(session, flush_context):
+    changed = session.info.setdefault('changed_user_ids', set())
+    for obj in chain(session.dirty, session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or state.attrs.is_admin.history.has_changes() \
+                or state.attrs.email.history.has_changes():
+            changed.add(str(obj.id))
+
+
+def _invalidate_changed_users(session):
+    changed = session.info.pop('changed_user_ids', None)
+    if changed and has_app_context():
+        for user_id in changed:
+            identity_cache.invalidate_user(user_id)
+
+
+def _discard_user_changes(session):
+    session.info.pop('changed_user_ids', None)
+
+
+identity_cache = IdentityCache()
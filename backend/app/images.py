@@ -0,0 +1,296 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+from io import BytesIO
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+from app.cache import catalog_cache
+from app.changes import catalog_changes
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Product
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional - without it originals are served for every size
+    Image = None
+
+# Leading bytes of the formats accepted as originals -> (file extension, mimetype)
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+)
+ORIGINAL_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif',
+                  'webp': 'image/webp', 'avif': 'image/avif'}
+# Thumbnail formats Pillow may write, best first; jpeg is always written as the fallback
+VARIANT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# Dropped in a hash directory when a newer image replaces it; its mtime starts the grace period
+SUPERSEDED = '.superseded'
+
+
+class ImageError(ValueError):
+    pass
+
+
+def sniff(data):
+    """(extension, mimetype) of an accepted image format, or None."""
+    for signature, ext, mimetype in SIGNATURES:
+        if data.startswith(signature):
+            return ext, mimetype
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    if data[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'avif', 'image/avif'
+    return None
+
+
+def image_path(product_id, image_hash, size, fmt):
+    # Products, hashes and sizes are validated ints/hex/config keys, never user paths
+    return os.path.join(current_app.config['IMAGE_DIR'], str(product_id), image_hash, f'{size}.{fmt}')
+
+
+def image_urls(product_id, image_hash):
+    """Content-addressed URLs for each size; safe to cache forever."""
+    if not image_hash:
+        return {}
+    sizes = list(current_app.config['IMAGE_SIZES']) + ['original']
+    return {size: f'/images/{product_id}/{size}?v={image_hash}' for size in sizes}
+
+
+class ImageStore:
+    """Local product images: originals plus thumbnails, keyed by content hash.
+
+    `ingest(product_id, data)` writes the original and, with Pillow
+    installed, one file per IMAGE_SIZES entry in each of IMAGE_FORMATS
+    (JPEG always, as the fallback) to IMAGE_DIR/<product>/<hash>/, then
+    points Product.image_hash at it. The directory is built under a
+    temporary name and renamed into place, so readers never see half a
+    set, and ingesting the same bytes again is a no-op. Older hashes of
+    the product are marked superseded once the new one is committed and
+    deleted IMAGE_PRUNE_GRACE seconds later (by the next ingest or
+    `flask --app run images prune`), so requests already resolved to the
+    old hash still find their files.
+
+    GET /images/<product>/<size> serves these files straight from disk
+    (gunicorn hands them to sendfile), see app/routes/images.py.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_DIR', None)
+        if not app.config['IMAGE_DIR']:
+            app.config['IMAGE_DIR'] = os.path.join(app.instance_path, 'images')
+        app.config.setdefault('IMAGE_SIZES', {'thumb': 160, 'card': 400, 'large': 1200})
+        app.config.setdefault('IMAGE_FORMATS', ('webp', 'jpeg'))
+        app.config.setdefault('IMAGE_QUALITY', 82)
+        app.config.setdefault('IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('IMAGE_MAX_PIXELS', 40_000_000)
+        app.config.setdefault('IMAGE_FETCH_TIMEOUT', 10.0)
+        app.config.setdefault('IMAGE_MAX_AGE', 300)
+        app.config.setdefault('IMAGE_PRUNE_GRACE', 600)
+
+        formats = [fmt for fmt in app.config['IMAGE_FORMATS'] if fmt in VARIANT_TYPES and fmt != 'jpeg']
+        if Image is not None:
+            Image.init()
+            # e.g. AVIF needs a Pillow build with libavif
+            formats = [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+            formats.append('jpeg')
+        else:
+            formats = []
+        app.extensions['image_formats'] = tuple(formats)
+
+    @property
+    def formats(self):
+        """Thumbnail formats written by this process, best first (empty without Pillow)."""
+        return current_app.extensions['image_formats']
+
+    # --- Ingest ---
+
+    def ingest(self, product_id, data):
+        """Store an image for a product and make it current. Returns the content hash."""
+        config = current_app.config
+        if len(data) > config['IMAGE_MAX_BYTES']:
+            raise ImageError(f"Image is larger than {config['IMAGE_MAX_BYTES']} bytes")
+        kind = sniff(data)
+        if kind is None:
+            raise ImageError("Not a JPEG, PNG, GIF, WebP or AVIF image")
+        if db.session.get(Product, product_id) is None:
+            raise LookupError(f"No product {product_id}")
+
+        image_hash = hashlib.sha256(data).hexdigest()[:16]
+        product_dir = os.path.join(config['IMAGE_DIR'], str(product_id))
+        target = os.path.join(product_dir, image_hash)
+        if os.path.isdir(target):
+            # The same image again (perhaps one that was replaced): current once more
+            try:
+                os.remove(os.path.join(target, SUPERSEDED))
+            except FileNotFoundError:
+                pass
+        else:
+            os.makedirs(product_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix='.tmp-', dir=product_dir)
+            try:
+                with open(os.path.join(staging, f'original.{kind[0]}'), 'wb') as f:
+                    f.write(data)
+                if self.formats:
+                    self._write_variants(data, staging)
+                try:
+                    os.rename(staging, target)
+                except OSError:
+                    # Another worker published the same image first
+                    if not os.path.isdir(target):
+                        raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        db.session.execute(update(Product).where(Product.id == product_id).values(image_hash=image_hash))
+        catalog_changes.record('product', 'updated', [product_id])
+        db.session.commit()
+        catalog_cache.bump()
+        self._prune(product_id, keep=image_hash)
+        return image_hash
+
+    def fetch(self, product_id, url):
+        """Download an http(s) image and ingest it."""
+        if not url or not url.lower().startswith(('http://', 'https://')):
+            raise ImageError("Only http(s) image URLs can be fetched")
+        config = current_app.config
+        request = urllib.request.Request(url, headers={'User-Agent': 'market-image-fetcher/1.0'})
+        with urllib.request.urlopen(request, timeout=config['IMAGE_FETCH_TIMEOUT']) as response:
+            # One byte over the limit is enough to reject it without reading the rest
+            data = response.read(config['IMAGE_MAX_BYTES'] + 1)
+        return self.ingest(product_id, data)
+
+    @staticmethod
+    def remove(product_id):
+        """Delete a product's stored images, once the change clearing its image_hash has committed."""
+        shutil.rmtree(os.path.join(current_app.config['IMAGE_DIR'], str(product_id)), ignore_errors=True)
+
+    def _write_variants(self, data, directory):
+        config = current_app.config
+        sizes = sorted(config['IMAGE_SIZES'].items(), key=lambda item: item[1], reverse=True)
+        try:
+            with Image.open(BytesIO(data)) as im:
+                # Header only so far: refuse decompression bombs before decoding pixels
+                if im.width * im.height > config['IMAGE_MAX_PIXELS']:
+                    raise ImageError(f"Image has more than {config['IMAGE_MAX_PIXELS']} pixels")
+                # JPEG decodes at a reduced scale (DCT scaling) when the largest size allows it
+                im.draft('RGB', (sizes[0][1], sizes[0][1]))
+                source = ImageOps.exif_transpose(im)
+        except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+            raise ImageError(f"Unreadable image ({type(e).__name__})")
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'transparency' in source.info or 'A' in source.mode else 'RGB')
+        # Largest first, each size resized from the previous one instead of the original
+        for size, pixels in sizes:
+            source.thumbnail((pixels, pixels), Image.Resampling.LANCZOS)
+            for fmt in self.formats:
+                self._save(source, os.path.join(directory, f'{size}.{fmt}'), fmt, config['IMAGE_QUALITY'])
+
+    @staticmethod
+    def _save(im, path, fmt, quality):
+        if fmt == 'jpeg':
+            if im.mode == 'RGBA':
+                flat = Image.new('RGB', im.size, (255, 255, 255))
+                flat.paste(im, mask=im.getchannel('A'))
+                im = flat
+            im.save(path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        elif fmt == 'webp':
+            im.save(path, 'WEBP', quality=quality, method=4)
+        else:
+            im.save(path, fmt.upper(), quality=quality)
+
+    @staticmethod
+    def _prune(product_id, keep):
+        """Mark the product's other hashes superseded; delete those marked over IMAGE_PRUNE_GRACE ago."""
+        product_dir = os.path.join(current_app.config['IMAGE_DIR'], str(product_id))
+        cutoff = time.time() - current_app.config['IMAGE_PRUNE_GRACE']
+        pruned = 0
+        for name in os.listdir(product_dir):
+            if name == keep or name.startswith('.tmp-'):
+                continue
+            marker = os.path.join(product_dir, name, SUPERSEDED)
+            try:
+                marked_at = os.path.getmtime(marker)
+            except FileNotFoundError:
+                open(marker, 'a').close()
+                continue
+            if marked_at < cutoff:
+                shutil.rmtree(os.path.join(product_dir, name), ignore_errors=True)
+                pruned += 1
+        return pruned
+
+    def prune(self):
+        """Sweep every product directory: superseded hashes past the grace period go."""
+        root = current_app.config['IMAGE_DIR']
+        if not os.path.isdir(root):
+            return 0
+        current = dict(db.session.execute(select(Product.id, Product.image_hash)).all())
+        db.session.rollback()
+        pruned = 0
+        for name in os.listdir(root):
+            if name.isdigit() and int(name) in current:
+                pruned += self._prune(int(name), keep=current[int(name)])
+        return pruned
+
+
+images = ImageStore()
+
+
+@jobs.task('images.fetch')
+def fetch_image_job(product_id, url):
+    images.fetch(product_id, url)
+
+
+# --- CLI: flask --app run images ingest|fetch|prune ---
+
+images_cli = AppGroup('images', help="Local product images and thumbnails.")
+
+
+@images_cli.command('ingest')
+@click.argument('product_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def ingest_command(product_id, path):
+    """Store a local image file for a product."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        image_hash = images.ingest(product_id, data)
+    except (ImageError, LookupError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Product {product_id}: {image_hash} ({', '.join(images.formats) or 'original only'})")
+
+
+@images_cli.command('fetch')
+@click.option('--all', 'fetch_all', is_flag=True, help="Also refetch products that already have a local image.")
+def fetch_command(fetch_all):
+    """Download every product's external image_url and store it locally."""
+    query = select(Product.id, Product.image_url).where(Product.image_url.like('http%'))
+    if not fetch_all:
+        query = query.where(Product.image_hash.is_(None))
+    stored = failed = 0
+    for product_id, url in db.session.execute(query.order_by(Product.id)).all():
+        try:
+            images.fetch(product_id, url)
+            stored += 1
+        except Exception as e:
+            db.session.rollback()
+            failed += 1
+            click.echo(f"Product {product_id}: {type(e).__name__}: {e}", err=True)
+    click.echo(f"Stored {stored} images, {failed} failed")
+
+
+@images_cli.command('prune')
+def prune_command():
+    """Delete image versions superseded more than IMAGE_PRUNE_GRACE seconds ago."""
+    click.echo(f"Deleted {images.prune()} superseded image versions")
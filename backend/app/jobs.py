@@ -0,0 +1,302 @@
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+import click
+from flask import current_app, g, has_app_context, has_request_context
+from flask.cli import AppGroup
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import Job
+from app.sqlite import is_file_sqlite
+
+
+class JobQueue:
+    """Persistent background jobs: a `jobs` table plus worker threads in each process.
+
+    `enqueue(name, **payload)` adds a row to the current transaction, so the
+    job exists exactly when the request's own writes commit (and is woken
+    right after). JOB_WORKERS threads per process claim due jobs, run the
+    registered handler and mark the job done in the same transaction as the
+    handler's writes. A failure is retried up to JOB_MAX_ATTEMPTS times with
+    exponential backoff (JOB_BACKOFF_BASE doubling, capped at
+    JOB_BACKOFF_MAX, with jitter), then the job is parked as `dead`. Jobs
+    left `running` by a killed process are picked up again after
+    JOB_TIMEOUT seconds.
+
+    With JOB_WORKERS=0 no threads start here (run `flask jobs work`
+    instead). In-memory SQLite has one shared connection, so jobs there run
+    eagerly at the end of the request that enqueued them (JOB_EAGER).
+    """
+
+    def __init__(self, app=None):
+        self.tasks = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOB_BACKOFF_BASE', 2.0)
+        app.config.setdefault('JOB_BACKOFF_MAX', 300.0)
+        app.config.setdefault('JOB_POLL_INTERVAL', 1.0)
+        app.config.setdefault('JOB_TIMEOUT', 300.0)
+        with app.app_context():
+            engine = db.engine
+        app.config.setdefault('JOB_EAGER', engine.dialect.name == 'sqlite' and not is_file_sqlite(engine))
+
+        workers = None
+        if app.config['JOB_EAGER']:
+            app.teardown_request(self._run_eager)
+        elif app.config['JOB_WORKERS']:
+            workers = Workers(self, app)
+            app.before_request(workers.ensure_started)
+        app.extensions['job_workers'] = workers
+        if not event.contains(Session, 'after_commit', _wake_workers):
+            event.listen(Session, 'after_commit', _wake_workers)
+
+    def task(self, name):
+        """Register a handler: `@jobs.task('name') def handler(**payload)`."""
+        def wrapper(fn):
+            self.tasks[name] = fn
+            return fn
+        return wrapper
+
+    def enqueue(self, name, delay=None, max_attempts=None, **payload):
+        """Add a job to the current session; it is queued when the session commits."""
+        if name not in self.tasks:
+            raise LookupError(f"Unknown job: {name}")
+        job = Job(
+            name=name, payload=json.dumps(payload),
+            max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+            run_at=datetime.utcnow() + timedelta(seconds=delay or 0),
+        )
+        db.session.add(job)
+        db.session.info['jobs_enqueued'] = True
+        if has_request_context():
+            g.jobs_enqueued = True
+        return job
+
+    def wake(self):
+        workers = current_app.extensions['job_workers']
+        if workers is not None:
+            workers.wake.set()
+
+    def shutdown(self, timeout=10.0):
+        """Let running jobs finish (gunicorn worker_exit); unfinished ones are retried later."""
+        workers = current_app.extensions['job_workers']
+        if workers is not None:
+            workers.stop(timeout)
+
+    # --- Running jobs ---
+
+    def claim(self):
+        """Mark the next due job `running` and return it (or None)."""
+        now = datetime.utcnow()
+        candidates = db.session.execute(
+            select(Job.id).where(Job.status == 'queued', Job.run_at <= now)
+            .order_by(Job.run_at, Job.id).limit(8)
+        ).scalars().all()
+        for job_id in candidates:
+            # Conditional update: another thread or process may claim the same row
+            claimed = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'queued')
+                .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        db.session.commit()
+        return None
+
+    def run(self, job):
+        job_id, name, attempts, max_attempts = job.id, job.name, job.attempts, job.max_attempts
+        # Still our claim: a run past JOB_TIMEOUT is requeued and may be claimed (and run) again
+        ours = (Job.id == job_id, Job.status == 'running', Job.locked_at == job.locked_at, Job.attempts == attempts)
+        try:
+            handler = self.tasks.get(name)
+            if handler is None:
+                raise LookupError(f"Unknown job: {name}")
+            handler(**json.loads(job.payload))
+            # Done in the handler's transaction: its writes and the status commit together
+            done = db.session.execute(update(Job).where(*ours).values(
+                status='done', finished_at=datetime.utcnow(), last_error=None)).rowcount
+            if not done:
+                # Someone else owns the job now; committing would apply its writes twice
+                db.session.rollback()
+                current_app.logger.warning("Job %s (%s) lost its claim (requeued after JOB_TIMEOUT or "
+                                           "superseded by a rebuild), discarding this run", job_id, name)
+                return False
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception("Job %s (%s) failed, attempt %d/%d", job_id, name, attempts, max_attempts)
+            now = datetime.utcnow()
+            values = {"last_error": f'{type(e).__name__}: {e}'[:2000]}
+            if attempts >= max_attempts:
+                values.update(status='dead', finished_at=now)
+            else:
+                values.update(status='queued', run_at=now + timedelta(seconds=self.backoff(attempts)))
+            db.session.execute(update(Job).where(*ours).values(**values))
+            db.session.commit()
+            return False
+
+    def supersede(self, name):
+        """Mark queued and running `name` jobs done, in the current transaction.
+
+        For rebuilds that recompute from scratch whatever those jobs would
+        add: committed together, nothing is counted twice. A run still in
+        progress loses its claim and discards its writes (see `run`).
+        """
+        return db.session.execute(
+            update(Job).where(Job.name == name, Job.status.in_(('queued', 'running')))
+            .values(status='done', finished_at=datetime.utcnow())
+        ).rowcount
+
+    def backoff(self, attempts):
+        config = current_app.config
+        delay = min(config['JOB_BACKOFF_BASE'] * 2 ** (attempts - 1), config['JOB_BACKOFF_MAX'])
+        # Jitter, so jobs that failed together don't all retry together
+        return delay * random.uniform(0.5, 1.0)
+
+    def requeue_stale(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+        stale = (Job.status == 'running', Job.locked_at < cutoff)
+        # Idle workers call this on every poll: only take SQLite's write lock when there is work
+        if db.session.execute(select(Job.id).where(*stale).limit(1)).first() is None:
+            db.session.rollback()
+            return 0
+        count = db.session.execute(update(Job).where(*stale).values(status='queued')).rowcount
+        db.session.commit()
+        return count
+
+    def run_pending(self, limit=None):
+        """Run due jobs until none are left (or `limit` ran). Returns how many ran."""
+        ran = 0
+        while limit is None or ran < limit:
+            job = self.claim()
+            if job is None:
+                break
+            self.run(job)
+            ran += 1
+        return ran
+
+    def retry(self, job_id):
+        """Put a dead (or failed) job back in the queue with a fresh set of attempts."""
+        return db.session.execute(
+            update(Job).where(Job.id == job_id, Job.status.in_(('dead', 'queued')))
+            .values(status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+        ).rowcount
+
+    # --- Worker threads ---
+
+    def _run_eager(self, exc):
+        if g.pop('jobs_enqueued', False):
+            # Drop whatever the request left uncommitted before running jobs on its session
+            db.session.rollback()
+            self.run_pending()
+
+    def work(self, app, stopping=None, wake=None):
+        """Worker loop: run due jobs, sleep until woken or JOB_POLL_INTERVAL passes."""
+        stopping = stopping or threading.Event()
+        wake = wake or threading.Event()
+        while not stopping.is_set():
+            with app.app_context():
+                try:
+                    job = self.claim()
+                    if job is None:
+                        self.requeue_stale()
+                    else:
+                        self.run(job)
+                        continue
+                except Exception:
+                    # Database unavailable etc. - keep the thread alive and try again later
+                    db.session.rollback()
+                    app.logger.exception("Job worker error")
+            wake.wait(app.config['JOB_POLL_INTERVAL'])
+            wake.clear()
+
+
+class Workers:
+    """An app's JOB_WORKERS job threads in the current process."""
+
+    def __init__(self, queue, app):
+        self.queue = queue
+        self.app = app
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._threads = []
+
+    def ensure_started(self):
+        # Threads don't survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.wake = threading.Event()
+                self.stopping = threading.Event()
+                self._threads = [
+                    threading.Thread(target=self.queue.work, args=(self.app, self.stopping, self.wake),
+                                     name=f'job-worker-{i}', daemon=True)
+                    for i in range(self.app.config['JOB_WORKERS'])
+                ]
+                for thread in self._threads:
+                    thread.start()
+                self._pid = os.getpid()
+
+    def stop(self, timeout):
+        if self._pid != os.getpid():
+            return
+        self.stopping.set()
+        self.wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._pid = None
+
+
+def _wake_workers(session):
+    if session.info.pop('jobs_enqueued', False) and has_app_context():
+        jobs.wake()
+
+
+jobs = JobQueue()
+
+
+# --- CLI: flask --app run jobs work|retry|purge ---
+
+jobs_cli = AppGroup('jobs', help="Background job queue.")
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help="Exit when no job is due instead of polling.")
+def work_command(once):
+    """Run jobs in the foreground (for JOB_WORKERS=0 deployments)."""
+    app = current_app._get_current_object()
+    if once:
+        click.echo(f"Ran {jobs.run_pending()} jobs")
+        return
+    click.echo(f"Working on jobs, polling every {app.config['JOB_POLL_INTERVAL']}s")
+    jobs.work(app)
+
+
+@jobs_cli.command('retry')
+@click.argument('job_id', type=int)
+def retry_command(job_id):
+    if not jobs.retry(job_id):
+        raise click.ClickException(f"No dead or queued job {job_id}")
+    db.session.commit()
+    click.echo(f"Job {job_id} queued")
+
+
+@jobs_cli.command('purge')
+@click.option('--days', default=7, show_default=True, help="Delete done jobs finished this many days ago.")
+def purge_command(days):
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < cutoff)).rowcount
+    db.session.commit()
+    click.echo(f"Deleted {count} done jobs")
@@ -0,0 +1,266 @@
+import hmac
+import random
+import threading
+import time
+from flask import Response, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.utils import admin_required
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}'
+
+
+class Registry:
+    """Minimal thread-safe Prometheus registry (counters and histograms)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels=(), amount=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            data = series.get(labels)
+            if data is None:
+                data = series[labels] = [0] * (len(LATENCY_BUCKETS) + 2)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                kind, text = self._help.get(name, ('counter', name))
+                lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{format_labels(labels)} {value:g}')
+            for name, series in sorted(self._histograms.items()):
+                _, text = self._help.get(name, ('histogram', name))
+                lines += [f'# HELP {name} {text}', f'# TYPE {name} histogram']
+                for labels, data in sorted(series.items()):
+                    for bound, count in zip(LATENCY_BUCKETS, data):
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", f"{bound:g}"),))} {count}')
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {data[-1]}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {data[-2]:.6f}')
+                    lines.append(f'{name}_count{format_labels(labels)} {data[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'db_time', 'serialization_time', 'statements', 'lazy_loads')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.statements = {}
+        self.lazy_loads = {}
+
+
+def current_stats():
+    # Only sampled requests carry stats; everything else pays one lookup
+    if has_app_context():
+        return g.get('_request_stats')
+    return None
+
+
+class Metrics:
+    """Per-request SQL/timing instrumentation exposed on /metrics.
+
+    A sampled fraction of requests (METRICS_SAMPLE_RATE) records query
+    count, DB time, serialization time and handler time, gets a
+    `Server-Timing` header, and is checked for N+1 patterns: the same SELECT
+    run METRICS_N_PLUS_ONE_THRESHOLD+ times, or that many lazy relationship
+    loads, in one request. Request counts are recorded for every request.
+    Metrics are per process.
+
+    /metrics answers a `Bearer METRICS_TOKEN` Authorization header (for
+    Prometheus scrapers) or, without a token configured, admins only.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics']
+
+    @staticmethod
+    def _create_registry():
+        r = Registry()
+        r.describe('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.')
+        r.describe('http_request_duration_seconds', 'histogram', 'Request latency (sampled requests).')
+        r.describe('http_sampled_requests_total', 'counter', 'Requests that were instrumented.')
+        r.describe('db_queries_total', 'counter', 'SQL statements run by sampled requests.')
+        r.describe('db_duration_seconds_total', 'counter', 'Time spent in SQL by sampled requests.')
+        r.describe('serialization_duration_seconds_total', 'counter',
+                   'Time spent encoding JSON by sampled requests.')
+        r.describe('handler_duration_seconds_total', 'counter',
+                   'Time spent in Python outside SQL and JSON encoding by sampled requests.')
+        r.describe('n_plus_one_detected_total', 'counter', 'Sampled requests flagged with an N+1 pattern.')
+        r.describe('app_startup_seconds', 'gauge', 'Time spent in each create_app() and warm-up phase.')
+        r.describe('db_routed_requests_total', 'counter',
+                   'Read-only requests by database: replica, primary (pinned or no replicas), replica_failed.')
+        return r
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_SAMPLE_RATE', 0.1)
+        app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.extensions['metrics'] = self._create_registry()
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        # Primary and read replicas alike
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        if not event.contains(Session, 'do_orm_execute', _track_lazy_load):
+            event.listen(Session, 'do_orm_execute', _track_lazy_load)
+
+        self._wrap_json_provider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.render)
+
+    # --- hooks ---
+
+    @staticmethod
+    def _before_request():
+        rate = current_app.config['METRICS_SAMPLE_RATE']
+        if rate >= 1 or (rate > 0 and random.random() < rate):
+            g._request_stats = RequestStats()
+
+    def _after_request(self, response):
+        endpoint = request.endpoint or 'unmatched'
+        if endpoint == 'metrics':
+            return response
+        self.registry.inc('http_requests_total', (
+            ('endpoint', endpoint), ('method', request.method), ('status', str(response.status_code))
+        ))
+
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats.start
+        handler = max(total - stats.db_time - stats.serialization_time, 0.0)
+        labels = (('endpoint', endpoint),)
+        r = self.registry
+        r.observe('http_request_duration_seconds', labels, total)
+        r.inc('http_sampled_requests_total', labels)
+        r.inc('db_queries_total', labels, stats.queries)
+        r.inc('db_duration_seconds_total', labels, stats.db_time)
+        r.inc('serialization_duration_seconds_total', labels, stats.serialization_time)
+        r.inc('handler_duration_seconds_total', labels, handler)
+
+        suspects = self._n_plus_one(stats)
+        if suspects:
+            r.inc('n_plus_one_detected_total', labels)
+            current_app.logger.warning("Possible N+1 in %s: %s", endpoint, '; '.join(suspects))
+
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+            f'ser;dur={stats.serialization_time * 1000:.2f}',
+            f'app;dur={handler * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]))
+        return response
+
+    @staticmethod
+    def _n_plus_one(stats):
+        threshold = current_app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+        suspects = [f'{count}x lazy load {path}' for path, count in stats.lazy_loads.items()
+                    if count >= threshold]
+        suspects += [f'{count}x "{statement[:80]}"' for statement, count in stats.statements.items()
+                     if count >= threshold and statement.lstrip()[:6].upper() == 'SELECT']
+        return suspects
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_stats()
+        if stats is not None:
+            conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_stats()
+        if stats is None:
+            return
+        starts = conn.info.get('_query_start')
+        if starts:
+            stats.db_time += time.perf_counter() - starts.pop()
+        stats.queries += 1
+        stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+    @staticmethod
+    def _wrap_json_provider(app):
+        provider = app.json
+        response = provider.response
+
+        def timed_response(*args, **kwargs):
+            stats = current_stats()
+            if stats is None:
+                return response(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return response(*args, **kwargs)
+            finally:
+                stats.serialization_time += time.perf_counter() - start
+
+        provider.response = timed_response
+
+    def render(self):
+        token = current_app.config['METRICS_TOKEN']
+        if not token:
+            return admin_required()(self._render)()
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                            headers={'WWW-Authenticate': 'Bearer'})
+        return self._render()
+
+    def _render(self):
+        return Response(self.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _track_lazy_load(orm_execute_state):
+    stats = current_stats()
+    if stats is None or not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return
+    parent = orm_execute_state.lazy_loaded_from.class_.__name__
+    mapper = orm_execute_state.bind_mapper
+    target = mapper.class_.__name__ if mapper is not None else '?'
+    path = f'{parent} -> {target}'
+    stats.lazy_loads[path] = stats.lazy_loads.get(path, 0) + 1
+
+
+metrics = Metrics()
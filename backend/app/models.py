@@ -1,6 +1,7 @@
 from datetime import datetime
 import uuid
 from app.extensions import db
+from app.passwords import password_hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -13,15 +14,10 @@ class User(db.Model):
     purchases = db.relationship('Purchase', backref='user', lazy=True)
 
     def set_password(self, password):
-        from passlib.hash import pbkdf2_sha256
-        self.password_hash = pbkdf2_sha256.hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        from passlib.hash import pbkdf2_sha256
-        try:
-            return pbkdf2_sha256.verify(password, self.password_hash)
-        except:
-            return False
+        return password_hasher.verify(password, self.password_hash)
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -40,13 +36,26 @@ class Product(db.Model):
     __tablename__ = 'products'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    # Money columns are integer cents (app/money.py); the API speaks decimal amounts
+    price_cents = db.Column(db.Integer, nullable=False)
     image_url = db.Column(db.String(500), nullable=True)
+    # Content hash of the locally stored image (app/images.py); NULL = only image_url
+    image_hash = db.Column(db.String(16), nullable=True)
+    # Units on hand; NULL means stock is not tracked for this product
+    stock = db.Column(db.Integer, nullable=True)
     department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False, index=True)
 
     cart_items = db.relationship('CartItem', backref='product', lazy=True)
     purchase_items = db.relationship('PurchaseItem', backref='product', lazy=True)
 
+    # Composite indexes for keyset pagination: (filter, sort column, id tie-breaker)
+    __table_args__ = (
+        db.Index('ix_products_price_id', 'price_cents', 'id'),
+        db.Index('ix_products_name_id', 'name', 'id'),
+        db.Index('ix_products_department_price_id', 'department_id', 'price_cents', 'id'),
+        db.Index('ix_products_department_name_id', 'department_id', 'name', 'id'),
+    )
+
     def __repr__(self):
         return f'<Product {self.name}>'
 
@@ -57,21 +66,36 @@ class CartItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, default=1, nullable=False)
 
+    # One row per product per cart, so cart writes can be ON CONFLICT upserts
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_cart_items_user_product'),
+    )
+
     def __repr__(self):
         return f'<CartItem user:{self.user_id} prod:{self.product_id} qty:{self.quantity}>'
 
 class Purchase(db.Model):
     __tablename__ = 'purchases'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     unique_code = db.Column(db.String(36), unique=True, default=lambda: str(uuid.uuid4()))
-    total_price = db.Column(db.Float, nullable=False)
+    total_cents = db.Column(db.Integer, nullable=False)
+    # Client-supplied key so a retried checkout returns the original order
+    idempotency_key = db.Column(db.String(64), nullable=True)
+    # Number of line items, written at checkout so order history never reads PurchaseItem
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_purchases_user_idempotency_key'),
+        # Order history: one user's purchases, newest first (also serves user_id lookups)
+        db.Index('ix_purchases_user_timestamp', 'user_id', 'timestamp'),
+    )
 
     items = db.relationship('PurchaseItem', backref='purchase', lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
-        return f'<Purchase {self.unique_code} total:{self.total_price}>'
+        return f'<Purchase {self.unique_code} total_cents:{self.total_cents}>'
 
 class PurchaseItem(db.Model):
     __tablename__ = 'purchase_items'
@@ -79,7 +103,114 @@ class PurchaseItem(db.Model):
     purchase_id = db.Column(db.Integer, db.ForeignKey('purchases.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
-    price_at_purchase = db.Column(db.Float, nullable=False)
+    price_at_purchase_cents = db.Column(db.Integer, nullable=False)
 
     def __repr__(self):
         return f'<PurchaseItem purchase:{self.purchase_id} prod:{self.product_id}>'
+
+# --- Sales rollups (maintained by a job enqueued at checkout, see app/analytics.py) ---
+
+class DailySales(db.Model):
+    __tablename__ = 'daily_sales'
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, default=0, nullable=False)
+    units = db.Column(db.Integer, default=0, nullable=False)
+    revenue_cents = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<DailySales {self.day} orders:{self.orders}>'
+
+class DailyDepartmentSales(db.Model):
+    __tablename__ = 'daily_department_sales'
+    day = db.Column(db.Date, primary_key=True)
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), primary_key=True)
+    units = db.Column(db.Integer, default=0, nullable=False)
+    revenue_cents = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<DailyDepartmentSales {self.day} dept:{self.department_id}>'
+
+class DailyProductSales(db.Model):
+    __tablename__ = 'daily_product_sales'
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    # Department at the time of sale, so top-N per department needs no join
+    department_id = db.Column(db.Integer, db.ForeignKey('departments.id'), nullable=False)
+    units = db.Column(db.Integer, default=0, nullable=False)
+    revenue_cents = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_daily_product_sales_department_day', 'department_id', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<DailyProductSales {self.day} prod:{self.product_id}>'
+
+# --- Product recommendations (maintained by a job enqueued at checkout, see app/recommendations.py) ---
+
+class ProductPair(db.Model):
+    __tablename__ = 'product_pairs'
+    # Orders containing both products, stored both ways round. No foreign keys:
+    # pairs of a deleted product are skipped when read and dropped by a rebuild.
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        # A product's most frequent partners without reading all its pairs
+        db.Index('ix_product_pairs_product_orders', 'product_id', 'orders', 'other_id'),
+    )
+
+    def __repr__(self):
+        return f'<ProductPair {self.product_id}+{self.other_id} orders:{self.orders}>'
+
+class RelatedProduct(db.Model):
+    __tablename__ = 'related_products'
+    # Top RECOMMENDATIONS_TOP_K partners per product, rank 1 = most often bought together
+    product_id = db.Column(db.Integer, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    related_id = db.Column(db.Integer, nullable=False)
+    orders = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<RelatedProduct {self.product_id} #{self.rank}: {self.related_id}>'
+
+# --- Catalog change log (see app/changes.py) ---
+
+class CatalogChange(db.Model):
+    __tablename__ = 'catalog_changes'
+    # The catalog change version; AUTOINCREMENT on SQLite so ids are never reused after pruning
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # product | department
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # created | updated | deleted
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def __repr__(self):
+        return f'<CatalogChange {self.id} {self.entity}:{self.entity_id} {self.action}>'
+
+# --- Background jobs (see app/jobs.py) ---
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON keyword arguments
+    # queued -> running -> done, or back to queued (retry) until dead (dead-letter)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
@@ -0,0 +1,25 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# Money is stored as integer cents (price_cents, total_cents, ...), so sums are
+# exact in SQL and in Python. The API keeps speaking decimal amounts.
+
+CENT = Decimal('0.01')
+
+
+def to_cents(value):
+    """Integer cents from a decimal amount (number or numeric string); ValueError if it isn't one."""
+    if isinstance(value, bool):
+        raise ValueError("not an amount")
+    try:
+        # str() first, so the float 19.99 is read as the decimal 19.99
+        amount = Decimal(str(value).strip()).quantize(CENT, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"not an amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"not an amount: {value!r}")
+    return int(amount * 100)
+
+
+def from_cents(cents):
+    """The decimal amount for JSON responses (19.99, not 1999)."""
+    return cents / 100
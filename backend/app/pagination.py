@@ -0,0 +1,58 @@
+import base64
+import json
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class CursorError(ValueError):
+    pass
+
+
+def get_limit(args, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    limit = args.get('limit', default, type=int)
+    # Clamp instead of failing - a huge limit is just a slow first page
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def is_int(value):
+    # Cursor values come from JSON: true/false are not ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+    if not isinstance(values, list):
+        raise CursorError("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort_col, id_col, last_value, last_id, descending=False):
+    """Rows strictly after (last_value, last_id) in (sort_col, id_col) order.
+
+    Written as an OR of two range conditions (rather than a row-value
+    comparison) so SQLite and PostgreSQL both use the composite index.
+    """
+    if sort_col is id_col:
+        return id_col < last_id if descending else id_col > last_id
+    if descending:
+        return or_(sort_col < last_value, and_(sort_col == last_value, id_col < last_id))
+    return or_(sort_col > last_value, and_(sort_col == last_value, id_col > last_id))
+
+
+def keyset_order(sort_col, id_col, descending=False):
+    if sort_col is id_col:
+        return [id_col.desc() if descending else id_col.asc()]
+    if descending:
+        return [sort_col.desc(), id_col.desc()]
+    return [sort_col.asc(), id_col.asc()]
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from functools import wraps
+from flask import current_app, has_app_context, jsonify
+from passlib.hash import pbkdf2_sha256
+
+
+class PasswordHashTimeout(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    return pbkdf2_sha256.using(rounds=rounds).hash(password)
+
+
+def _verify(password, password_hash):
+    try:
+        return pbkdf2_sha256.verify(password, password_hash)
+    except (ValueError, TypeError):
+        # Malformed or non-pbkdf2 hash
+        return False
+
+
+class PasswordHasher:
+    """pbkdf2_sha256 hashing and verification on a small per-process worker pool.
+
+    pbkdf2 is pure CPU. Running it in the request thread holds the GIL for
+    tens of milliseconds, so a login burst starves every other request
+    in the worker. Here PASSWORD_POOL_SIZE child processes do the hashing,
+    the request thread just waits (up to PASSWORD_HASH_TIMEOUT) and the
+    worker keeps serving other requests. PASSWORD_POOL_SIZE=0 hashes inline.
+
+    PASSWORD_HASH_ROUNDS sets the pbkdf2 work factor for new hashes
+    (existing hashes keep their own rounds and still verify).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pools = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_ROUNDS', 29000)
+        app.config.setdefault('PASSWORD_POOL_SIZE', 1)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+        app.config.setdefault('AUTH_MAX_CONCURRENT', 8)
+        app.config.setdefault('AUTH_ADMISSION_TIMEOUT', 2.0)
+        app.extensions['auth_admission'] = threading.BoundedSemaphore(app.config['AUTH_MAX_CONCURRENT'])
+
+    def _pool(self, size):
+        # Pools don't survive fork, so each (gunicorn) worker creates its own
+        key = (os.getpid(), size)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    # forkserver/spawn children don't inherit the worker's threads and sockets
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    pool = ProcessPoolExecutor(size, mp_context=multiprocessing.get_context(method))
+                    self._pools[key] = pool
+        return pool
+
+    def _run(self, fn, *args):
+        config = current_app.config if has_app_context() else {}
+        size = config.get('PASSWORD_POOL_SIZE', 0)
+        if not size:
+            return fn(*args)
+        future = self._pool(size).submit(fn, *args)
+        try:
+            return future.result(timeout=config['PASSWORD_HASH_TIMEOUT'])
+        except FutureTimeout:
+            future.cancel()
+            raise PasswordHashTimeout()
+
+    def hash(self, password):
+        rounds = current_app.config['PASSWORD_HASH_ROUNDS'] if has_app_context() else 29000
+        return self._run(_hash, password, rounds)
+
+    def verify(self, password, password_hash):
+        return self._run(_verify, password, password_hash)
+
+
+def admission_control():
+    """Cap concurrent requests per worker for an expensive endpoint (login/register).
+
+    A request waits up to AUTH_ADMISSION_TIMEOUT seconds for one of the
+    AUTH_MAX_CONCURRENT slots, then gets 503 + Retry-After, so a login storm
+    queues up here instead of crowding out cheap endpoints.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            slots = current_app.extensions['auth_admission']
+            if not slots.acquire(timeout=current_app.config['AUTH_ADMISSION_TIMEOUT']):
+                response = jsonify(message="Too many requests, please retry shortly")
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            try:
+                return fn(*args, **kwargs)
+            except PasswordHashTimeout:
+                response = jsonify(message="Authentication is busy, please retry shortly")
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            finally:
+                slots.release()
+        return decorator
+    return wrapper
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,165 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.orm import aliased
+from app.analytics import increment
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Product, ProductPair, Purchase, PurchaseItem, RelatedProduct
+from app.serializers import PRODUCT
+
+
+class Recommendations:
+    """Frequently-bought-together recommendations from purchase history.
+
+    product_pairs is the sparse co-occurrence matrix: for every two products
+    bought in the same order, the number of such orders (stored both ways
+    round). related_products keeps each product's RECOMMENDATIONS_TOP_K
+    most frequent partners, so serving a product's or a cart's
+    recommendations reads a handful of rows by primary key.
+
+    Checkout enqueues `recommendations.record_basket` in the order's
+    transaction; the job adds the basket's pairs and refreshes the top list
+    of just those products. `flask --app run recommendations rebuild`
+    recomputes both tables from purchase_items (backfill / repair).
+    Orders with more than RECOMMENDATIONS_MAX_BASKET products are left out:
+    they say little about what goes together and cost n² pairs.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RECOMMENDATIONS_TOP_K', 20)
+        app.config.setdefault('RECOMMENDATIONS_MAX_BASKET', 50)
+
+    def enqueue_basket(self, product_ids):
+        """Queue one order's products for counting, in the caller's transaction."""
+        if 1 < len(product_ids) <= current_app.config['RECOMMENDATIONS_MAX_BASKET']:
+            jobs.enqueue('recommendations.record_basket', product_ids=sorted(product_ids))
+
+    def record_basket(self, product_ids):
+        # Each statement is an atomic increment, so concurrent baskets never lose counts
+        increment(ProductPair, ['product_id', 'other_id'], [
+            {"product_id": a, "other_id": b, "orders": 1} for a in product_ids for b in product_ids if a != b
+        ], counters=('orders',))
+        self.refresh(product_ids)
+
+    def top_pairs(self, product_id):
+        # Read off the (product_id, orders, other_id) index, never the product's whole row of the matrix
+        return db.session.execute(
+            select(ProductPair.other_id, ProductPair.orders)
+            .where(ProductPair.product_id == product_id)
+            .order_by(ProductPair.orders.desc(), ProductPair.other_id.desc())
+            .limit(current_app.config['RECOMMENDATIONS_TOP_K'])
+        ).all()
+
+    def refresh(self, product_ids):
+        """Recompute the top list of `product_ids` from their pair counts."""
+        rows = []
+        for product_id in product_ids:
+            rows.extend({"product_id": product_id, "rank": rank, "related_id": other_id, "orders": orders}
+                        for rank, (other_id, orders) in enumerate(self.top_pairs(product_id), 1))
+        db.session.execute(delete(RelatedProduct).where(RelatedProduct.product_id.in_(product_ids)))
+        if rows:
+            db.session.execute(insert(RelatedProduct), rows)
+
+    def rebuild(self):
+        """Recount every pair from purchase history and recompute all top lists; the caller commits.
+
+        Baskets whose `recommendations.record_basket` job hasn't run yet are
+        counted here, so those jobs are marked done in the same transaction.
+        """
+        top_k = current_app.config['RECOMMENDATIONS_TOP_K']
+        jobs.supersede('recommendations.record_basket')
+        db.session.execute(delete(RelatedProduct))
+        db.session.execute(delete(ProductPair))
+
+        # Same basket rule as checkout; item_count is stored on the order
+        baskets = select(Purchase.id).where(
+            Purchase.item_count.between(2, current_app.config['RECOMMENDATIONS_MAX_BASKET']))
+        other = aliased(PurchaseItem)
+        db.session.execute(insert(ProductPair).from_select(
+            ['product_id', 'other_id', 'orders'],
+            select(PurchaseItem.product_id, other.product_id, func.count(func.distinct(PurchaseItem.purchase_id)))
+            .join(other, and_(other.purchase_id == PurchaseItem.purchase_id,
+                              other.product_id != PurchaseItem.product_id))
+            .where(PurchaseItem.purchase_id.in_(baskets))
+            .group_by(PurchaseItem.product_id, other.product_id)
+        ))
+
+        ranked = select(
+            ProductPair.product_id, ProductPair.other_id, ProductPair.orders,
+            func.row_number().over(
+                partition_by=ProductPair.product_id,
+                order_by=(ProductPair.orders.desc(), ProductPair.other_id.desc())
+            ).label('rank')
+        ).subquery()
+        db.session.execute(insert(RelatedProduct).from_select(
+            ['product_id', 'rank', 'related_id', 'orders'],
+            select(ranked.c.product_id, ranked.c.rank, ranked.c.other_id, ranked.c.orders)
+            .where(ranked.c.rank <= top_k)
+        ))
+
+    # --- Reading (what the endpoints serve) ---
+
+    def related(self, product_id, limit):
+        """Ids of the products most often bought with `product_id`, best first."""
+        return db.session.execute(
+            select(RelatedProduct.related_id)
+            .where(RelatedProduct.product_id == product_id, RelatedProduct.rank <= limit)
+            .order_by(RelatedProduct.rank)
+        ).scalars().all()
+
+    def for_products(self, product_ids, limit):
+        """Ids most often bought with any of `product_ids` (summed counts), excluding those."""
+        score = func.sum(RelatedProduct.orders)
+        return db.session.execute(
+            select(RelatedProduct.related_id)
+            .where(RelatedProduct.product_id.in_(product_ids),
+                   RelatedProduct.related_id.not_in(product_ids))
+            .group_by(RelatedProduct.related_id)
+            .order_by(score.desc(), RelatedProduct.related_id.desc())
+            .limit(limit)
+        ).scalars().all()
+
+    def products(self, ids):
+        """Product dicts for `ids` in that order, leaving out deleted and sold-out products."""
+        if not ids:
+            return []
+        rows = db.session.execute(
+            PRODUCT.select().where(Product.id.in_(ids), or_(Product.stock.is_(None), Product.stock > 0))
+        )
+        found = {item['id']: item for item in PRODUCT.dump_rows(rows)}
+        return [found[id] for id in ids if id in found]
+
+
+recommendations = Recommendations()
+
+
+@jobs.task('recommendations.record_basket')
+def record_basket_job(product_ids):
+    # Enqueued by checkout in its own transaction, so every order is counted exactly once
+    recommendations.record_basket(product_ids)
+
+
+@jobs.task('recommendations.rebuild')
+def rebuild_job():
+    # The queue commits the rebuild together with the job's status, if the job still holds its claim
+    recommendations.rebuild()
+
+
+# --- CLI: flask --app run recommendations rebuild ---
+
+recommendations_cli = AppGroup('recommendations', help="Frequently-bought-together tables.")
+
+
+@recommendations_cli.command('rebuild')
+def rebuild_command():
+    recommendations.rebuild()
+    db.session.commit()
+    pairs = db.session.query(func.count()).select_from(ProductPair).scalar()
+    products = db.session.query(func.count(func.distinct(RelatedProduct.product_id))).scalar()
+    click.echo(f"Counted {pairs} product pairs, recommendations for {products} products")
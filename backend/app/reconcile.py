@@ -0,0 +1,96 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+from app.analytics import sale_day
+from app.extensions import db
+from app.models import DailySales, Purchase, PurchaseItem
+from app.money import from_cents
+
+
+def order_totals(first_id, last_id):
+    # One grouped query per batch: {purchase_id: (total cents, line count)} from the line items
+    rows = db.session.execute(
+        select(PurchaseItem.purchase_id,
+               func.sum(PurchaseItem.quantity * PurchaseItem.price_at_purchase_cents),
+               func.count())
+        .where(PurchaseItem.purchase_id.between(first_id, last_id))
+        .group_by(PurchaseItem.purchase_id)
+    )
+    return {purchase_id: (total, lines) for purchase_id, total, lines in rows}
+
+
+def reconcile_orders(batch_size=1000, fix=False):
+    """Recompute every order's total and line count from its items, in id batches.
+
+    Yields (purchase id, unique code, stored total, computed total, stored
+    count, computed count) for each order that disagrees. With `fix` the
+    stored values are overwritten with the computed ones, one executemany
+    UPDATE (and commit) per batch.
+    """
+    last_id = 0
+    while True:
+        purchases = db.session.execute(
+            select(Purchase.id, Purchase.unique_code, Purchase.total_cents, Purchase.item_count)
+            .where(Purchase.id > last_id).order_by(Purchase.id).limit(batch_size)
+        ).all()
+        if not purchases:
+            break
+        computed = order_totals(purchases[0].id, purchases[-1].id)
+        mismatched = []
+        for purchase_id, code, total, count in purchases:
+            expected_total, expected_count = computed.get(purchase_id, (0, 0))
+            if (total, count) != (expected_total, expected_count):
+                mismatched.append((purchase_id, code, total, expected_total, count, expected_count))
+        if fix and mismatched:
+            db.session.execute(update(Purchase), [
+                {"id": m[0], "total_cents": m[3], "item_count": m[5]} for m in mismatched
+            ])
+            db.session.commit()
+        else:
+            db.session.rollback()
+        yield from mismatched
+        last_id = purchases[-1].id
+
+
+def reconcile_daily_sales():
+    """Days whose DailySales revenue differs from their orders: (day, stored, computed)."""
+    day = sale_day(Purchase.timestamp)
+    computed = dict(db.session.execute(
+        select(day, func.sum(PurchaseItem.quantity * PurchaseItem.price_at_purchase_cents))
+        .join(PurchaseItem, PurchaseItem.purchase_id == Purchase.id)
+        .group_by(day)
+    ).all())
+    # SQLite hands back func.date() as text
+    computed = {str(k): v for k, v in computed.items()}
+    stored = {d.isoformat(): revenue for d, revenue in
+              db.session.execute(select(DailySales.day, DailySales.revenue_cents)).all()}
+    db.session.rollback()
+    return [(d, stored.get(d, 0), computed.get(d, 0)) for d in sorted(set(stored) | set(computed))
+            if stored.get(d, 0) != computed.get(d, 0)]
+
+
+# --- CLI: flask --app run money reconcile ---
+
+money_cli = AppGroup('money', help="Order total checks.")
+
+
+@money_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help="Overwrite stored order totals with the recomputed ones.")
+@click.option('--batch-size', default=1000, show_default=True, help="Orders per query.")
+def reconcile_command(fix, batch_size):
+    """Recompute order totals from their line items and compare them with the stored ones."""
+    orders = 0
+    for purchase_id, code, total, expected, count, expected_count in reconcile_orders(batch_size, fix):
+        orders += 1
+        click.echo(f"Order {purchase_id} ({code}): total {from_cents(total):.2f} != {from_cents(expected):.2f}"
+                   f", items {count} != {expected_count}")
+    days = reconcile_daily_sales()
+    for day, revenue, expected in days:
+        click.echo(f"Day {day}: rollup revenue {from_cents(revenue):.2f} != {from_cents(expected):.2f}")
+    if orders and fix:
+        click.echo(f"Fixed {orders} orders")
+    if days:
+        click.echo("Rebuild the rollups with: flask --app run analytics rebuild")
+    if (orders and not fix) or days:
+        raise click.ClickException(f"{orders} orders and {len(days)} days do not reconcile")
+    click.echo("All order totals reconcile")
@@ -0,0 +1,162 @@
+import itertools
+import time
+from functools import wraps
+from flask import current_app, has_app_context, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.cache import MemoryCache, RedisCache
+from app.extensions import db
+
+# Writes to these tables pin every catalog read to the primary for a while
+CATALOG_TABLES = frozenset({'products', 'departments'})
+
+
+class ReplicaRouter:
+    """Read/write splitting between the primary database and DATABASE_REPLICA_URLS.
+
+    Views decorated with `@replicas.reads()` (catalog, order history,
+    analytics reports) run their SELECTs on a replica, round-robin per
+    request; all other requests, jobs and CLI commands only ever use the
+    primary. After a commit that wrote something, the writing user's reads
+    stay on the primary for DB_REPLICA_STICKY_SECONDS, so they see their own
+    order or cart change even if the replicas lag. A write to products or
+    departments does the same for every catalog read. The marks live in
+    Redis when CACHE_BACKEND=redis (shared by all workers), otherwise in
+    process memory.
+
+    If a replica query fails with a connection error, the view runs again
+    on the primary and that replica is left out for DB_REPLICA_RETRY_SECONDS.
+    """
+
+    def __init__(self, app=None):
+        self._counter = itertools.count()
+        # Replica engine -> time.monotonic() until which it is skipped
+        self._down = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DATABASE_REPLICA_URLS', ())
+        app.config.setdefault('DB_REPLICA_STICKY_SECONDS', 5.0)
+        app.config.setdefault('DB_REPLICA_RETRY_SECONDS', 30.0)
+        with app.app_context():
+            engines = db.engines
+        app.extensions['replicas'] = [engines[f'replica{i}'] for i in range(len(app.config['DATABASE_REPLICA_URLS']))]
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            store = RedisCache(app.config['CACHE_REDIS_URL'], prefix='market:primary-until:')
+        else:
+            store = MemoryCache(max_entries=100000)
+        app.extensions['replica_sticky'] = store
+
+        if not event.contains(Session, 'after_flush', _note_flush):
+            event.listen(Session, 'after_flush', _note_flush)
+            event.listen(Session, 'do_orm_execute', _note_dml)
+            event.listen(Session, 'after_commit', _pin_writers)
+            event.listen(Session, 'after_rollback', _discard_writes)
+
+    @property
+    def engines(self):
+        return current_app.extensions['replicas']
+
+    def reads(self):
+        """Run a read-only view against a replica unless the caller or the catalog was just written."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                replica = self.choose()
+                registry = current_app.extensions['metrics']
+                registry.inc('db_routed_requests_total', (('target', 'primary' if replica is None else 'replica'),))
+                if replica is None:
+                    return fn(*args, **kwargs)
+                session = db.session()
+                session.info['replica'] = replica
+                try:
+                    return fn(*args, **kwargs)
+                except OperationalError:
+                    current_app.logger.exception("Replica %s failed, retrying on the primary",
+                                                 replica.url.render_as_string())
+                    self._down[replica] = time.monotonic() + current_app.config['DB_REPLICA_RETRY_SECONDS']
+                    session.rollback()
+                    session.info.pop('replica', None)
+                    registry.inc('db_routed_requests_total', (('target', 'replica_failed'),))
+                    return fn(*args, **kwargs)
+                finally:
+                    session.info.pop('replica', None)
+            return wrapper
+        return decorator
+
+    def choose(self):
+        """The replica engine for this request, or None for the primary."""
+        engines = self.engines
+        if not engines or self.pinned():
+            return None
+        if self._down:
+            now = time.monotonic()
+            engines = [engine for engine in engines if self._down.get(engine, 0) <= now]
+            if not engines:
+                return None
+        return engines[next(self._counter) % len(engines)]
+
+    def pinned(self):
+        store = current_app.extensions['replica_sticky']
+        if store.get('catalog') is not None:
+            return True
+        user_id = current_identity()
+        return user_id is not None and store.get(f'user:{user_id}') is not None
+
+    def pin(self, keys):
+        ttl = current_app.config['DB_REPLICA_STICKY_SECONDS']
+        if not ttl:
+            return
+        store = current_app.extensions['replica_sticky']
+        for key in keys:
+            store.set(key, b'1', ttl=ttl)
+
+
+def current_identity():
+    # Only views behind @jwt_required() have a verified identity; public ones read as anonymous
+    if not has_request_context():
+        return None
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+# Pin after commit, not at flush: until then the write isn't on the primary either.
+
+def _note_flush(session, flush_context):
+    tables = session.info.setdefault('written_tables', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.add(obj.__table__.name)
+    session.info['wrote'] = True
+
+
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        session = orm_execute_state.session
+        table = getattr(orm_execute_state.statement, 'table', None)
+        session.info.setdefault('written_tables', set()).add(getattr(table, 'name', None))
+        session.info['wrote'] = True
+
+
+def _pin_writers(session):
+    tables = session.info.pop('written_tables', None)
+    session.info.pop('wrote', None)
+    if not tables or not has_app_context() or not current_app.extensions.get('replicas'):
+        return
+    keys = ['catalog'] if tables & CATALOG_TABLES else []
+    user_id = current_identity()
+    if user_id is not None:
+        keys.append(f'user:{user_id}')
+    replicas.pin(keys)
+
+
+def _discard_writes(session):
+    session.info.pop('written_tables', None)
+    session.info.pop('wrote', None)
+
+
+replicas = ReplicaRouter()
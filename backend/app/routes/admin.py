@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify
-from app.models import Product, Department
+import json
+from flask import Blueprint, Response, abort, current_app, request, jsonify, stream_with_context
+from app.models import Job, Product, Department, User
 from app.extensions import db
+from app.jobs import jobs
+from app.pagination import decode_cursor, encode_cursor, get_limit, is_int
+from app.serializers import JOB
 from app.utils import admin_required
-from flask_jwt_extended import jwt_required
+from app.search import search
+from app.cache import catalog_cache
+from app.changes import catalog_changes
+from app.catalog_io import detect_format, export_products, import_products, read_rows
+from app.images import ImageError, image_urls, images
+from app.money import to_cents
+from flask_jwt_extended import current_user, jwt_required
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -20,7 +30,11 @@ def create_department():
         
     dept = Department(name=data['name'])
     db.session.add(dept)
+    db.session.flush()
+    catalog_changes.record('department', 'created', [dept.id])
     db.session.commit()
+    search.index_department(dept)
+    catalog_cache.bump()
     return jsonify(id=dept.id, name=dept.name), 201
 
 @bp.route('/departments/<int:id>', methods=['PUT'])
@@ -30,7 +44,10 @@ def update_department(id):
     data = request.get_json()
     if data.get('name'):
         dept.name = data['name']
+        catalog_changes.record('department', 'updated', [id])
         db.session.commit()
+        search.index_department(dept)
+        catalog_cache.bump()
     return jsonify(id=dept.id, name=dept.name)
 
 @bp.route('/departments/<int:id>', methods=['DELETE'])
@@ -41,11 +58,26 @@ def delete_department(id):
     if dept.products:
         return jsonify(message="Cannot delete department with products"), 400
     db.session.delete(dept)
+    catalog_changes.record('department', 'deleted', [id])
     db.session.commit()
+    search.remove_department(id)
+    catalog_cache.bump()
     return '', 204
 
 # --- Product CRUD ---
 
+def valid_stock(value):
+    # None = stock not tracked
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value >= 0)
+
+def price_cents(value):
+    # Prices arrive as decimal amounts (12.99 or "12.99"); None if invalid
+    try:
+        cents = to_cents(value)
+    except ValueError:
+        return None
+    return cents if cents >= 0 else None
+
 @bp.route('/products', methods=['POST'])
 @admin_required()
 def create_product():
@@ -53,15 +85,25 @@ def create_product():
     required = ['name', 'price', 'department_id']
     if not data or not all(k in data for k in required):
         return jsonify(message="Missing required fields"), 400
+    if not valid_stock(data.get('stock')):
+        return jsonify(message="stock must be a non-negative integer or null"), 400
+    price = price_cents(data['price'])
+    if price is None:
+        return jsonify(message="price must be a non-negative amount"), 400
     
     product = Product(
         name=data['name'],
-        price=data['price'],
+        price_cents=price,
         department_id=data['department_id'],
-        image_url=data.get('image_url')
+        image_url=data.get('image_url'),
+        stock=data.get('stock')
     )
     db.session.add(product)
+    db.session.flush()
+    catalog_changes.record('product', 'created', [product.id])
     db.session.commit()
+    search.index_product(product)
+    catalog_cache.bump()
     return jsonify(id=product.id, name=product.name), 201
 
 @bp.route('/products/<int:id>', methods=['PUT'])
@@ -69,13 +111,27 @@ def create_product():
 def update_product(id):
     product = Product.query.get_or_404(id)
     data = request.get_json()
+    if not valid_stock(data.get('stock')):
+        return jsonify(message="stock must be a non-negative integer or null"), 400
+    price = price_cents(data['price']) if 'price' in data else None
+    if 'price' in data and price is None:
+        return jsonify(message="price must be a non-negative amount"), 400
     
     if 'name' in data: product.name = data['name']
-    if 'price' in data: product.price = data['price']
+    if price is not None: product.price_cents = price
     if 'department_id' in data: product.department_id = data['department_id']
+    # A new image_url replaces the stored copy; fetch it again with POST .../image/fetch
+    image_replaced = 'image_url' in data and data['image_url'] != product.image_url and product.image_hash is not None
     if 'image_url' in data: product.image_url = data['image_url']
+    if image_replaced: product.image_hash = None
+    if 'stock' in data: product.stock = data['stock']
+    catalog_changes.record('product', 'updated', [id])
     
     db.session.commit()
+    if image_replaced:
+        images.remove(id)
+    search.index_product(product)
+    catalog_cache.bump()
     return jsonify(id=product.id, name=product.name)
 
 @bp.route('/products/<int:id>', methods=['DELETE'])
@@ -83,5 +139,165 @@ def update_product(id):
 def delete_product(id):
     product = Product.query.get_or_404(id)
     db.session.delete(product)
+    catalog_changes.record('product', 'deleted', [id])
     db.session.commit()
+    images.remove(id)
+    search.remove_product(id)
+    catalog_cache.bump()
     return '', 204
+
+# --- Product images ---
+
+@bp.route('/products/<int:id>/image', methods=['POST'])
+@admin_required()
+def upload_product_image(id):
+    """Store an uploaded image (multipart field `image`, or the raw body) and its thumbnails."""
+    Product.query.get_or_404(id)
+    limit = current_app.config['IMAGE_MAX_BYTES'] + 1
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            return jsonify(message="image file is required"), 400
+        data = upload.stream.read(limit)
+    else:
+        data = request.stream.read(limit)
+    try:
+        image_hash = images.ingest(id, data)
+    except ImageError as e:
+        return jsonify(message=str(e)), 400
+    return jsonify(id=id, image_hash=image_hash, images=image_urls(id, image_hash))
+
+@bp.route('/products/<int:id>/image/fetch', methods=['POST'])
+@admin_required()
+def fetch_product_image(id):
+    """Download `url` (default: the product's image_url) in the background; poll GET /admin/jobs/<id>."""
+    product = Product.query.get_or_404(id)
+    data = request.get_json(silent=True) or {}
+    url = data.get('url') or product.image_url
+    if not isinstance(url, str) or not url.lower().startswith(('http://', 'https://')):
+        return jsonify(message="An http(s) url is required"), 400
+    job = jobs.enqueue('images.fetch', max_attempts=3, product_id=id, url=url)
+    db.session.commit()
+    return jsonify(job_id=job.id, status=job.status), 202
+
+@bp.route('/products/<int:id>/image', methods=['DELETE'])
+@admin_required()
+def delete_product_image(id):
+    product = Product.query.get_or_404(id)
+    product.image_hash = None
+    catalog_changes.record('product', 'updated', [id])
+    db.session.commit()
+    images.remove(id)
+    catalog_cache.bump()
+    return '', 204
+
+# --- Bulk import/export ---
+
+@bp.route('/products/import', methods=['POST'])
+@admin_required()
+def import_products_bulk():
+    fmt = detect_format(request.args.get('format'), request.content_type)
+    if fmt is None:
+        return jsonify(message="format must be csv or ndjson"), 400
+    chunk_size = max(1, min(request.args.get('chunk_size', 1000, type=int), 10000))
+
+    # Stream progress back as NDJSON, one line per committed chunk
+    def generate():
+        for progress in import_products(read_rows(request.stream, fmt), chunk_size):
+            yield json.dumps(progress) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@bp.route('/products/export', methods=['GET'])
+@admin_required()
+def export_products_bulk():
+    fmt = detect_format(request.args.get('format', 'csv'))
+    if fmt is None:
+        return jsonify(message="format must be csv or ndjson"), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(export_products(fmt)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
+
+# --- Users ---
+# Role changes and deletions invalidate the user's cached tokens on commit (app/identity.py)
+
+@bp.route('/users/<int:id>', methods=['PUT'])
+@admin_required()
+def update_user(id):
+    user = User.query.get_or_404(id)
+    if user.id == current_user.id:
+        return jsonify(message="Cannot change your own account"), 400
+    data = request.get_json()
+    if 'is_admin' in data:
+        user.is_admin = bool(data['is_admin'])
+        db.session.commit()
+    return jsonify(id=user.id, email=user.email, is_admin=user.is_admin)
+
+@bp.route('/users/<int:id>', methods=['DELETE'])
+@admin_required()
+def delete_user(id):
+    user = User.query.get_or_404(id)
+    if user.id == current_user.id:
+        return jsonify(message="Cannot delete your own account"), 400
+    if user.purchases:
+        return jsonify(message="Cannot delete user with orders"), 400
+    db.session.delete(user)
+    db.session.commit()
+    return '', 204
+
+# --- Background jobs ---
+
+JOB_STATUSES = ('queued', 'running', 'done', 'dead')
+
+@bp.route('/jobs', methods=['GET'])
+@admin_required()
+def list_jobs():
+    """Newest first; `?status=dead` is the dead-letter list."""
+    status = request.args.get('status')
+    if status is not None and status not in JOB_STATUSES:
+        return jsonify(message=f"status must be one of {', '.join(JOB_STATUSES)}"), 400
+    limit = get_limit(request.args)
+
+    query = JOB.select()
+    if status:
+        query = query.where(Job.status == status)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            (last_id,) = decode_cursor(cursor)
+        except ValueError:
+            return jsonify(message="Invalid cursor"), 400
+        if not is_int(last_id):
+            return jsonify(message="Invalid cursor"), 400
+        query = query.where(Job.id < last_id)
+
+    rows = JOB.dump_rows(db.session.execute(query.order_by(Job.id.desc()).limit(limit + 1)))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1]['id']) if has_more else None,
+        "limit": limit
+    })
+
+@bp.route('/jobs/<int:id>', methods=['GET'])
+@admin_required()
+def get_job(id):
+    row = db.session.execute(JOB.select().where(Job.id == id)).first()
+    if row is None:
+        abort(404)
+    return jsonify(JOB.dump_row(row))
+
+@bp.route('/jobs/<int:id>/retry', methods=['POST'])
+@admin_required()
+def retry_job(id):
+    if db.session.get(Job, id) is None:
+        abort(404)
+    if not jobs.retry(id):
+        db.session.rollback()
+        return jsonify(message="Only dead or queued jobs can be retried"), 409
+    db.session.commit()
+    jobs.wake()
+    row = db.session.execute(JOB.select().where(Job.id == id)).first()
+    return jsonify(JOB.dump_row(row))
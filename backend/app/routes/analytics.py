@@ -0,0 +1,150 @@
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func, select
+from app.models import DailyDepartmentSales, DailyProductSales, DailySales, Department, Product
+from app.extensions import db
+from app.jobs import jobs
+from app.money import from_cents
+from app.replicas import replicas
+from app.utils import admin_required
+
+bp = Blueprint('analytics', __name__, url_prefix='/admin/analytics')
+
+# All reports read the daily rollups, so they cost O(days x departments)
+# no matter how many purchase lines there are.
+
+def date_range(args):
+    # Defaults to the last 7 days (UTC, inclusive)
+    today = datetime.utcnow().date()
+    end = date.fromisoformat(args['to']) if args.get('to') else today
+    start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=6)
+    if start > end:
+        raise ValueError("'from' must not be after 'to'")
+    return start, end
+
+@bp.route('/revenue', methods=['GET'])
+@admin_required()
+@replicas.reads()
+def revenue():
+    try:
+        start, end = date_range(request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    group = request.args.get('group', 'day,department')
+    if group not in ('day', 'department', 'day,department'):
+        return jsonify(message="group must be day, department or day,department"), 400
+
+    keys = []
+    if 'day' in group:
+        keys.append(DailyDepartmentSales.day)
+    if 'department' in group:
+        keys += [DailyDepartmentSales.department_id, Department.name.label('department')]
+
+    rows = db.session.execute(
+        select(*keys,
+               func.sum(DailyDepartmentSales.units).label('units'),
+               func.sum(DailyDepartmentSales.revenue_cents).label('revenue'))
+        .join(Department, Department.id == DailyDepartmentSales.department_id)
+        .where(DailyDepartmentSales.day.between(start, end))
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    result = []
+    for row in rows:
+        data = dict(row._mapping)
+        if 'day' in data:
+            data['day'] = data['day'].isoformat()
+        data['revenue'] = from_cents(data['revenue'])
+        result.append(data)
+
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "group": group,
+        "rows": result
+    })
+
+@bp.route('/top-products', methods=['GET'])
+@admin_required()
+@replicas.reads()
+def top_products():
+    try:
+        start, end = date_range(request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    by = request.args.get('by', 'units')
+    if by not in ('units', 'revenue'):
+        return jsonify(message="by must be units or revenue"), 400
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    dept_id = request.args.get('department_id', type=int)
+
+    units = func.sum(DailyProductSales.units).label('units')
+    revenue = func.sum(DailyProductSales.revenue_cents).label('revenue')
+    query = (
+        select(DailyProductSales.product_id, units, revenue)
+        .where(DailyProductSales.day.between(start, end))
+        .group_by(DailyProductSales.product_id)
+        .order_by((units if by == 'units' else revenue).desc(), DailyProductSales.product_id)
+        .limit(limit)
+    )
+    if dept_id:
+        query = query.where(DailyProductSales.department_id == dept_id)
+    top = query.subquery()
+
+    rows = db.session.execute(
+        select(top.c.product_id, Product.name, Product.department_id, top.c.units, top.c.revenue)
+        .outerjoin(Product, Product.id == top.c.product_id)
+        .order_by((top.c.units if by == 'units' else top.c.revenue).desc(), top.c.product_id)
+    )
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "by": by,
+        "products": [{
+            "product_id": r.product_id,
+            "name": r.name,
+            "department_id": r.department_id,
+            "units": r.units,
+            "revenue": from_cents(r.revenue)
+        } for r in rows]
+    })
+
+@bp.route('/basket-size', methods=['GET'])
+@admin_required()
+@replicas.reads()
+def basket_size():
+    try:
+        start, end = date_range(request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+
+    days = db.session.execute(
+        select(DailySales.day, DailySales.orders, DailySales.units, DailySales.revenue_cents)
+        .where(DailySales.day.between(start, end))
+        .order_by(DailySales.day)
+    ).all()
+
+    orders = sum(d.orders for d in days)
+    units = sum(d.units for d in days)
+    revenue = sum(d.revenue_cents for d in days)
+    return jsonify({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "orders": orders,
+        "avg_units": round(units / orders, 2) if orders else 0,
+        "avg_revenue": round(from_cents(revenue) / orders, 2) if orders else 0,
+        "days": [{
+            "day": d.day.isoformat(),
+            "orders": d.orders,
+            "avg_units": round(d.units / d.orders, 2) if d.orders else 0,
+            "avg_revenue": round(from_cents(d.revenue_cents) / d.orders, 2) if d.orders else 0
+        } for d in days]
+    })
+
+@bp.route('/rebuild', methods=['POST'])
+@admin_required()
+def rebuild():
+    # Recomputing from full purchase history is slow; poll GET /admin/jobs/<id> for the result
+    job = jobs.enqueue('analytics.rebuild', max_attempts=1)
+    db.session.commit()
+    return jsonify(job_id=job.id, status=job.status), 202
@@ -1,11 +1,13 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, current_user, jwt_required
 from app.models import User
 from app.extensions import db
+from app.passwords import admission_control
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @bp.route('/register', methods=['POST'])
+@admission_control()
 def register():
     data = request.get_json()
     
@@ -24,6 +26,7 @@ def register():
     return jsonify({"message": "User registered successfully"}), 201
 
 @bp.route('/login', methods=['POST'])
+@admission_control()
 def login():
     data = request.get_json()
     
@@ -45,13 +48,9 @@ def login():
 @bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_me():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"message": "User not found"}), 404
-        
+    # Resolved through the identity cache; deleted users are rejected by jwt_required
     return jsonify({
-        "id": user.id,
-        "email": user.email,
-        "is_admin": user.is_admin
+        "id": current_user.id,
+        "email": current_user.email,
+        "is_admin": current_user.is_admin
     }), 200
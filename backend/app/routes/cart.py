@@ -1,90 +1,167 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, abort, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy.orm import joinedload
+from sqlalchemy import delete, select, update
+from app.carts import (CartError, cart_store, cart_summary, missing_products, parse_operation, parse_operations,
+                       parse_quantity)
 from app.models import CartItem, Product
 from app.extensions import db
+from app.pagination import get_limit
+from app.recommendations import recommendations
+from app.serializers import CART_ITEM
+from app.sqlite import write_queue
 
 bp = Blueprint('cart', __name__, url_prefix='/cart')
 
+def cart_items(user_id, fields=None):
+    # One joined query returning plain rows; subtotals are computed in SQL
+    rows = db.session.execute(
+        CART_ITEM.select().join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id).order_by(CartItem.id)
+    )
+    return CART_ITEM.dump_rows(rows, fields)
+
 @bp.route('', methods=['GET'])
 @jwt_required()
 def get_cart():
     user_id = get_jwt_identity()
-    # Use joinedload to fetch products in ONE query (fixes N+1 problem)
-    items = CartItem.query.filter_by(user_id=user_id).options(joinedload(CartItem.product)).all()
-    
-    return jsonify([{
-        "id": item.id,
-        "product_id": item.product_id,
-        "product_name": item.product.name,
-        "price": item.product.price,
-        "image_url": item.product.image_url,
-        "quantity": item.quantity,
-        "subtotal": item.product.price * item.quantity
-    } for item in items])
+    try:
+        fields = CART_ITEM.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    cart_store.flush(user_id)
+    return jsonify(cart_items(user_id, fields))
+
+@bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_cart_summary():
+    user_id = get_jwt_identity()
+    cart_store.flush(user_id)
+    return jsonify(cart_summary(user_id))
+
+@bp.route('/recommendations', methods=['GET'])
+@jwt_required()
+def get_cart_recommendations():
+    """Products often bought with what is in the cart, strongest overall first."""
+    user_id = get_jwt_identity()
+    cart_store.flush(user_id)
+    product_ids = db.session.execute(
+        select(CartItem.product_id).where(CartItem.user_id == user_id)
+    ).scalars().all()
+    limit = get_limit(request.args, default=10, maximum=50)
+    if not product_ids:
+        return jsonify({"items": []})
+    return jsonify({"items": recommendations.products(recommendations.for_products(product_ids, limit))})
+
+@bp.route('', methods=['PATCH'])
+@jwt_required()
+def patch_cart():
+    """Apply a batch of add/set/remove operations atomically, return the new cart."""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    try:
+        ops = parse_operations(data.get('operations'))
+    except CartError as e:
+        return jsonify(message=str(e)), 400
+    missing = missing_products(ops)
+    if missing:
+        return jsonify(message="Unknown products", product_ids=missing), 400
+
+    cart_store.apply(user_id, ops)
+    return jsonify(items=cart_items(user_id), **cart_summary(user_id))
+
+# Writes by cart item id run as jobs on the write queue (group-committed on
+# SQLite) and only touch the database through `conn`.
+
+def item_access(conn, user_id, id):
+    # 200 if the cart item belongs to user_id, else the status to reply with
+    owner = conn.execute(select(CartItem.user_id).where(CartItem.id == id)).scalar()
+    if owner is None:
+        return 404
+    return 200 if str(owner) == str(user_id) else 403
+
+def set_item_quantity(conn, user_id, id, quantity):
+    status = item_access(conn, user_id, id)
+    if status != 200:
+        return status
+    if quantity <= 0:
+        conn.execute(delete(CartItem).where(CartItem.id == id))
+    else:
+        conn.execute(update(CartItem).where(CartItem.id == id).values(quantity=quantity))
+    return 200
+
+def delete_item(conn, user_id, id):
+    status = item_access(conn, user_id, id)
+    if status != 200:
+        return status
+    conn.execute(delete(CartItem).where(CartItem.id == id))
+    return 204
+
+def delete_cart(conn, user_id):
+    conn.execute(delete(CartItem).where(CartItem.user_id == user_id))
 
 @bp.route('', methods=['POST'])
 @jwt_required()
 def add_to_cart():
     user_id = get_jwt_identity()
-    data = request.get_json()
-    
-    product_id = data.get('product_id')
-    quantity = data.get('quantity', 1)
+    data = request.get_json(silent=True) or {}
     
-    if not product_id:
+    if data.get('product_id') is None:
         return jsonify(message="product_id is required"), 400
+    # Same checks as a PATCH add, plus: adding takes a positive quantity
+    try:
+        op = parse_operation({'op': 'add', 'product_id': data['product_id'], 'quantity': data.get('quantity', 1)})
+        parse_quantity(op[2], minimum=1)
+    except CartError as e:
+        return jsonify(message=str(e)), 400
     
-    product = Product.query.get_or_404(product_id)
+    if db.session.get(Product, op[1]) is None:
+        abort(404)
     
-    item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-    if item:
-        item.quantity += quantity
-    else:
-        item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-        db.session.add(item)
-    
-    db.session.commit()
+    # Written back with the next cart read when a hot cart store is configured
+    cart_store.buffer(user_id, [op])
     return jsonify(message="Item added to cart"), 201
 
 @bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_cart_item(id):
     user_id = get_jwt_identity()
-    item = CartItem.query.get_or_404(id)
-    
-    if str(item.user_id) != str(user_id):
-        return jsonify(message="Unauthorized"), 403
-    
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     quantity = data.get('quantity')
-    
     if quantity is not None:
-        if quantity <= 0:
-            db.session.delete(item)
-        else:
-            item.quantity = quantity
-        db.session.commit()
-        
+        # Like a PATCH set: 0 removes the item
+        try:
+            parse_quantity(quantity, minimum=0)
+        except CartError as e:
+            return jsonify(message=str(e)), 400
+    
+    cart_store.flush(user_id)
+    if quantity is None:
+        status = item_access(db.session, user_id, id)
+    else:
+        status = write_queue.submit(set_item_quantity, user_id, id, quantity)
+    
+    if status == 404:
+        abort(404)
+    if status == 403:
+        return jsonify(message="Unauthorized"), 403
     return jsonify(message="Cart updated")
 
 @bp.route('/<int:id>', methods=['DELETE'])
 @jwt_required()
 def remove_from_cart(id):
     user_id = get_jwt_identity()
-    item = CartItem.query.get_or_404(id)
-    
-    if str(item.user_id) != str(user_id):
+    cart_store.flush(user_id)
+    status = write_queue.submit(delete_item, user_id, id)
+    if status == 404:
+        abort(404)
+    if status == 403:
         return jsonify(message="Unauthorized"), 403
-        
-    db.session.delete(item)
-    db.session.commit()
     return '', 204
 
 @bp.route('', methods=['DELETE'])
 @jwt_required()
 def clear_cart():
     user_id = get_jwt_identity()
-    CartItem.query.filter_by(user_id=user_id).delete()
-    db.session.commit()
+    cart_store.discard(user_id)
+    write_queue.submit(delete_cart, user_id)
     return '', 204
@@ -0,0 +1,69 @@
+import os
+from flask import Blueprint, abort, current_app, request, send_file
+from sqlalchemy import select
+from app.extensions import db
+from app.images import ORIGINAL_TYPES, VARIANT_TYPES, image_path, images
+from app.models import Product
+
+bp = Blueprint('images', __name__, url_prefix='/images')
+
+# Versioned URLs (?v=<hash>) never change content, so browsers and CDNs may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def current_image_hash(product_id):
+    # From the database, not a worker's catalog snapshot: right after an upload any
+    # worker's copy may still name the old hash, whose files are about to go
+    return db.session.execute(select(Product.image_hash).where(Product.id == product_id)).scalar()
+
+
+def find_image(product_id, image_hash, size):
+    """(path, mimetype, negotiated) of the best stored file for this request, or None."""
+    if size != 'original' and images.formats:
+        accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+        for fmt in images.formats:
+            # Only formats the client names explicitly; `*/*` gets the JPEG fallback
+            if fmt != 'jpeg' and VARIANT_TYPES[fmt] not in accepted:
+                continue
+            path = image_path(product_id, image_hash, size, fmt)
+            if os.path.isfile(path):
+                return path, VARIANT_TYPES[fmt], True
+    # Without Pillow (or for size=original) every size is the original
+    for ext, mimetype in ORIGINAL_TYPES.items():
+        path = image_path(product_id, image_hash, 'original', ext)
+        if os.path.isfile(path):
+            return path, mimetype, False
+    return None
+
+
+@bp.route('/<int:product_id>/<size>', methods=['GET'])
+def get_image(product_id, size):
+    """A product image from local disk, with ETag/Last-Modified and Range support.
+
+    `send_file` with a path hands the open file to the server's
+    wsgi.file_wrapper, so gunicorn sends it with sendfile() and the bytes
+    never pass through Python.
+    """
+    config = current_app.config
+    if size != 'original' and size not in config['IMAGE_SIZES']:
+        abort(404)
+    image_hash = current_image_hash(product_id)
+    if image_hash is None:
+        abort(404)
+    found = find_image(product_id, image_hash, size)
+    if found is None:
+        abort(404)
+    path, mimetype, negotiated = found
+
+    versioned = request.args.get('v') == image_hash
+    response = send_file(
+        path, mimetype=mimetype, conditional=True,
+        etag=f'{image_hash}-{size}-{os.path.basename(path)}',
+        max_age=IMMUTABLE_MAX_AGE if versioned else config['IMAGE_MAX_AGE'],
+    )
+    response.cache_control.public = True
+    if versioned:
+        response.cache_control.immutable = True
+    if negotiated:
+        response.vary.add('Accept')
+    return response
@@ -1,43 +1,283 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from sqlalchemy import select
 from app.models import Department, Product
+from app.extensions import db
+from app.serializers import DEPARTMENT, PRODUCT
+from app.search import search
+from app.cache import catalog_cache
+from app.changes import catalog_changes
+from app.money import to_cents
+from app.recommendations import recommendations
+from app.pagination import decode_cursor, encode_cursor, get_limit, is_int, keyset_filter, keyset_order
+from app.replicas import replicas
+from app.warmup import warmup
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({
+    # Not ready (503) until this worker's warm-up is done, so load balancers wait for it
+    state = warmup.state
+    if not state.ready:
+        return jsonify({
+            "status": "warming",
+            "message": "Supermarket API is starting"
+        }), 503
+    body = {
         "status": "healthy",
-        "message": "Supermarket API is running"
-    }), 200
+        "message": "Supermarket API is running",
+        "startup": current_app.extensions.get('startup', {})
+    }
+    if state.error:
+        body["warmup_error"] = state.error
+    return jsonify(body), 200
 
 @bp.route('/departments', methods=['GET'])
+@catalog_cache.cached()
+@replicas.reads()
 def get_departments():
-    depts = Department.query.all()
-    return jsonify([{"id": d.id, "name": d.name} for d in depts])
+    snapshot = warmup.snapshot()
+    if snapshot is not None:
+        return jsonify([d.to_dict() for d in snapshot.departments])
+    rows = db.session.execute(DEPARTMENT.select().order_by(Department.id))
+    return jsonify(DEPARTMENT.dump_rows(rows))
+
+# Sortable columns for the catalog; every one is paired with Product.id as a tie-breaker
+PRODUCT_SORTS = {
+    'id': Product.id,
+    'name': Product.name,
+    'price': Product.price_cents,
+}
+# What a cursor's last value must be for each sort (price in cents)
+PRODUCT_SORT_TYPES = {'id': int, 'name': str, 'price': int}
+
+def parse_price(args, name):
+    # Integer cents, None if absent; ValueError if it isn't an amount
+    value = args.get(name)
+    if value is None:
+        return None
+    try:
+        return to_cents(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an amount")
+
+def parse_department_ids(args):
+    # Accepts ?department_id=1&department_id=2 as well as ?department_id=1,2
+    ids = []
+    for value in args.getlist('department_id'):
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if not part.isdigit():
+                raise ValueError("department_id must be an integer")
+            ids.append(int(part))
+    return ids
+
+# ?format=columns: the page's products as column arrays ({"id": [...], "name": [...]}),
+# which spells each field name once and compresses better than a list of objects
+LIST_FORMATS = ('json', 'columns')
+
+def list_options(args):
+    """(fields, format) for a product list from ?fields= and ?format=; ValueError if invalid."""
+    fmt = args.get('format', 'json')
+    if fmt not in LIST_FORMATS:
+        raise ValueError(f"Invalid format, use one of: {', '.join(LIST_FORMATS)}")
+    return PRODUCT.parse_fields(args.get('fields')), fmt
+
+def product_list(rows, fields, fmt):
+    if fmt == 'columns':
+        return {"columns": PRODUCT.dump_columns(rows, fields)}
+    return {"items": PRODUCT.dump_rows(rows, fields)}
 
 @bp.route('/products', methods=['GET'])
+@catalog_cache.cached()
+@replicas.reads()
 def get_products():
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in PRODUCT_SORTS:
+        return jsonify(message=f"Invalid sort, use one of: {', '.join(PRODUCT_SORTS)}"), 400
+    sort_col = PRODUCT_SORTS[sort_key]
+
+    try:
+        dept_ids = parse_department_ids(request.args)
+        fields, fmt = list_options(request.args)
+        min_price = parse_price(request.args, 'min_price')
+        max_price = parse_price(request.args, 'max_price')
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    limit = get_limit(request.args)
+
+    query = PRODUCT.select()
+    if len(dept_ids) == 1:
+        query = query.where(Product.department_id == dept_ids[0])
+    elif dept_ids:
+        query = query.where(Product.department_id.in_(dept_ids))
+    if min_price is not None:
+        query = query.where(Product.price_cents >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price_cents <= max_price)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_sort, last_value, last_id = decode_cursor(cursor)
+        except ValueError:
+            return jsonify(message="Invalid cursor"), 400
+        # A cursor only makes sense for the ordering it was issued for
+        if cursor_sort != sort:
+            return jsonify(message="Cursor does not match sort"), 400
+        value_type = PRODUCT_SORT_TYPES[sort_key]
+        if not is_int(last_id) or not isinstance(last_value, value_type) \
+                or (value_type is int and not is_int(last_value)):
+            return jsonify(message="Invalid cursor"), 400
+        query = query.where(keyset_filter(sort_col, Product.id, last_value, last_id, descending))
+
+    # Fetch one extra row to know whether there is a next page without a COUNT(*)
+    query = query.order_by(*keyset_order(sort_col, Product.id, descending)).limit(limit + 1)
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        # From the raw row: the cursor compares against the stored value (cents for price)
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort_key), last.id)
+
+    return jsonify({
+        **product_list(rows, fields, fmt),
+        "next_cursor": next_cursor,
+        "limit": limit
+    })
+
+@bp.route('/products/search', methods=['GET'])
+@catalog_cache.cached()
+@replicas.reads()
+def search_products():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify(message="q is required"), 400
     dept_id = request.args.get('department_id', type=int)
-    if dept_id:
-        products = Product.query.filter_by(department_id=dept_id).all()
-    else:
-        products = Product.query.all()
-    
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "price": p.price,
-        "image_url": p.image_url,
-        "department_id": p.department_id
-    } for p in products])
+    limit = get_limit(request.args)
+    try:
+        fields, fmt = list_options(request.args)
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
 
-@bp.route('/products/<int:id>', methods=['GET'])
-def get_product(id):
-    p = Product.query.get_or_404(id)
+    # Ranked results have no stable sort key, so the cursor carries the offset
+    offset = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_q, offset = decode_cursor(cursor)
+            offset = int(offset)
+        except (TypeError, ValueError):
+            return jsonify(message="Invalid cursor"), 400
+        if offset < 0:
+            return jsonify(message="Invalid cursor"), 400
+        if cursor_q != q:
+            return jsonify(message="Cursor does not match query"), 400
+
+    ids = search.search(q, limit + 1, offset, dept_id)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+
+    rows = {}
+    if ids:
+        rows = {row.id: row for row in db.session.execute(PRODUCT.select().where(Product.id.in_(ids)))}
     return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "price": p.price,
-        "image_url": p.image_url,
-        "department_id": p.department_id
+        **product_list([rows[i] for i in ids if i in rows], fields, fmt),
+        "next_cursor": encode_cursor(q, offset + limit) if has_more else None,
+        "limit": limit
     })
+
+def parse_version(value):
+    # A catalog change version; None if absent, ValueError if malformed
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValueError("since must be a non-negative integer")
+    return int(value)
+
+@bp.route('/products/changes', methods=['GET'])
+def get_product_changes():
+    """Catalog changes after `since`, for clients that keep a local copy of the catalog.
+
+    Without `since` only the current version is returned: read it, load
+    the catalog, then follow changes from it. 410 means `since` is older
+    than the change log, so the client has to reload the catalog.
+    """
+    try:
+        since = parse_version(request.args.get('since'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    if since is None:
+        return jsonify({"version": catalog_changes.current_version(), "changes": [], "has_more": False})
+    result = catalog_changes.read(since, get_limit(request.args, default=500, maximum=1000))
+    if result is None:
+        return jsonify(message="since is no longer in the change log, reload the catalog",
+                       version=catalog_changes.current_version()), 410
+    changes, version, has_more = result
+    return jsonify({
+        "version": version,
+        "changes": [change.to_dict() for change in changes],
+        "has_more": has_more
+    })
+
+@bp.route('/products/changes/stream', methods=['GET'])
+def stream_product_changes():
+    """The same changes as Server-Sent Events; resumes from Last-Event-ID on reconnect."""
+    try:
+        since = parse_version(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    if since is None:
+        since = catalog_changes.current_version()
+    # Don't hold a pooled connection for the life of the stream
+    db.session.close()
+
+    slots = catalog_changes.feed.slots
+    if not slots.acquire(blocking=False):
+        response = jsonify(message="Too many open change streams, poll /products/changes instead")
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    response = Response(stream_with_context(catalog_changes.stream(since)), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the client left before the first event
+    response.call_on_close(slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx: pass events through instead of buffering the response
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/products/<int:id>', methods=['GET'])
+@catalog_cache.cached()
+@replicas.reads()
+def get_product(id):
+    try:
+        fields = PRODUCT.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    snapshot = warmup.snapshot()
+    if snapshot is not None:
+        product = snapshot.products.get(id)
+        if product is None:
+            abort(404)
+        return jsonify(product.to_dict(fields))
+    row = db.session.execute(PRODUCT.select().where(Product.id == id)).first()
+    if row is None:
+        abort(404)
+    return jsonify(PRODUCT.dump_row(row, fields))
+
+@bp.route('/products/<int:id>/related', methods=['GET'])
+# Counts move with every checkout, not with catalog writes: cache briefly
+@catalog_cache.cached(ttl=60)
+@replicas.reads()
+def get_related_products(id):
+    """Products most often bought together with this one."""
+    if db.session.execute(select(Product.id).where(Product.id == id)).first() is None:
+        abort(404)
+    limit = get_limit(request.args, default=10, maximum=current_app.config['RECOMMENDATIONS_TOP_K'])
+    return jsonify({"items": recommendations.products(recommendations.related(id, limit))})
@@ -1,86 +1,192 @@
-from flask import Blueprint, jsonify
+from datetime import datetime
+from flask import Blueprint, abort, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy.orm import joinedload
-from app.models import CartItem, Purchase, PurchaseItem
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from app.models import CartItem, Product, Purchase, PurchaseItem
 from app.extensions import db
+from app.serializers import PURCHASE, PURCHASE_ITEM, PURCHASE_SUMMARY
+from app.carts import cart_store
+from app.jobs import jobs
+from app.money import from_cents
+from app.recommendations import recommendations
+from app.replicas import replicas
+from app.pagination import decode_cursor, encode_cursor, get_limit, is_int, keyset_filter, keyset_order
 
 bp = Blueprint('orders', __name__, url_prefix='/orders')
 
+def checkout_response(purchase, status=201):
+    return jsonify({
+        "message": "Checkout successful",
+        "order_code": purchase.unique_code,
+        "total_price": from_cents(purchase.total_cents)
+    }), status
+
+def replay_checkout(user_id, key):
+    purchase = Purchase.query.filter_by(user_id=user_id, idempotency_key=key).first()
+    if purchase is None:
+        return None
+    response, status = checkout_response(purchase)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, status
+
 @bp.route('/checkout', methods=['POST'])
 @jwt_required()
 def checkout():
-    user_id = get_jwt_identity()
-    # Eager load products to avoid N+1
-    cart_items = CartItem.query.filter_by(user_id=user_id).options(joinedload(CartItem.product)).all()
-    
-    if not cart_items:
+    user_id = int(get_jwt_identity())
+    key = request.headers.get('Idempotency-Key')
+    if key is not None and not 0 < len(key) <= 64:
+        return jsonify(message="Idempotency-Key must be 1-64 characters"), 400
+
+    # A retry of a checkout that already went through gets the original order back
+    if key:
+        replay = replay_checkout(user_id, key)
+        if replay:
+            return replay
+
+    # Buffered cart operations (hot cart store) must reach the table first
+    cart_store.flush(user_id)
+
+    # Claim the whole cart in one statement. A concurrent checkout of the same
+    # cart blocks on this DELETE and then finds nothing left to buy.
+    claimed = db.session.execute(
+        delete(CartItem).where(CartItem.user_id == user_id)
+        .returning(CartItem.product_id, CartItem.quantity)
+    ).all()
+
+    if not claimed:
+        db.session.rollback()
+        if key:
+            replay = replay_checkout(user_id, key)
+            if replay:
+                return replay
         return jsonify(message="Cart is empty"), 400
-    
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
-    
-    # Create Purchase
-    purchase = Purchase(
-        user_id=user_id,
-        total_price=total_price
-    )
+
+    quantities = {}
+    for product_id, quantity in claimed:
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    # Reserve stock with an atomic conditional decrement per product (in id
+    # order, so concurrent checkouts lock rows in the same order). The
+    # RETURNING clause hands back the price to snapshot in the same round trip.
+    prices = {}
+    departments = {}
+    unavailable = []
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        row = db.session.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .where(or_(Product.stock.is_(None), Product.stock >= quantity))
+            .values(stock=Product.stock - quantity)
+            .returning(Product.price_cents, Product.department_id)
+        ).first()
+        if row is None:
+            unavailable.append(product_id)
+        else:
+            prices[product_id] = row.price_cents
+            departments[product_id] = row.department_id
+
+    if unavailable:
+        # Rolling back also puts the claimed cart rows back
+        db.session.rollback()
+        return jsonify(message="Some items are out of stock", product_ids=unavailable), 409
+
+    # Integer cents, so the total is exact and equals SUM(quantity * price) over the lines
+    total_cents = sum(prices[pid] * qty for pid, qty in quantities.items())
+
+    purchase = Purchase(user_id=user_id, total_cents=total_cents, idempotency_key=key or None,
+                        item_count=len(quantities))
     db.session.add(purchase)
     db.session.flush() # To get the purchase.id
-    
-    # Create PurchaseItems (Snapshots)
-    for cart_item in cart_items:
-        purchase_item = PurchaseItem(
-            purchase_id=purchase.id,
-            product_id=cart_item.product_id,
-            quantity=cart_item.quantity,
-            price_at_purchase=cart_item.product.price
-        )
-        db.session.add(purchase_item)
-        db.session.delete(cart_item) # Clear cart as we go
-        
-    db.session.commit()
-    
-    return jsonify({
-        "message": "Checkout successful",
-        "order_code": purchase.unique_code,
-        "total_price": purchase.total_price
-    }), 201
+
+    # Snapshot line items with a single executemany INSERT
+    db.session.execute(insert(PurchaseItem), [{
+        "purchase_id": purchase.id,
+        "product_id": pid,
+        "quantity": qty,
+        "price_at_purchase_cents": prices[pid]
+    } for pid, qty in quantities.items()])
+
+    # Follow-up work runs in the background; the job row commits (or rolls
+    # back) together with the order, so sales rollups and recommendation
+    # counts never drift
+    jobs.enqueue('analytics.record_purchase', day=purchase.timestamp.date().isoformat(), lines=[
+        (pid, departments[pid], qty, prices[pid]) for pid, qty in quantities.items()
+    ])
+    recommendations.enqueue_basket(list(quantities))
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Same idempotency key raced us and won - return its order instead
+        db.session.rollback()
+        replay = replay_checkout(user_id, key) if key else None
+        if replay:
+            return replay
+        raise
+
+    return checkout_response(purchase)
 
 @bp.route('', methods=['GET'])
 @jwt_required()
+@replicas.reads()
 def get_history():
     user_id = get_jwt_identity()
-    # Eager load items to avoid N+1 when counting
-    purchases = Purchase.query.filter_by(user_id=user_id).options(joinedload(Purchase.items)).order_by(Purchase.timestamp.desc()).all()
-    
-    return jsonify([{
-        "id": p.id,
-        "timestamp": p.timestamp.isoformat(),
-        "unique_code": p.unique_code,
-        "total_price": p.total_price,
-        "item_count": len(p.items)
-    } for p in purchases])
+    limit = get_limit(request.args)
+    try:
+        fields = PURCHASE_SUMMARY.parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify(message=str(e)), 400
+    # Newest first, read straight off the (user_id, timestamp) index
+    query = PURCHASE_SUMMARY.select().where(Purchase.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_timestamp, last_id = decode_cursor(cursor)
+            last_timestamp = datetime.fromisoformat(last_timestamp)
+        except (ValueError, TypeError):
+            return jsonify(message="Invalid cursor"), 400
+        if not is_int(last_id):
+            return jsonify(message="Invalid cursor"), 400
+        query = query.where(keyset_filter(Purchase.timestamp, Purchase.id, last_timestamp, last_id, descending=True))
+
+    # Fetch one extra row to know whether there is a next page without a COUNT(*)
+    query = query.order_by(*keyset_order(Purchase.timestamp, Purchase.id, descending=True)).limit(limit + 1)
+    rows = db.session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(last.timestamp.isoformat(), last.id)
+
+    return jsonify({
+        "items": PURCHASE_SUMMARY.dump_rows(rows, fields),
+        "next_cursor": next_cursor,
+        "limit": limit
+    })
 
 @bp.route('/<string:code>', methods=['GET'])
 @jwt_required()
+@replicas.reads()
 def get_order_details(code):
     user_id = get_jwt_identity()
-    # Eager load items and their products
-    purchase = Purchase.query.filter_by(unique_code=code).options(
-        joinedload(Purchase.items).joinedload(PurchaseItem.product)
-    ).first_or_404()
-    
+    purchase = db.session.execute(
+        PURCHASE.select().add_columns(Purchase.user_id).where(Purchase.unique_code == code)
+    ).first()
+    if purchase is None:
+        abort(404)
+
     if str(purchase.user_id) != str(user_id):
         return jsonify(message="Unauthorized"), 403
-        
-    return jsonify({
-        "id": purchase.id,
-        "timestamp": purchase.timestamp.isoformat(),
-        "unique_code": purchase.unique_code,
-        "total_price": purchase.total_price,
-        "items": [{
-            "product_name": item.product.name,
-            "quantity": item.quantity,
-            "price_at_purchase": item.price_at_purchase,
-            "subtotal": item.price_at_purchase * item.quantity
-        } for item in purchase.items]
-    })
+
+    items = db.session.execute(
+        PURCHASE_ITEM.select().join(Product, Product.id == PurchaseItem.product_id)
+        .where(PurchaseItem.purchase_id == purchase.id).order_by(PurchaseItem.id)
+    )
+    order = PURCHASE.dump_row(purchase[:len(PURCHASE.names)])
+    order["items"] = PURCHASE_ITEM.dump_rows(items)
+    return jsonify(order)
@@ -0,0 +1,433 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.changes import catalog_changes
+from app.extensions import db, primary_reads
+from app.models import Department, Product
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(value):
+    return TOKEN_RE.findall((value or '').lower())
+
+
+class PythonIndex:
+    """In-memory inverted index over product names and department names.
+
+    Terms are kept in a sorted list so prefix lookups are a bisect plus a
+    short scan. Department terms point at departments (not products), so
+    renaming a department touches one entry instead of every product in it.
+
+    The index lives in the worker process. Writes made here update it
+    directly; those of other workers arrive through the catalog change log,
+    which `sync` reads at most every CATALOG_CHANGES_SYNC_INTERVAL seconds
+    before a search (a full rebuild if the log no longer reaches back).
+    """
+
+    name = 'python'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self.version = 0
+        self._checked_at = 0.0
+        self._clear()
+
+    def _clear(self):
+        self._docs = {}            # product id -> (name, department_id, name tokens)
+        self._postings = {}        # name term -> set(product ids)
+        self._dept_terms = {}      # department id -> tokens
+        self._dept_postings = {}   # department term -> set(department ids)
+        self._by_dept = {}         # department id -> set(product ids)
+        self._terms = []           # sorted vocabulary of name + department terms
+
+    def _add_term(self, term):
+        i = bisect.bisect_left(self._terms, term)
+        if i == len(self._terms) or self._terms[i] != term:
+            self._terms.insert(i, term)
+
+    def _drop_term(self, term):
+        if term in self._postings or term in self._dept_postings:
+            return
+        i = bisect.bisect_left(self._terms, term)
+        if i < len(self._terms) and self._terms[i] == term:
+            del self._terms[i]
+
+    def _expand(self, prefix):
+        i = bisect.bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            yield self._terms[i]
+            i += 1
+
+    def rebuild(self):
+        with self._lock:
+            # Read first: a change committed during the rebuild is applied again, never missed
+            version = catalog_changes.current_version()
+            self._clear()
+            for dept_id, name in db.session.query(Department.id, Department.name):
+                self._set_department(dept_id, name)
+            for row in db.session.query(Product.id, Product.name, Product.department_id).yield_per(5000):
+                self._add(*row)
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def sync(self):
+        """Apply the changes logged since `version`, if CATALOG_CHANGES_SYNC_INTERVAL has passed."""
+        if time.monotonic() - self._checked_at < current_app.config['CATALOG_CHANGES_SYNC_INTERVAL']:
+            return
+        # One thread catches up; the others search what is indexed so far
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            has_more = True
+            while has_more:
+                result = catalog_changes.read(self.version)
+                if result is None:
+                    self.rebuild()
+                    return
+                changes, version, has_more = result
+                with self._lock:
+                    for change in changes:
+                        self._apply(change)
+                    self.version = version
+        finally:
+            self._sync_lock.release()
+
+    def _apply(self, change):
+        data = change.data
+        if change.type == 'product':
+            self._remove(change.id)
+            if data is not None:
+                self._add(change.id, data['name'], data['department_id'])
+        elif change.type == 'department':
+            self._set_department(change.id, data['name'] if data is not None else '')
+            if data is None:
+                self._dept_terms.pop(change.id, None)
+
+    def _add(self, product_id, name, department_id):
+        tokens = set(tokenize(name))
+        self._docs[product_id] = (name, department_id, tokens)
+        self._by_dept.setdefault(department_id, set()).add(product_id)
+        for term in tokens:
+            if term not in self._postings:
+                self._postings[term] = set()
+                self._add_term(term)
+            self._postings[term].add(product_id)
+
+    def _remove(self, product_id):
+        doc = self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        _, department_id, tokens = doc
+        self._by_dept.get(department_id, set()).discard(product_id)
+        for term in tokens:
+            ids = self._postings.get(term)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[term]
+                self._drop_term(term)
+
+    def _set_department(self, dept_id, name):
+        for term in self._dept_terms.pop(dept_id, ()):
+            ids = self._dept_postings[term]
+            ids.discard(dept_id)
+            if not ids:
+                del self._dept_postings[term]
+                self._drop_term(term)
+        tokens = set(tokenize(name))
+        self._dept_terms[dept_id] = tokens
+        for term in tokens:
+            if term not in self._dept_postings:
+                self._dept_postings[term] = set()
+                self._add_term(term)
+            self._dept_postings[term].add(dept_id)
+
+    def index_product(self, product_id, name, department_id):
+        with self._lock:
+            self._remove(product_id)
+            self._add(product_id, name, department_id)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._remove(product_id)
+
+    def index_department(self, dept_id, name):
+        with self._lock:
+            self._set_department(dept_id, name)
+
+    def remove_department(self, dept_id):
+        with self._lock:
+            self._set_department(dept_id, '')
+            self._dept_terms.pop(dept_id, None)
+
+    def search(self, query, limit, offset=0, department_id=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self.sync()
+        with self._lock:
+            scores = None
+            for term in terms:
+                # Every query term is treated as a prefix (typeahead); exact
+                # name hits beat prefix hits, which beat department hits
+                hits = {}
+                for t in self._expand(term):
+                    weight = 3 if t == term else 2
+                    for pid in self._postings.get(t, ()):
+                        if hits.get(pid, 0) < weight:
+                            hits[pid] = weight
+                    for dept_id in self._dept_postings.get(t, ()):
+                        for pid in self._by_dept.get(dept_id, ()):
+                            if pid not in hits:
+                                hits[pid] = 1
+                if scores is None:
+                    scores = hits
+                else:
+                    scores = {pid: s + hits[pid] for pid, s in scores.items() if pid in hits}
+                if not scores:
+                    return []
+            if department_id is not None:
+                scores = {pid: s for pid, s in scores.items() if self._docs[pid][1] == department_id}
+            ranked = heapq.nsmallest(
+                offset + limit, scores,
+                key=lambda pid: (-scores[pid], len(self._docs[pid][0]), pid)
+            )
+        return ranked[offset:]
+
+
+class Fts5Index:
+    """SQLite FTS5 virtual table kept in step with `products`.
+
+    The FTS rowid is the product id; `prefix` indexes make short typeahead
+    queries an index lookup instead of a term scan.
+
+    Admin writes update the table right after their own commit. So that a
+    crash in between can't leave it behind for good, `product_search_state`
+    records the catalog change log version the table is known to reflect:
+    `sync` (at most every CATALOG_CHANGES_SYNC_INTERVAL seconds, before a
+    search) re-indexes what the log lists since then, in one transaction
+    with the new version, and `is_stale` asks for a full rebuild when the
+    log no longer reaches back to it.
+    """
+
+    name = 'fts5'
+    table = 'product_search'
+    state_table = 'product_search_state'
+
+    def __init__(self):
+        self._sync_lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def create(self):
+        exists = db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+            {"name": self.table}
+        ).first()
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            "name, department, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')"
+        ))
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self.state_table} (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)"
+        ))
+        db.session.commit()
+        return not exists
+
+    def version(self, conn=None):
+        """The change log version the index reflects; None if it was never recorded."""
+        return (conn or db.session).execute(text(f"SELECT version FROM {self.state_table} WHERE id = 1")).scalar()
+
+    def _set_version(self, conn, version):
+        # Never backwards: another process may have synced further meanwhile
+        conn.execute(text(
+            f"INSERT INTO {self.state_table} (id, version) VALUES (1, :version) "
+            "ON CONFLICT (id) DO UPDATE SET version = excluded.version WHERE excluded.version > version"
+        ), {"version": version})
+
+    def is_stale(self):
+        version = self.version()
+        if version is None or not catalog_changes.in_log(version):
+            return True
+        indexed = db.session.execute(text(f"SELECT count(*) FROM {self.table}")).scalar()
+        return indexed != db.session.query(Product.id).count()
+
+    def rebuild(self):
+        # Read first: a change committed during the rebuild is applied again by `sync`, never missed
+        version = catalog_changes.current_version()
+        db.session.execute(text(f"DELETE FROM {self.table}"))
+        db.session.execute(text(
+            f"INSERT INTO {self.table} (rowid, name, department) "
+            "SELECT p.id, p.name, d.name FROM products p JOIN departments d ON d.id = p.department_id"
+        ))
+        db.session.execute(text(f"DELETE FROM {self.state_table}"))
+        self._set_version(db.session, version)
+        db.session.commit()
+        self._checked_at = time.monotonic()
+
+    def sync(self):
+        """Re-index the products and departments changed since `version()`, if the interval has passed."""
+        if time.monotonic() - self._checked_at < current_app.config['CATALOG_CHANGES_SYNC_INTERVAL']:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            with primary_reads():
+                version = self.version()
+                has_more = True
+                while has_more:
+                    result = catalog_changes.read(version) if version is not None else None
+                    if result is None:
+                        self.rebuild()
+                        return
+                    changes, next_version, has_more = result
+                    if next_version == version:
+                        return
+                    # Own connection: the re-indexed rows and the version commit together
+                    with db.engine.begin() as conn:
+                        for change in changes:
+                            self._apply(conn, change)
+                        self._set_version(conn, next_version)
+                    version = next_version
+        finally:
+            self._sync_lock.release()
+
+    def _apply(self, conn, change):
+        if change.type == 'product':
+            self._remove_product(conn, change.id)
+            if change.data is not None:
+                self._index_product(conn, change.id, change.data['name'], change.data['department_id'])
+        elif change.type == 'department' and change.data is not None:
+            self._index_department(conn, change.id, change.data['name'])
+
+    def _index_product(self, conn, product_id, name, department_id):
+        conn.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"), {"id": product_id})
+        conn.execute(text(
+            f"INSERT INTO {self.table} (rowid, name, department) "
+            "SELECT :id, :name, name FROM departments WHERE id = :dept_id"
+        ), {"id": product_id, "name": name, "dept_id": department_id})
+
+    def _remove_product(self, conn, product_id):
+        conn.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"), {"id": product_id})
+
+    def _index_department(self, conn, dept_id, name):
+        conn.execute(text(
+            f"UPDATE {self.table} SET department = :name "
+            "WHERE rowid IN (SELECT id FROM products WHERE department_id = :dept_id)"
+        ), {"name": name, "dept_id": dept_id})
+
+    def index_product(self, product_id, name, department_id):
+        self._index_product(db.session, product_id, name, department_id)
+        db.session.commit()
+
+    def remove_product(self, product_id):
+        self._remove_product(db.session, product_id)
+        db.session.commit()
+
+    def index_department(self, dept_id, name):
+        self._index_department(db.session, dept_id, name)
+        db.session.commit()
+
+    def remove_department(self, dept_id):
+        # Departments can only be deleted once empty, so nothing is indexed under them
+        pass
+
+    def search(self, query, limit, offset=0, department_id=None):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self.sync()
+        match = ' '.join(f'"{t}"*' for t in terms)
+        sql = f"SELECT s.rowid FROM {self.table} s"
+        params = {"match": match, "limit": limit, "offset": offset}
+        if department_id is not None:
+            sql += " JOIN products p ON p.id = s.rowid AND p.department_id = :dept_id"
+            params["dept_id"] = department_id
+        # Name matches weigh 10x department matches
+        sql += (f" WHERE {self.table} MATCH :match"
+                f" ORDER BY bm25({self.table}, 10.0, 1.0), s.rowid LIMIT :limit OFFSET :offset")
+        return [row[0] for row in db.session.execute(text(sql), params)]
+
+
+class ProductSearch:
+    """Picks the search backend per app (SEARCH_BACKEND = auto | fts5 | python).
+
+    The index is built lazily on first use so `create_app()` works before
+    the tables exist (e.g. in seed.py), and is stored per app. The FTS5
+    table is shared by all workers; the Python index is one per worker,
+    kept in step through the catalog change log (see `PythonIndex.sync`).
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SEARCH_BACKEND', 'auto')
+        app.extensions['product_search'] = None
+
+    @property
+    def backend(self):
+        backend = current_app.extensions['product_search']
+        if backend is None:
+            with self._lock:
+                backend = current_app.extensions['product_search']
+                if backend is None:
+                    backend = current_app.extensions['product_search'] = self._create_backend()
+        return backend
+
+    def _create_backend(self):
+        choice = current_app.config['SEARCH_BACKEND']
+        if choice in ('auto', 'fts5') and db.engine.dialect.name == 'sqlite':
+            index = Fts5Index()
+            try:
+                created = index.create()
+            except OperationalError:
+                # SQLite built without FTS5
+                db.session.rollback()
+                if choice == 'fts5':
+                    raise
+            else:
+                if created or index.is_stale():
+                    index.rebuild()
+                else:
+                    # Catch up on whatever the last process didn't get to index
+                    index.sync()
+                return index
+        index = PythonIndex()
+        index.rebuild()
+        return index
+
+    def search(self, query, limit, offset=0, department_id=None):
+        return self.backend.search(query, limit, offset, department_id)
+
+    def index_product(self, product):
+        self.backend.index_product(product.id, product.name, product.department_id)
+
+    def remove_product(self, product_id):
+        self.backend.remove_product(product_id)
+
+    def index_department(self, dept):
+        self.backend.index_department(dept.id, dept.name)
+
+    def remove_department(self, dept_id):
+        self.backend.remove_department(dept_id)
+
+    def rebuild(self):
+        self.backend.rebuild()
+
+    def reset(self):
+        current_app.extensions['product_search'] = None
+
+
+search = ProductSearch()
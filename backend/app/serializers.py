@@ -0,0 +1,182 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+from app.models import CartItem, Department, Job, Product, Purchase, PurchaseItem
+from app.money import from_cents
+
+try:
+    import orjson
+except ImportError:  # optional - stdlib json is used instead
+    orjson = None
+
+
+class Schema:
+    """The response shape of one resource, as a list of labelled SQL columns.
+
+    Hot list endpoints select `schema.columns` directly, so rows come back
+    as plain tuples (no ORM objects, no identity map) and `dump_rows` just
+    zips them with the field names.
+    """
+
+    def __init__(self, converters=None, **fields):
+        self.names = tuple(fields)
+        self.columns = tuple(expr.label(name) for name, expr in fields.items())
+        self.converters = converters or {}
+
+    def select(self):
+        return select(*self.columns)
+
+    def parse_fields(self, value):
+        """Field names for a sparse fieldset (`?fields=id,name`), in schema order; None for all.
+
+        Raises ValueError naming any unknown field.
+        """
+        if not value:
+            return None
+        requested = {name.strip() for name in value.split(',')} - {''}
+        unknown = requested.difference(self.names)
+        if unknown or not requested:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Use any of {', '.join(self.names)}")
+        return tuple(name for name in self.names if name in requested)
+
+    def _pick(self, fields):
+        # Positions of `fields` in a full row
+        return [self.names.index(name) for name in fields]
+
+    def dump_row(self, row, fields=None):
+        if fields is None:
+            data = dict(zip(self.names, row))
+        else:
+            data = {name: row[i] for name, i in zip(fields, self._pick(fields))}
+        for name, convert in self.converters.items():
+            if data.get(name) is not None:
+                data[name] = convert(data[name])
+        return data
+
+    def dump_rows(self, rows, fields=None):
+        names = self.names
+        if fields is None:
+            data = [dict(zip(names, row)) for row in rows]
+        else:
+            index = self._pick(fields)
+            data = [dict(zip(fields, [row[i] for i in index])) for row in rows]
+        # Column at a time: one tight loop per converted field instead of per-row lookups
+        for name, convert in self.converters.items():
+            if fields is not None and name not in fields:
+                continue
+            for item in data:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+        return data
+
+    def dump_columns(self, rows, fields=None):
+        """Rows as column arrays, {"id": [1, 2], "name": ["a", "b"]}: each key once, not once per row."""
+        columns = list(zip(*rows)) or [()] * len(self.names)
+        data = {}
+        for name in fields or self.names:
+            values = list(columns[self.names.index(name)])
+            convert = self.converters.get(name)
+            if convert is not None:
+                values = [None if value is None else convert(value) for value in values]
+            data[name] = values
+        return data
+
+
+def isoformat(value):
+    return value.isoformat()
+
+
+DEPARTMENT = Schema(
+    id=Department.id,
+    name=Department.name,
+)
+
+PRODUCT = Schema(
+    converters={'price': from_cents},
+    id=Product.id,
+    name=Product.name,
+    price=Product.price_cents,
+    image_url=Product.image_url,
+    image_hash=Product.image_hash,
+    department_id=Product.department_id,
+)
+
+# Select from CartItem joined to Product; the subtotal is computed by the database
+CART_ITEM = Schema(
+    converters={'price': from_cents, 'subtotal': from_cents},
+    id=CartItem.id,
+    product_id=CartItem.product_id,
+    product_name=Product.name,
+    price=Product.price_cents,
+    image_url=Product.image_url,
+    image_hash=Product.image_hash,
+    quantity=CartItem.quantity,
+    subtotal=Product.price_cents * CartItem.quantity,
+)
+
+PURCHASE = Schema(
+    converters={'timestamp': isoformat, 'total_price': from_cents},
+    id=Purchase.id,
+    timestamp=Purchase.timestamp,
+    unique_code=Purchase.unique_code,
+    total_price=Purchase.total_cents,
+)
+
+# Order history row: select from Purchase alone (item_count is stored on the row)
+PURCHASE_SUMMARY = Schema(
+    converters={'timestamp': isoformat, 'total_price': from_cents},
+    id=Purchase.id,
+    timestamp=Purchase.timestamp,
+    unique_code=Purchase.unique_code,
+    total_price=Purchase.total_cents,
+    item_count=Purchase.item_count,
+)
+
+JOB = Schema(
+    converters={'run_at': isoformat, 'created_at': isoformat, 'finished_at': isoformat},
+    id=Job.id,
+    name=Job.name,
+    status=Job.status,
+    attempts=Job.attempts,
+    max_attempts=Job.max_attempts,
+    run_at=Job.run_at,
+    created_at=Job.created_at,
+    finished_at=Job.finished_at,
+    last_error=Job.last_error,
+)
+
+# Select from PurchaseItem joined to Product
+PURCHASE_ITEM = Schema(
+    converters={'price_at_purchase': from_cents, 'subtotal': from_cents},
+    product_name=Product.name,
+    quantity=PurchaseItem.quantity,
+    price_at_purchase=PurchaseItem.price_at_purchase_cents,
+    subtotal=PurchaseItem.price_at_purchase_cents * PurchaseItem.quantity,
+)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """`jsonify` backed by orjson when it is installed.
+
+    Falls back to Flask's stdlib provider (and always for pretty-printed or
+    custom dumps arguments). Dates are written as ISO 8601 either way.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (date, datetime)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,174 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from app.extensions import db
+
+
+def is_file_sqlite(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+
+def apply_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+class SQLiteTuning:
+    """Connection pragmas for running a file-backed SQLite database under concurrent load.
+
+    WAL lets readers run alongside the (single) writer, synchronous=NORMAL
+    only fsyncs at checkpoints (a power cut can lose the last commits, never
+    corrupt the file), and busy_timeout makes a writer wait for the lock
+    instead of failing with "database is locked". In-memory databases and
+    other engines are left untouched.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_TUNING', True)
+        app.config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        app.config.setdefault('SQLITE_CACHE_SIZE_KB', 64 * 1024)
+        app.config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+        app.extensions['sqlite_pragmas'] = []
+        with app.app_context():
+            engine = db.engine
+        if not app.config['SQLITE_TUNING'] or not is_file_sqlite(engine):
+            return
+
+        pragmas = [
+            'PRAGMA journal_mode=WAL',
+            f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+            f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}",
+            # Negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size=-{int(app.config['SQLITE_CACHE_SIZE_KB'])}",
+            f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+            'PRAGMA temp_store=MEMORY',
+        ]
+        with app.app_context():
+            # SQLite read replicas (file copies standing in for real ones) get the same pragmas
+            engines = [e for e in db.engines.values() if is_file_sqlite(e)]
+        for engine in engines:
+            apply_pragmas(engine, pragmas)
+        app.extensions['sqlite_pragmas'] = pragmas
+
+
+class Writer:
+    """One writer thread per process that group-commits queued write jobs.
+
+    Jobs queued while a commit is in flight are run together in the next
+    `BEGIN IMMEDIATE` transaction, each under its own savepoint so a failing
+    job only rolls back itself. Requests then contend for SQLite's write lock
+    once per batch per process rather than once per request, and pay one
+    commit between them.
+
+    The writer has its own connection: request threads wait on it while
+    holding pooled connections, so sharing their pool could deadlock.
+    """
+
+    def __init__(self, url, pragmas, max_batch):
+        self.url = url
+        self.pragmas = pragmas
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._engine = None
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so each (gunicorn) worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._engine = create_engine(self.url, poolclass=StaticPool,
+                                             connect_args={'check_same_thread': False})
+                apply_pragmas(self._engine, self.pragmas)
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(self._queue,),
+                                 name='sqlite-writer', daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, fn, *args):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, fn, args))
+        return future.result()
+
+    def _run(self, jobs):
+        while True:
+            batch = [jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        done = []
+        try:
+            with self._engine.connect() as conn:
+                # Take the write lock up front; a deferred transaction could fail to upgrade
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+                for future, fn, args in batch:
+                    savepoint = conn.begin_nested()
+                    try:
+                        result = fn(conn, *args)
+                    except Exception as e:
+                        savepoint.rollback()
+                        future.set_exception(e)
+                    else:
+                        savepoint.commit()
+                        done.append((future, result))
+                conn.commit()
+        except Exception as e:
+            for future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in done:
+            future.set_result(result)
+
+
+class WriteQueue:
+    """Runs small write transactions, group-committed on file-backed SQLite.
+
+    `submit(fn, *args)` calls `fn(connection, *args)` inside a transaction,
+    commits it and returns fn's result (or raises its exception). With
+    SQLITE_WRITE_QUEUE on a SQLite file this goes through the process's
+    Writer thread; otherwise it runs inline on the request's session.
+    """
+
+    def init_app(self, app):
+        app.config.setdefault('SQLITE_WRITE_QUEUE', True)
+        app.config.setdefault('SQLITE_WRITE_BATCH', 64)
+        with app.app_context():
+            engine = db.engine
+        writer = None
+        if app.config['SQLITE_WRITE_QUEUE'] and is_file_sqlite(engine):
+            writer = Writer(engine.url, app.extensions['sqlite_pragmas'], app.config['SQLITE_WRITE_BATCH'])
+        app.extensions['write_queue'] = writer
+
+    def submit(self, fn, *args):
+        writer = current_app.extensions['write_queue']
+        if writer is not None:
+            return writer.submit(fn, *args)
+        try:
+            result = fn(db.session.connection(), *args)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+
+
+sqlite_tuning = SQLiteTuning()
+write_queue = WriteQueue()
@@ -1,14 +1,16 @@
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt, verify_jwt_in_request
+from flask_jwt_extended import current_user, verify_jwt_in_request
+from app.identity import identity_cache
 
 def admin_required():
     def wrapper(fn):
         @wraps(fn)
         def decorator(*args, **kwargs):
             verify_jwt_in_request()
-            claims = get_jwt()
-            if claims.get("is_admin"):
+            # Role from the identity cache rather than the token claim, confirmed against the
+            # users table, so a demotion applies at once in every worker
+            if current_user.is_admin and identity_cache.still_admin(current_user):
                 return fn(*args, **kwargs)
             else:
                 return jsonify(message="Admins only!"), 403
@@ -0,0 +1,237 @@
+import threading
+import time
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from app.cache import catalog_cache
+from app.changes import catalog_changes
+from app.extensions import db
+from app.models import Department, Product
+from app.search import search
+from app.serializers import DEPARTMENT, PRODUCT
+
+
+class Record:
+    """A row as a fixed set of attributes; subclasses set `schema` and __slots__ to its names.
+
+    Values are kept as selected (prices in cents); `to_dict` applies the
+    schema's converters like a fresh query would.
+    """
+    __slots__ = ()
+    schema = None
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def to_dict(self, fields=None):
+        return self.schema.dump_row([getattr(self, name) for name in self.__slots__], fields)
+
+
+class DepartmentRecord(Record):
+    __slots__ = DEPARTMENT.names
+    schema = DEPARTMENT
+
+
+class ProductRecord(Record):
+    __slots__ = PRODUCT.names
+    schema = PRODUCT
+
+
+class CatalogSnapshot:
+    """Departments and products as slotted records, valid for one catalog cache version
+    and catalog change log version.
+
+    A 100k-product catalog is a few tens of MB this way instead of hundreds
+    as ORM objects, and lookups never touch the database.
+    """
+    __slots__ = ('version', 'log_version', 'departments', 'products', 'build_seconds', 'checked_at', 'stale')
+
+    def __init__(self, version, log_version, departments, products, build_seconds):
+        self.version = version
+        self.log_version = log_version
+        self.departments = departments
+        self.products = products
+        self.build_seconds = build_seconds
+        # Last look at the change log (time.monotonic()) and what it found
+        self.checked_at = time.monotonic()
+        self.stale = False
+
+    @classmethod
+    def build(cls, version, previous=None):
+        # Versions first: a change during the build leaves the snapshot stale, not wrong
+        log_version = catalog_changes.latest(previous.log_version) if previous is not None else None
+        if log_version is None:
+            log_version = catalog_changes.latest(catalog_changes.current_version()) or 0
+        start = time.perf_counter()
+        departments = tuple(DepartmentRecord(*row) for row in
+                            db.session.execute(DEPARTMENT.select().order_by(Department.id)))
+        products = {row[0]: ProductRecord(*row) for row in
+                    db.session.execute(PRODUCT.select().order_by(Product.id))}
+        db.session.rollback()
+        return cls(version, log_version, departments, products, time.perf_counter() - start)
+
+    def is_current(self):
+        """Whether no other process has changed the catalog since the build, per the change log.
+
+        The log is read at most every CATALOG_CHANGES_SYNC_INTERVAL seconds.
+        """
+        if self.stale:
+            return False
+        now = time.monotonic()
+        if now - self.checked_at >= current_app.config['CATALOG_CHANGES_SYNC_INTERVAL']:
+            self.checked_at = now
+            self.stale = catalog_changes.latest(self.log_version) != self.log_version
+        return not self.stale
+
+
+class WarmupState:
+    __slots__ = ('ready', 'snapshot', 'rebuilding', 'error')
+
+    def __init__(self):
+        # Apps that never run a warm-up (tests, CLI) have nothing to wait for
+        self.ready = True
+        self.snapshot = None
+        self.rebuilding = False
+        self.error = None
+
+
+class Warmup:
+    """Startup warm-up, so a fresh worker's first requests aren't its slowest.
+
+    `run(app)` opens WARMUP_POOL_CONNECTIONS pooled connections (pragmas
+    applied, files mapped), builds the catalog snapshot and search index,
+    and renders WARMUP_PATHS once to fill the catalog cache. `/health`
+    answers 503 while it runs. gunicorn runs it in each worker before the
+    worker accepts requests; `python run.py` runs it in the background.
+
+    The snapshot answers /departments and /products/<id> cache misses. It
+    is tied to the catalog cache version, so an admin write (which bumps the
+    version) sends reads back to the database until a rebuild finishes in
+    the background. The cache version is per process with
+    CACHE_BACKEND=memory, so the snapshot also follows the catalog change
+    log, which every worker shares: a write made by another worker retires
+    it within CATALOG_CHANGES_SYNC_INTERVAL. With CACHE_BACKEND=null there
+    is no version to follow and the snapshot is off.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WARMUP_ENABLED', True)
+        app.config.setdefault('WARMUP_POOL_CONNECTIONS', 4)
+        app.config.setdefault('WARMUP_PATHS', ('/departments', '/products'))
+        app.extensions['warmup'] = WarmupState()
+
+    @property
+    def state(self):
+        return current_app.extensions['warmup']
+
+    def snapshot(self):
+        """The catalog snapshot if it matches the current catalog version, else None."""
+        state = self.state
+        snapshot = state.snapshot
+        if snapshot is None:
+            return None
+        if snapshot.version == catalog_cache.version() and snapshot.is_current():
+            return snapshot
+        self._rebuild_in_background(current_app._get_current_object())
+        return None
+
+    def start(self, app):
+        """Warm up in a background thread; /health reports not ready until it finishes."""
+        if not app.config['WARMUP_ENABLED']:
+            return
+        app.extensions['warmup'].ready = False
+        threading.Thread(target=self.run, args=(app,), name='warmup', daemon=True).start()
+
+    def run(self, app):
+        state = app.extensions['warmup']
+        if not app.config['WARMUP_ENABLED']:
+            return
+        state.ready = False
+        phases = {}
+        try:
+            with app.app_context():
+                for phase, step in (('pool', self._warm_pool), ('snapshot', self._build_snapshot),
+                                    ('search', self._warm_search), ('cache', self._warm_cache)):
+                    start = time.perf_counter()
+                    step(app)
+                    phases[phase] = time.perf_counter() - start
+        except Exception as e:
+            # A cold worker still serves; say so instead of staying out of rotation forever
+            state.error = f'{type(e).__name__}: {e}'
+            app.logger.exception("Warm-up failed")
+        finally:
+            record_startup(app, 'warmup', phases)
+            state.ready = True
+        app.logger.info("Warm-up done in %.0f ms (%s)", sum(phases.values()) * 1000,
+                        ', '.join(f'{k} {v * 1000:.0f} ms' for k, v in phases.items()))
+
+    @staticmethod
+    def _warm_pool(app):
+        pool = db.engine.pool
+        if not isinstance(pool, QueuePool):
+            return
+        # Hold them all at once, otherwise the pool hands back the same connection
+        connections = []
+        try:
+            for _ in range(min(app.config['WARMUP_POOL_CONNECTIONS'], pool.size())):
+                conn = db.engine.connect()
+                connections.append(conn)
+                conn.execute(text('SELECT 1'))
+        finally:
+            for conn in connections:
+                conn.close()
+
+    @staticmethod
+    def _build_snapshot(app):
+        if catalog_cache.store is None:
+            return
+        app.extensions['warmup'].snapshot = CatalogSnapshot.build(catalog_cache.version())
+
+    @staticmethod
+    def _warm_search(app):
+        search.backend
+
+    @staticmethod
+    def _warm_cache(app):
+        if catalog_cache.store is None:
+            return
+        client = app.test_client()
+        for path in app.config['WARMUP_PATHS']:
+            client.get(path)
+
+    def _rebuild_in_background(self, app):
+        state = app.extensions['warmup']
+        with self._lock:
+            if state.rebuilding:
+                return
+            state.rebuilding = True
+
+        def rebuild():
+            try:
+                with app.app_context():
+                    # Read the version first: a bump during the build leaves it stale, not wrong
+                    version = catalog_cache.version()
+                    state.snapshot = CatalogSnapshot.build(version, state.snapshot)
+            except Exception:
+                app.logger.exception("Catalog snapshot rebuild failed")
+            finally:
+                state.rebuilding = False
+
+        threading.Thread(target=rebuild, name='catalog-snapshot', daemon=True).start()
+
+
+def record_startup(app, stage, phases):
+    """Keep startup phase timings for /health and export them on /metrics."""
+    app.extensions.setdefault('startup', {})[stage] = {k: round(v, 4) for k, v in phases.items()}
+    registry = app.extensions['metrics']
+    for phase, seconds in phases.items():
+        registry.inc('app_startup_seconds', (('stage', stage), ('phase', phase)), seconds)
+
+
+warmup = Warmup()
@@ -0,0 +1,117 @@
+"""Micro-benchmark: authenticated request overhead with and without the identity cache.
+
+Times requests through the Flask test client against a throwaway SQLite
+file, once with AUTH_CACHE_TTL=0 (every request looks the caller up in the
+users table) and once with the cache on (app/identity.py). `/health` needs
+no token and is the baseline; "auth overhead" is each endpoint's latency
+above it.
+
+Run from backend/:  python bench/auth_bench.py --users 1000 --requests 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.jobs import jobs
+from app.models import User
+from seed import seed_synthetic
+
+ENDPOINTS = [
+    ('GET /health', '/health', None),
+    ('GET /auth/me', '/auth/me', 'user'),
+    ('GET /cart', '/cart', 'user'),
+    ('GET /admin/analytics/basket-size', '/admin/analytics/basket-size', 'admin'),
+]
+
+
+def build_app(db_path, cache_ttl, users):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        SQLALCHEMY_ECHO = False
+        METRICS_ENABLED = False
+        AUTH_CACHE_TTL = cache_ttl
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        if not db.session.query(User.id).first():
+            seed_synthetic(100, users, departments=5, seed=1)
+            admin = User(email='bench-admin@test.com', password_hash='x', is_admin=True)
+            db.session.add(admin)
+            db.session.commit()
+        admin_id = db.session.query(User.id).filter_by(is_admin=True).scalar()
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter_by(is_admin=False)]
+        tokens = {
+            'user': [create_access_token(identity=str(uid)) for uid in user_ids],
+            'admin': [create_access_token(identity=str(admin_id), additional_claims={'is_admin': True})],
+        }
+    return app, tokens
+
+
+def measure(app, path, tokens, requests):
+    client = app.test_client()
+    timings = []
+    for i in range(requests):
+        headers = {'Authorization': f'Bearer {tokens[i % len(tokens)]}'} if tokens else {}
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    # Median per request, in microseconds
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help="distinct shoppers (tokens) to rotate through")
+    parser.add_argument('--requests', type=int, default=2000, help="requests per endpoint and mode")
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'auth.db')
+        modes = {mode: build_app(db_path, ttl, args.users) for mode, ttl in (('no cache', 0), ('cache', 300))}
+        # Warm the cache (and SQLite's page cache) so both modes are measured steady-state
+        for app, tokens in modes.values():
+            for name, path, role in ENDPOINTS:
+                measure(app, path, tokens.get(role), len(tokens.get(role) or [None]))
+        # Alternate modes per endpoint so drift affects both alike
+        results = {mode: {} for mode in modes}
+        for name, path, role in ENDPOINTS:
+            for mode, (app, tokens) in modes.items():
+                results[mode][name] = measure(app, path, tokens.get(role), args.requests)
+        for app, _ in modes.values():
+            with app.app_context():
+                jobs.shutdown()
+                db.engine.dispose()
+
+    rows = []
+    for name, _, _ in ENDPOINTS:
+        before, after = results['no cache'][name], results['cache'][name]
+        rows.append({
+            "endpoint": name, "no_cache_us": round(before, 1), "cache_us": round(after, 1),
+            "auth_overhead_no_cache_us": round(before - results['no cache']['GET /health'], 1),
+            "auth_overhead_cache_us": round(after - results['cache']['GET /health'], 1),
+        })
+    if args.json:
+        print(json.dumps({"users": args.users, "requests": args.requests, "results": rows}, indent=2))
+        return
+    print(f"median of {args.requests} requests, {args.users} tokens")
+    print(f"{'endpoint':<36}{'no cache us':>13}{'cache us':>10}{'overhead before':>17}{'after':>8}")
+    for r in rows:
+        print(f"{r['endpoint']:<36}{r['no_cache_us']:>13.0f}{r['cache_us']:>10.0f}"
+              f"{r['auth_overhead_no_cache_us']:>17.0f}{r['auth_overhead_cache_us']:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
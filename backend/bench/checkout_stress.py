@@ -0,0 +1,169 @@
+"""Concurrent checkout stress test.
+
+Hammers POST /orders/checkout from many threads against a throwaway SQLite
+file and checks the invariants the checkout must keep under contention:
+
+* a cart is bought at most once, however many checkouts race for it
+* retries sharing an Idempotency-Key never create a second order
+* stock never goes negative and sold units match the stock taken
+* every order is counted once in the sales rollups (background jobs)
+
+Run from backend/:  python bench/checkout_stress.py --users 50 --threads 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.jobs import jobs
+from app.models import CartItem, DailySales, Department, Product, Purchase, PurchaseItem, User
+
+
+def build_app(path):
+    class StressConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_ECHO = False
+        # Writers queue behind each other instead of failing fast
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+    return create_app(StressConfig)
+
+
+def seed(app, users, scarce_stock):
+    with app.app_context():
+        db.create_all()
+        dept = Department(name='Stress')
+        db.session.add(dept)
+        db.session.flush()
+        # One scarce product everybody wants, one untracked product
+        scarce = Product(name='Scarce', price_cents=250, department_id=dept.id, stock=scarce_stock)
+        plenty = Product(name='Plenty', price_cents=125, department_id=dept.id)
+        db.session.add_all([scarce, plenty])
+        db.session.flush()
+
+        tokens = []
+        for i in range(users):
+            user = User(email=f'stress{i}@test.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add_all([
+                CartItem(user_id=user.id, product_id=scarce.id, quantity=1),
+                CartItem(user_id=user.id, product_id=plenty.id, quantity=3),
+            ])
+            tokens.append(create_access_token(identity=str(user.id)))
+        db.session.commit()
+        return tokens, scarce.id
+
+
+def run(app, tokens, threads, same_key):
+    results = []
+    lock = threading.Lock()
+
+    def worker(token, key):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        if key:
+            headers['Idempotency-Key'] = key
+        response = client.post('/orders/checkout', headers=headers)
+        with lock:
+            results.append((token, response.status_code, response.get_json()))
+
+    pool = []
+    for token in tokens:
+        key = str(uuid.uuid4()) if same_key else None
+        for _ in range(threads):
+            pool.append(threading.Thread(target=worker, args=(token, key)))
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def check(app, results, users, scarce_id, scarce_stock, same_key):
+    failures = []
+    with app.app_context():
+        orders_per_user = dict(db.session.query(Purchase.user_id, func.count(Purchase.id))
+                               .group_by(Purchase.user_id).all())
+        if any(n > 1 for n in orders_per_user.values()):
+            failures.append(f'cart bought more than once: {orders_per_user}')
+
+        scarce = db.session.get(Product, scarce_id)
+        sold = db.session.query(func.coalesce(func.sum(PurchaseItem.quantity), 0)) \
+            .filter(PurchaseItem.product_id == scarce_id).scalar()
+        if scarce.stock < 0:
+            failures.append(f'negative stock: {scarce.stock}')
+        if sold + scarce.stock != scarce_stock:
+            failures.append(f'stock leak: sold {sold} + left {scarce.stock} != {scarce_stock}')
+
+        expected_orders = min(users, scarce_stock)
+        if len(orders_per_user) != expected_orders:
+            failures.append(f'expected {expected_orders} orders, got {len(orders_per_user)}')
+
+        # Let the worker threads finish their jobs, drain the rest, then every order must be counted once
+        jobs.shutdown()
+        jobs.run_pending()
+        counted = db.session.query(func.coalesce(func.sum(DailySales.orders), 0)).scalar()
+        if counted != sum(orders_per_user.values()):
+            failures.append(f'rollups count {counted} orders, expected {sum(orders_per_user.values())}')
+
+    if same_key:
+        # Every request for a successful cart must have seen the same order code
+        codes = {}
+        for token, status, body in results:
+            if status == 201:
+                codes.setdefault(token, set()).add(body['order_code'])
+        if any(len(c) > 1 for c in codes.values()):
+            failures.append('idempotent retries returned different orders')
+
+    unexpected = [s for _, s, _ in results if s not in (201, 400, 409)]
+    if unexpected:
+        failures.append(f'unexpected statuses: {sorted(set(unexpected))}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--threads', type=int, default=6, help='concurrent checkouts per cart')
+    parser.add_argument('--stock', type=int, default=25, help='units of the scarce product')
+    args = parser.parse_args()
+
+    ok = True
+    for same_key in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = build_app(os.path.join(tmp, 'stress.db'))
+            tokens, scarce_id = seed(app, args.users, args.stock)
+            results, elapsed = run(app, tokens, args.threads, same_key)
+            failures = check(app, results, args.users, scarce_id, args.stock, same_key)
+            with app.app_context():
+                jobs.shutdown()
+                db.engine.dispose()
+
+        statuses = {}
+        for _, status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        mode = 'shared Idempotency-Key' if same_key else 'no Idempotency-Key'
+        print(f'[{mode}] {len(results)} checkouts in {elapsed:.2f}s '
+              f'({len(results) / elapsed:.0f} req/s) statuses={statuses}')
+        for failure in failures:
+            print(f'  FAIL: {failure}')
+        ok = ok and not failures
+
+    print('OK' if ok else 'FAILED')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""Load test / benchmark harness for the whole API.
+
+Seeds a synthetic catalog and shoppers (seed.seed_synthetic) into a
+throwaway SQLite file, then runs a weighted mix of shopper actions -
+browse, search, product detail, add-to-cart, view cart, checkout, order
+history - from concurrent virtual users for a fixed duration.
+
+Transports:
+  client  Flask test client, in process (no network, no server overhead)
+  http    real HTTP/1.1 keep-alive connections against a threaded local
+          WSGI server started by the harness, or against --url
+
+Per endpoint it reports p50/p95/p99 latency, requests per second and SQL
+queries per request, and can write/compare JSON results between runs:
+
+  python bench/load_test.py --products 20000 --users 20 --duration 10 --out base.json
+  python bench/load_test.py --products 20000 --users 20 --duration 10 --compare base.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g
+from sqlalchemy import event
+from werkzeug.serving import make_server
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Product
+from seed import ADJECTIVES, NOUNS, seed_synthetic
+
+PASSWORD = 'password123'
+
+# name -> weight; roughly what a grocery storefront sees
+WORKLOAD = {
+    'browse': 30,
+    'search': 15,
+    'product': 15,
+    'departments': 5,
+    'add_to_cart': 18,
+    'cart': 8,
+    'checkout': 5,
+    'orders': 4,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def install_query_counter(app):
+    """Count SQL statements per request and report them in X-Query-Count."""
+    with app.app_context():
+        engine = db.engine
+    local = threading.local()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(*args):
+        local.queries = getattr(local, 'queries', 0) + 1
+
+    @app.before_request
+    def reset_queries():
+        g._bench_start_queries = getattr(local, 'queries', 0)
+
+    @app.after_request
+    def report_queries(response):
+        response.headers['X-Query-Count'] = str(getattr(local, 'queries', 0) - g._bench_start_queries)
+        return response
+
+
+class ClientTransport:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        client = self.app.test_client()
+
+        def request(method, path, body=None, headers=None):
+            response = client.open(path, method=method, json=body, headers=headers or {})
+            return response.status_code, response.get_json(silent=True), response.headers.get('X-Query-Count')
+        return request
+
+
+class HttpTransport:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    def session(self):
+        # One keep-alive connection per virtual user
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+        def request(method, path, body=None, headers=None):
+            headers = dict(headers or {})
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            for attempt in (1, 2):
+                try:
+                    conn.request(method, path, body=payload, headers=headers)
+                    response = conn.getresponse()
+                    raw = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    conn.close()
+                    if attempt == 2:
+                        raise
+            try:
+                data = json.loads(raw) if raw else None
+            except ValueError:
+                data = None
+            return response.status, data, response.getheader('X-Query-Count')
+        return request
+
+
+class VirtualUser:
+    def __init__(self, request, email, product_ids, terms, rng):
+        self.request = request
+        self.product_ids = product_ids
+        self.terms = terms
+        self.rng = rng
+        status, data, _ = request('POST', '/auth/login', {"email": email, "password": PASSWORD})
+        if status != 200:
+            raise RuntimeError(f"login failed for {email}: {status}")
+        self.headers = {'Authorization': f"Bearer {data['access_token']}"}
+
+    def browse(self):
+        params = {'limit': 50}
+        if self.rng.random() < 0.5:
+            params['sort'] = self.rng.choice(['price', '-price', 'name'])
+        status, data, queries = self.request('GET', '/products?' + urlencode(params))
+        yield 'GET /products', status, queries
+        # Some shoppers scroll a page or two further
+        for _ in range(self.rng.choice([0, 0, 1, 2])):
+            if not data or not data.get('next_cursor'):
+                break
+            params['cursor'] = data['next_cursor']
+            status, data, queries = self.request('GET', '/products?' + urlencode(params))
+            yield 'GET /products (next page)', status, queries
+
+    def search(self):
+        term = self.rng.choice(self.terms)
+        q = term[:self.rng.randint(2, len(term))]
+        status, _, queries = self.request('GET', '/products/search?' + urlencode({'q': q, 'limit': 20}))
+        yield 'GET /products/search', status, queries
+
+    def product(self):
+        status, _, queries = self.request('GET', f'/products/{self.rng.choice(self.product_ids)}')
+        yield 'GET /products/<id>', status, queries
+
+    def departments(self):
+        status, _, queries = self.request('GET', '/departments')
+        yield 'GET /departments', status, queries
+
+    def add_to_cart(self):
+        body = {"product_id": self.rng.choice(self.product_ids), "quantity": self.rng.randint(1, 3)}
+        status, _, queries = self.request('POST', '/cart', body, self.headers)
+        yield 'POST /cart', status, queries
+
+    def cart(self):
+        status, _, queries = self.request('GET', '/cart', headers=self.headers)
+        yield 'GET /cart', status, queries
+
+    def checkout(self):
+        headers = dict(self.headers, **{'Idempotency-Key': str(uuid.uuid4())})
+        status, _, queries = self.request('POST', '/orders/checkout', headers=headers)
+        yield 'POST /orders/checkout', status, queries
+
+    def orders(self):
+        status, _, queries = self.request('GET', '/orders', headers=self.headers)
+        yield 'GET /orders', status, queries
+
+
+def run_workload(transport, users, product_ids, duration, seed):
+    actions = list(WORKLOAD)
+    weights = [WORKLOAD[a] for a in actions]
+    samples = []
+    errors = []
+    lock = threading.Lock()
+    deadline = [None]
+    # The clock starts once every virtual user has logged in
+    ready = threading.Barrier(users + 1, action=lambda: deadline.__setitem__(0, time.perf_counter() + duration))
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        request = transport.session()
+        try:
+            user = VirtualUser(request, f'shopper{index}@test.com', product_ids,
+                               [n.lower() for n in NOUNS + ADJECTIVES], rng)
+        finally:
+            ready.wait()
+        local = []
+        while time.perf_counter() < deadline[0]:
+            action = rng.choices(actions, weights)[0]
+            steps = getattr(user, action)()
+            while True:
+                start = time.perf_counter()
+                try:
+                    endpoint, status, queries = next(steps)
+                except StopIteration:
+                    break
+                except Exception as e:  # keep going, but report it
+                    with lock:
+                        errors.append(f'{action}: {e!r}')
+                    break
+                local.append((endpoint, time.perf_counter() - start, status,
+                              int(queries) if queries is not None else None))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    ready.wait()
+    start = deadline[0] - duration
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start, errors
+
+
+def summarize(samples, elapsed):
+    by_endpoint = {}
+    for endpoint, latency, status, queries in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, status, queries))
+
+    results = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(r[0] * 1000 for r in rows)
+        queries = [r[2] for r in rows if r[2] is not None]
+        results[endpoint] = {
+            "requests": len(rows),
+            "rps": round(len(rows) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries_per_request": round(statistics.mean(queries), 2) if queries else None,
+            "errors": sum(1 for r in rows if r[1] >= 500),
+            "statuses": dict(sorted(
+                (str(s), sum(1 for r in rows if r[1] == s)) for s in {r[1] for r in rows}
+            )),
+        }
+    all_latencies = sorted(s[1] * 1000 for s in samples)
+    total = {
+        "requests": len(samples),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(all_latencies, 50), 3),
+        "p95_ms": round(percentile(all_latencies, 95), 3),
+        "p99_ms": round(percentile(all_latencies, 99), 3),
+    }
+    return results, total
+
+
+def print_report(report, baseline=None):
+    print(f"transport={report['config']['transport']} users={report['config']['users']} "
+          f"duration={report['elapsed_s']}s products={report['config']['products']}")
+    header = f"{'endpoint':<28}{'reqs':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>7}{'5xx':>5}"
+    if baseline:
+        header += f"{'Δp95':>9}{'Δrps':>9}"
+    print(header)
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for endpoint, r in rows:
+        qpr = r.get('queries_per_request')
+        line = (f"{endpoint:<28}{r['requests']:>7}{r['rps']:>9.1f}{r['p50_ms']:>9.2f}"
+                f"{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{(f'{qpr:.1f}' if qpr is not None else '-'):>7}"
+                f"{r.get('errors', 0):>5}")
+        if baseline:
+            base = baseline['total'] if endpoint == 'TOTAL' else baseline['endpoints'].get(endpoint)
+            if base:
+                dp95 = (r['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+                drps = (r['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0
+                line += f"{dp95:>+8.1f}%{drps:>+8.1f}%"
+        print(line)
+    if report['errors']:
+        print(f"{len(report['errors'])} client errors, first: {report['errors'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    parser.add_argument('--url', help="benchmark an already running server (implies --transport http, "
+                                      "its database must contain the same shoppers, see seed.py --users)")
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=10, help="concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="write JSON results to this file")
+    parser.add_argument('--compare', help="JSON results of a previous run to diff against")
+    args = parser.parse_args()
+    if args.url:
+        args.transport = 'http'
+
+    tmp = tempfile.TemporaryDirectory()
+    server = app = None
+    try:
+        if args.url:
+            transport = HttpTransport(args.url)
+            # Product ids are only needed to pick random products; assume a dense range
+            product_ids = list(range(1, args.products + 1))
+        else:
+            class LoadTestConfig(Config):
+                SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp.name, 'loadtest.db')}"
+                SQLALCHEMY_ECHO = False
+                SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+            app = create_app(LoadTestConfig)
+            install_query_counter(app)
+            with app.app_context():
+                seed_synthetic(args.products, args.users, departments=10, password=PASSWORD, seed=args.seed)
+                product_ids = [pid for (pid,) in db.session.query(Product.id)]
+
+            if args.transport == 'http':
+                logging.getLogger('werkzeug').setLevel(logging.ERROR)
+                server = make_server('127.0.0.1', 0, app, threaded=True)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                transport = HttpTransport(f'http://127.0.0.1:{server.server_port}')
+            else:
+                transport = ClientTransport(app)
+
+        samples, elapsed, errors = run_workload(transport, args.users, product_ids, args.duration, args.seed)
+    finally:
+        if server:
+            server.shutdown()
+        if app:
+            with app.app_context():
+                jobs.shutdown()
+        tmp.cleanup()
+
+    endpoints, total = summarize(samples, elapsed)
+    report = {
+        "config": {k: getattr(args, k) for k in ('transport', 'url', 'products', 'users', 'duration', 'seed')},
+        "elapsed_s": round(elapsed, 2),
+        "endpoints": endpoints,
+        "total": total,
+        "errors": errors[:20],
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
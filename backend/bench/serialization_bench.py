@@ -0,0 +1,168 @@
+"""Micro-benchmark: ORM objects + stdlib json vs column tuples + Schema + fast JSON.
+
+For each hot list endpoint it times building the response body both ways:
+
+* legacy - ORM query (identity map, lazy attributes), dicts built by hand,
+  encoded with stdlib json (what the routes did before app/serializers.py)
+* schema - the route's column select from app/serializers.py, encoded by
+  FastJSONProvider (orjson when installed, stdlib otherwise)
+
+Run from backend/:  python bench/serialization_bench.py --products 20000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.models import CartItem, Department, Product, Purchase, PurchaseItem, User
+from app.money import from_cents
+from app.serializers import CART_ITEM, DEPARTMENT, PRODUCT, PURCHASE_SUMMARY, orjson
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ECHO = False
+
+
+def seed(products, cart_items, orders):
+    depts = [Department(name=f'Dept {i}') for i in range(20)]
+    db.session.add_all(depts)
+    db.session.flush()
+    db.session.execute(Product.__table__.insert(), [{
+        'name': f'Product {i}', 'price_cents': 50 + (i % 400) * 10,
+        'department_id': depts[i % 20].id,
+        'image_url': f'https://images.example.com/products/{i}.jpg?w=400&h=400&fit=crop'
+    } for i in range(products)])
+    user = User(email='bench@test.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all(CartItem(user_id=user.id, product_id=i + 1, quantity=2) for i in range(cart_items))
+    for n in range(orders):
+        purchase = Purchase(user_id=user.id, total_cents=1000, item_count=5)
+        db.session.add(purchase)
+        db.session.flush()
+        db.session.add_all(PurchaseItem(purchase_id=purchase.id, product_id=i + 1, quantity=1,
+                                        price_at_purchase_cents=100) for i in range(5))
+    db.session.commit()
+    return user.id
+
+
+def legacy_products(limit, user_id):
+    products = Product.query.order_by(Product.id).limit(limit).all()
+    return json.dumps({"items": [{
+        "id": p.id, "name": p.name, "price": from_cents(p.price_cents),
+        "image_url": p.image_url, "image_hash": p.image_hash, "department_id": p.department_id
+    } for p in products]})
+
+
+def schema_products(limit, user_id):
+    rows = db.session.execute(PRODUCT.select().order_by(Product.id).limit(limit))
+    return current_app.json.dumps({"items": PRODUCT.dump_rows(rows)})
+
+
+def legacy_departments(limit, user_id):
+    return json.dumps([{"id": d.id, "name": d.name} for d in Department.query.all()])
+
+
+def schema_departments(limit, user_id):
+    rows = db.session.execute(DEPARTMENT.select().order_by(Department.id))
+    return current_app.json.dumps(DEPARTMENT.dump_rows(rows))
+
+
+def legacy_cart(limit, user_id):
+    items = CartItem.query.filter_by(user_id=user_id).options(joinedload(CartItem.product)).all()
+    return json.dumps([{
+        "id": item.id, "product_id": item.product_id, "product_name": item.product.name,
+        "price": from_cents(item.product.price_cents), "image_url": item.product.image_url,
+        "image_hash": item.product.image_hash,
+        "quantity": item.quantity, "subtotal": from_cents(item.product.price_cents * item.quantity)
+    } for item in items])
+
+
+def schema_cart(limit, user_id):
+    rows = db.session.execute(
+        CART_ITEM.select().join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id).order_by(CartItem.id)
+    )
+    return current_app.json.dumps(CART_ITEM.dump_rows(rows))
+
+
+def legacy_orders(limit, user_id):
+    purchases = Purchase.query.filter_by(user_id=user_id).options(joinedload(Purchase.items)) \
+        .order_by(Purchase.timestamp.desc()).all()
+    return json.dumps([{
+        "id": p.id, "timestamp": p.timestamp.isoformat(), "unique_code": p.unique_code,
+        "total_price": from_cents(p.total_cents), "item_count": len(p.items)
+    } for p in purchases])
+
+
+def schema_orders(limit, user_id):
+    rows = db.session.execute(
+        PURCHASE_SUMMARY.select().where(Purchase.user_id == user_id)
+        .order_by(Purchase.timestamp.desc(), Purchase.id.desc()).limit(limit)
+    )
+    return current_app.json.dumps(PURCHASE_SUMMARY.dump_rows(rows))
+
+
+ENDPOINTS = [
+    ('GET /products', legacy_products, schema_products),
+    ('GET /departments', legacy_departments, schema_departments),
+    ('GET /cart', legacy_cart, schema_cart),
+    ('GET /orders', legacy_orders, schema_orders),
+]
+
+
+def measure(fn, limit, user_id, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(limit, user_id)
+        timings.append(time.perf_counter() - start)
+        # Don't let the identity map carry objects between runs
+        db.session.remove()
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--limit', type=int, default=2000, help='rows per /products page')
+    parser.add_argument('--cart-items', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    results = []
+    with app.app_context():
+        db.create_all()
+        user_id = seed(args.products, args.cart_items, args.orders)
+        for name, legacy, fast in ENDPOINTS:
+            # Same payload both ways, modulo key order
+            assert json.loads(legacy(args.limit, user_id)) == json.loads(fast(args.limit, user_id)), name
+            before = measure(legacy, args.limit, user_id, args.repeat)
+            after = measure(fast, args.limit, user_id, args.repeat)
+            results.append({"endpoint": name, "legacy_ms": round(before, 3),
+                            "schema_ms": round(after, 3), "speedup": round(before / after, 2)})
+
+    if args.json:
+        print(json.dumps({"encoder": "orjson" if orjson else "json", "results": results}, indent=2))
+        return
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'} (median of {args.repeat} runs)")
+    print(f"{'endpoint':<18}{'legacy ms':>12}{'schema ms':>12}{'speedup':>10}")
+    for r in results:
+        print(f"{r['endpoint']:<18}{r['legacy_ms']:>12.2f}{r['schema_ms']:>12.2f}{r['speedup']:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
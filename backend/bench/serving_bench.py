@@ -0,0 +1,141 @@
+"""Throughput: Flask development server (app.run) vs gunicorn (gunicorn.conf.py).
+
+Seeds one throwaway SQLite database, then for each server mode starts the
+app in a subprocess on a free port and drives the load_test.py shopper
+workload over HTTP against it, reporting requests/s and latency per mode.
+
+  python bench/serving_bench.py --products 20000 --users 20 --duration 15
+  python bench/serving_bench.py --workers 4 --threads 8
+
+gunicorn does not run on Windows; use Docker or WSL there.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.models import Product
+from seed import seed_synthetic
+from load_test import PASSWORD, HttpTransport, run_workload, summarize
+
+DEV_SERVER = ("import sys; from wsgi import app; "
+              "app.run(host='127.0.0.1', port=int(sys.argv[1]), debug=False, threaded=True)")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up in {timeout}s")
+
+
+def start_server(mode, port, env, args, log):
+    if mode == 'app.run':
+        cmd = [sys.executable, '-c', DEV_SERVER, str(port)]
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+               '--threads', str(args.threads), '--log-level', 'warning']
+    return subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=16, help="concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per server mode")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="gunicorn threads per worker")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="write JSON results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    db_url = f"sqlite:///{os.path.join(tmp.name, 'serving.db')}"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = db_url
+        SQLALCHEMY_ECHO = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        seed_synthetic(args.products, args.users, departments=10, password=PASSWORD, seed=args.seed)
+        product_ids = [pid for (pid,) in db.session.query(Product.id)]
+        db.engine.dispose()
+
+    env = dict(os.environ, DATABASE_URL=db_url, FLASK_DEBUG='0', SQL_DEBUG='0')
+    results = {}
+    try:
+        for mode in ('app.run', 'gunicorn'):
+            port = free_port()
+            url = f'http://127.0.0.1:{port}'
+            log_path = os.path.join(tmp.name, f'{mode}.log')
+            with open(log_path, 'wb') as log:
+                proc = start_server(mode, port, env, args, log)
+                try:
+                    wait_until_up(url, proc)
+                    samples, elapsed, errors = run_workload(HttpTransport(url), args.users, product_ids,
+                                                            args.duration, args.seed)
+                finally:
+                    stop_server(proc)
+            if errors or any(s[2] >= 500 for s in samples):
+                with open(log_path, errors='replace') as log:
+                    tail = [line for line in log if 'Traceback' in line or 'Error' in line][-5:]
+                print(f"{mode}: server errors, see its log:\n" + ''.join(tail), file=sys.stderr)
+            _, total = summarize(samples, elapsed)
+            total['client_errors'] = len(errors)
+            results[mode] = total
+    finally:
+        tmp.cleanup()
+
+    print(f"users={args.users} duration={args.duration}s products={args.products} "
+          f"gunicorn={args.workers} workers x {args.threads} threads")
+    print(f"{'server':<12}{'reqs':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<12}{r['requests']:>8}{r['rps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['client_errors']:>8}")
+    base = results['app.run']['rps']
+    if base:
+        print(f"gunicorn throughput: {results['gunicorn']['rps'] / base:.2f}x app.run")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,81 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///supermarket.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = os.environ.get('SQL_DEBUG', '0') == '1'  # Set SQL_DEBUG=1 to see queries
+    # Read replicas (comma separated URLs) for catalog, order history and reports; a user's reads stay
+    # on the primary for DB_REPLICA_STICKY_SECONDS after they write (and catalog reads after a catalog write)
+    DATABASE_REPLICA_URLS = tuple(u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip())
+    DB_REPLICA_STICKY_SECONDS = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', '5'))
+    DB_REPLICA_RETRY_SECONDS = float(os.environ.get('DB_REPLICA_RETRY_SECONDS', '30'))
+    # Connection pool per process; keep DB_POOL_SIZE >= server threads per worker (see gunicorn.conf.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))  # seconds
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    # SQLite file databases: WAL, synchronous=NORMAL, mmap, page cache and busy timeout on connect
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '65536'))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    # Cart writes are group-committed by one writer thread per process (up to SQLITE_WRITE_BATCH per commit)
+    SQLITE_WRITE_QUEUE = os.environ.get('SQLITE_WRITE_QUEUE', '1') == '1'
+    SQLITE_WRITE_BATCH = int(os.environ.get('SQLITE_WRITE_BATCH', '64'))
+    # Add-to-cart clicks: 'db' writes each one, 'memory' (single worker) or 'redis' buffers them and
+    # writes back on the next cart read/checkout or every CART_WRITEBACK_INTERVAL seconds
+    CART_STORE = os.environ.get('CART_STORE', 'db')
+    CART_REDIS_URL = os.environ.get('CART_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    CART_WRITEBACK_INTERVAL = float(os.environ.get('CART_WRITEBACK_INTERVAL', '5'))
+    # Background jobs: worker threads per process (0 = run `flask jobs work` separately), retry policy
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '5'))
+    JOB_BACKOFF_BASE = float(os.environ.get('JOB_BACKOFF_BASE', '2'))
+    JOB_BACKOFF_MAX = float(os.environ.get('JOB_BACKOFF_MAX', '300'))
+    JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', '300'))
+    # Startup warm-up (pool, catalog snapshot, search index, catalog cache); /health is 503 until done
+    WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+    WARMUP_POOL_CONNECTIONS = int(os.environ.get('WARMUP_POOL_CONNECTIONS', '4'))
+    # Local product images (default: instance/images); thumbnail formats besides the JPEG fallback
+    IMAGE_DIR = os.environ.get('IMAGE_DIR')
+    IMAGE_FORMATS = tuple(f.strip() for f in os.environ.get('IMAGE_FORMATS', 'webp,jpeg').split(',') if f.strip())
+    IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '82'))
+    # Seconds a replaced image version stays on disk for requests that already resolved it
+    IMAGE_PRUNE_GRACE = int(os.environ.get('IMAGE_PRUNE_GRACE', '600'))
+    # Request instrumentation: share of requests timed (Server-Timing header + /metrics), 0 disables sampling
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', '5'))
+    # Scrapers send `Authorization: Bearer <METRICS_TOKEN>`; unset, /metrics is for admins only
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Product search: 'auto' uses SQLite FTS5 when available, 'python' forces the in-memory index
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    # Catalog response cache: 'memory' (per process), 'redis' (shared) or 'null' to disable
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', '300'))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1024'))
+    # Catalog change log kept for /products/changes; open SSE streams per process (more get 503 and poll)
+    CATALOG_CHANGES_RETENTION_DAYS = int(os.environ.get('CATALOG_CHANGES_RETENTION_DAYS', '7'))
+    CATALOG_STREAM_MAX_CLIENTS = int(os.environ.get('CATALOG_STREAM_MAX_CLIENTS', '2'))
+    CATALOG_STREAM_MAX_SECONDS = float(os.environ.get('CATALOG_STREAM_MAX_SECONDS', '300'))
+    # How often each worker's catalog snapshot and Python search index check the change log for other workers' writes
+    CATALOG_CHANGES_SYNC_INTERVAL = float(os.environ.get('CATALOG_CHANGES_SYNC_INTERVAL', '1'))
+    # Frequently bought together: partners kept per product, largest order counted
+    RECOMMENDATIONS_TOP_K = int(os.environ.get('RECOMMENDATIONS_TOP_K', '20'))
+    RECOMMENDATIONS_MAX_BASKET = int(os.environ.get('RECOMMENDATIONS_MAX_BASKET', '50'))
+    # gzip/brotli for bodies of at least COMPRESS_MIN_SIZE bytes; off when a proxy compresses instead
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'default-jwt-key')
     # Token expires in 7 days - convenient for shopping users
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
+    # Password hashing: pbkdf2 work factor, hashing processes per worker (0 = inline in the request thread)
+    PASSWORD_HASH_ROUNDS = int(os.environ.get('PASSWORD_HASH_ROUNDS', '29000'))
+    PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', '1'))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '10'))
+    # Login/register admission control per worker: concurrent slots, seconds to wait for one before 503
+    AUTH_MAX_CONCURRENT = int(os.environ.get('AUTH_MAX_CONCURRENT', '8'))
+    AUTH_ADMISSION_TIMEOUT = float(os.environ.get('AUTH_ADMISSION_TIMEOUT', '2'))
+    # Token -> user/role cache; per process, so other workers see role changes within the TTL (0 disables)
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', '60'))
+    AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '10000'))
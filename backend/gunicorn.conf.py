@@ -0,0 +1,72 @@
+"""Gunicorn settings for production serving.
+
+    gunicorn -c gunicorn.conf.py
+
+Pre-fork workers (one per core by default) each run a pool of threads, so
+requests blocked on SQLite or password hashing don't stall a whole process.
+The app is imported once in the master before forking (preload_app) and
+every worker starts with a fresh connection pool.
+"""
+import multiprocessing
+import os
+from config import Config
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', f"{os.environ.get('FLASK_HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}")
+
+_requested_workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# The memory cart buffer is per process: with several workers a shopper's next request
+# could miss their own buffered clicks, so run one worker rather than serve wrong carts
+workers = 1 if Config.CART_STORE == 'memory' else _requested_workers
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '60'))
+# SIGTERM: stop accepting, let in-flight requests finish for up to this long
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+# Recycle workers now and then (0 disables); jitter avoids restarting them all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+preload_app = True
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def _dispose_engines(server, close):
+    from app.extensions import db
+    app = server.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def when_ready(server):
+    if workers < _requested_workers:
+        server.log.warning("CART_STORE=memory buffers carts per worker: starting 1 worker instead of %d. "
+                           "Use CART_STORE=redis or db for more.", _requested_workers)
+    # Connections opened while preloading belong to the master; never hand them to workers
+    _dispose_engines(server, close=True)
+
+
+def post_fork(server, worker):
+    # Drop any pooled connection inherited from the master without closing it under its feet
+    _dispose_engines(server, close=False)
+
+
+def post_worker_init(worker):
+    from app.warmup import warmup
+    # Before the worker accepts connections: fill its pool, catalog snapshot and caches
+    warmup.run(worker.app.wsgi())
+
+
+def worker_exit(server, worker):
+    from app.carts import cart_store
+    from app.jobs import jobs
+    app = server.app.wsgi()
+    # Write back carts buffered in this worker and let running jobs finish before its connections go
+    with app.app_context():
+        cart_store.flush_all()
+    jobs.shutdown(timeout=min(graceful_timeout, 10))
+    _dispose_engines(server, close=True)
@@ -0,0 +1,103 @@
+"""Baseline schema: users, catalog, carts and purchases
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created by `db.create_all()` before migrations existed already
+have these tables; they are left as they are (then `flask db upgrade`
+carries on from here).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password_hash', sa.String(length=256), nullable=False),
+            sa.Column('is_admin', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+        )
+    if 'departments' not in existing:
+        op.create_table(
+            'departments',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name'),
+        )
+    if 'products' not in existing:
+        op.create_table(
+            'products',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('price', sa.Float(), nullable=False),
+            sa.Column('image_url', sa.String(length=500), nullable=True),
+            sa.Column('department_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['department_id'], ['departments.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_products_department_id', 'products', ['department_id'])
+    if 'cart_items' not in existing:
+        op.create_table(
+            'cart_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_cart_items_product_id', 'cart_items', ['product_id'])
+        op.create_index('ix_cart_items_user_id', 'cart_items', ['user_id'])
+    if 'purchases' not in existing:
+        op.create_table(
+            'purchases',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('unique_code', sa.String(length=36), nullable=True),
+            sa.Column('total_price', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('unique_code'),
+        )
+        op.create_index('ix_purchases_user_id', 'purchases', ['user_id'])
+    if 'purchase_items' not in existing:
+        op.create_table(
+            'purchase_items',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('purchase_id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column('price_at_purchase', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+            sa.ForeignKeyConstraint(['purchase_id'], ['purchases.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_purchase_items_product_id', 'purchase_items', ['product_id'])
+        op.create_index('ix_purchase_items_purchase_id', 'purchase_items', ['purchase_id'])
+
+
+def downgrade():
+    op.drop_table('purchase_items')
+    op.drop_table('purchases')
+    op.drop_table('cart_items')
+    op.drop_table('products')
+    op.drop_table('departments')
+    op.drop_table('users')
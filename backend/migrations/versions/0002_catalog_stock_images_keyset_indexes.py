@@ -0,0 +1,49 @@
+"""Catalog: stock, local image hash and keyset pagination indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:05:00
+
+The composite (filter, sort, id) indexes are what /products needs to
+serve any page with one index range scan. Steps that a `db.create_all()`
+database already has are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_products_price_id': ['price', 'id'],
+    'ix_products_name_id': ['name', 'id'],
+    'ix_products_department_price_id': ['department_id', 'price', 'id'],
+    'ix_products_department_name_id': ['department_id', 'name', 'id'],
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    columns = {c['name'] for c in inspector.get_columns('products')}
+    indexes = {i['name'] for i in inspector.get_indexes('products')}
+
+    with op.batch_alter_table('products') as batch_op:
+        if 'stock' not in columns:
+            batch_op.add_column(sa.Column('stock', sa.Integer(), nullable=True))
+        if 'image_hash' not in columns:
+            batch_op.add_column(sa.Column('image_hash', sa.String(length=16), nullable=True))
+    for name, index_columns in INDEXES.items():
+        if name not in indexes:
+            op.create_index(name, 'products', index_columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('image_hash')
+        batch_op.drop_column('stock')
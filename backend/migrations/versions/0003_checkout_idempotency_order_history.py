@@ -0,0 +1,74 @@
+"""Checkout: one cart row per product, idempotency keys, order history index
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:10:00
+
+cart_items gets a unique (user_id, product_id) constraint so cart writes
+can be ON CONFLICT upserts; duplicate rows are merged into one first.
+purchases gets idempotency_key (unique per user) and item_count, which is
+backfilled from purchase_items. Order history reads (user_id, timestamp)
+newest first, which replaces the plain user_id index. Steps that a
+`db.create_all()` database already has are skipped.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def unique_constraints(inspector, table):
+    return {c['name'] for c in inspector.get_unique_constraints(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if 'uq_cart_items_user_product' not in unique_constraints(inspector, 'cart_items'):
+        # Keep the oldest row of each (user, product) with the summed quantity
+        bind.execute(sa.text(
+            "UPDATE cart_items SET quantity = (SELECT SUM(c.quantity) FROM cart_items c "
+            "WHERE c.user_id = cart_items.user_id AND c.product_id = cart_items.product_id) "
+            "WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)"
+        ))
+        bind.execute(sa.text(
+            "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)"
+        ))
+        with op.batch_alter_table('cart_items') as batch_op:
+            batch_op.create_unique_constraint('uq_cart_items_user_product', ['user_id', 'product_id'])
+
+    columns = {c['name'] for c in inspector.get_columns('purchases')}
+    indexes = {i['name'] for i in inspector.get_indexes('purchases')}
+    with op.batch_alter_table('purchases') as batch_op:
+        if 'idempotency_key' not in columns:
+            batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        if 'item_count' not in columns:
+            batch_op.add_column(sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+        if 'uq_purchases_user_idempotency_key' not in unique_constraints(inspector, 'purchases'):
+            batch_op.create_unique_constraint('uq_purchases_user_idempotency_key', ['user_id', 'idempotency_key'])
+        if 'ix_purchases_user_timestamp' not in indexes:
+            batch_op.create_index('ix_purchases_user_timestamp', ['user_id', 'timestamp'])
+        if 'ix_purchases_user_id' in indexes:
+            batch_op.drop_index('ix_purchases_user_id')
+    if 'item_count' not in columns:
+        bind.execute(sa.text(
+            "UPDATE purchases SET item_count = (SELECT COUNT(*) FROM purchase_items "
+            "WHERE purchase_items.purchase_id = purchases.id)"
+        ))
+
+
+def downgrade():
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.create_index('ix_purchases_user_id', ['user_id'])
+        batch_op.drop_index('ix_purchases_user_timestamp')
+        batch_op.drop_constraint('uq_purchases_user_idempotency_key', type_='unique')
+        batch_op.drop_column('item_count')
+        batch_op.drop_column('idempotency_key')
+    with op.batch_alter_table('cart_items') as batch_op:
+        batch_op.drop_constraint('uq_cart_items_user_product', type_='unique')
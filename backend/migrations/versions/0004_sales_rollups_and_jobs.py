@@ -0,0 +1,79 @@
+"""Daily sales rollups and the background job queue
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:15:00
+
+The rollups start empty: fill them from purchase history with
+`flask --app run analytics rebuild`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'daily_sales' not in existing:
+        op.create_table(
+            'daily_sales',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint('day'),
+        )
+    if 'daily_department_sales' not in existing:
+        op.create_table(
+            'daily_department_sales',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('department_id', sa.Integer(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['department_id'], ['departments.id']),
+            sa.PrimaryKeyConstraint('day', 'department_id'),
+        )
+    if 'daily_product_sales' not in existing:
+        op.create_table(
+            'daily_product_sales',
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('department_id', sa.Integer(), nullable=False),
+            sa.Column('units', sa.Integer(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['department_id'], ['departments.id']),
+            sa.ForeignKeyConstraint(['product_id'], ['products.id']),
+            sa.PrimaryKeyConstraint('day', 'product_id'),
+        )
+        op.create_index('ix_daily_product_sales_department_day', 'daily_product_sales', ['department_id', 'day'])
+    if 'jobs' not in existing:
+        op.create_table(
+            'jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=10), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('max_attempts', sa.Integer(), nullable=False),
+            sa.Column('run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_at', sa.DateTime(), nullable=True),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'])
+
+
+def downgrade():
+    op.drop_table('jobs')
+    op.drop_table('daily_product_sales')
+    op.drop_table('daily_department_sales')
+    op.drop_table('daily_sales')
@@ -0,0 +1,103 @@
+"""Money in integer cents
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:20:00
+
+Every Float money column is replaced by an Integer cents column, filled
+with ROUND(value * 100): products.price -> price_cents,
+purchases.total_price -> total_cents, purchase_items.price_at_purchase ->
+price_at_purchase_cents and the rollups' revenue -> revenue_cents. The
+price keyset indexes move to price_cents. Queued sales rollup jobs carry
+prices in their payload and are converted too.
+
+Afterwards, `flask --app run money reconcile` checks stored order totals
+and rollup revenue against their line items; totals that drifted as
+floats show up there (fix them with --fix and `analytics rebuild`).
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# (table, float column, cents column)
+MONEY_COLUMNS = (
+    ('products', 'price', 'price_cents'),
+    ('purchases', 'total_price', 'total_cents'),
+    ('purchase_items', 'price_at_purchase', 'price_at_purchase_cents'),
+    ('daily_sales', 'revenue', 'revenue_cents'),
+    ('daily_department_sales', 'revenue', 'revenue_cents'),
+    ('daily_product_sales', 'revenue', 'revenue_cents'),
+)
+PRICE_INDEXES = {
+    'ix_products_price_id': ['id'],
+    'ix_products_department_price_id': ['department_id', 'id'],
+}
+
+
+def columns(table):
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def index_columns(price_column):
+    # Price sits before the id tie-breaker in both indexes
+    return {name: cols[:-1] + [price_column, cols[-1]] for name, cols in PRICE_INDEXES.items()}
+
+
+def replace_column(table, old, new, new_type, convert):
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.add_column(sa.Column(new, new_type, nullable=True))
+    op.execute(f'UPDATE {table} SET {new} = {convert.format(old)}')
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.alter_column(new, existing_type=new_type, nullable=False)
+        batch_op.drop_column(old)
+
+
+def convert_job_payloads(scale):
+    # analytics.record_purchase lines are (product_id, department_id, quantity, price)
+    bind = op.get_bind()
+    jobs = bind.execute(sa.text(
+        "SELECT id, payload FROM jobs WHERE name = 'analytics.record_purchase' AND status != 'done'"
+    )).all()
+    for job_id, payload in jobs:
+        data = json.loads(payload)
+        data['lines'] = [[pid, dept, qty, scale(price)] for pid, dept, qty, price in data['lines']]
+        bind.execute(sa.text("UPDATE jobs SET payload = :payload WHERE id = :id"),
+                     {"payload": json.dumps(data), "id": job_id})
+
+
+def upgrade():
+    bind = op.get_bind()
+    converting = 'price_cents' not in columns('products')
+    if converting:
+        indexes = {i['name'] for i in sa.inspect(bind).get_indexes('products')}
+        for name in PRICE_INDEXES:
+            if name in indexes:
+                op.drop_index(name, table_name='products')
+
+    for table, old, new in MONEY_COLUMNS:
+        if new not in columns(table):
+            replace_column(table, old, new, sa.Integer(), 'CAST(ROUND({} * 100) AS INTEGER)')
+
+    indexes = {i['name'] for i in sa.inspect(bind).get_indexes('products')}
+    for name, cols in index_columns('price_cents').items():
+        if name not in indexes:
+            op.create_index(name, 'products', cols)
+    if converting:
+        convert_job_payloads(lambda price: int(round(price * 100)))
+
+
+def downgrade():
+    for name in PRICE_INDEXES:
+        op.drop_index(name, table_name='products')
+    for table, old, new in MONEY_COLUMNS:
+        replace_column(table, new, old, sa.Float(), '{} / 100.0')
+    for name, cols in index_columns('price').items():
+        op.create_index(name, 'products', cols)
+    convert_job_payloads(lambda cents: cents / 100)
@@ -0,0 +1,39 @@
+"""Catalog change log
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:25:00
+
+catalog_changes backs GET /products/changes and its SSE stream; the row
+id is the change version, so the table is AUTOINCREMENT on SQLite to
+keep ids from being reused after pruning. It starts empty: clients
+begin from the current version after loading the catalog.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'catalog_changes' in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        'catalog_changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=20), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sqlite_autoincrement=True,
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_changes')
@@ -0,0 +1,49 @@
+"""Product recommendations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 09:30:00
+
+product_pairs holds co-occurrence counts (orders containing both
+products) and related_products each product's top partners; checkout
+keeps both up to date from now on. Existing orders are counted by
+`flask --app run recommendations rebuild`, which can run any time after
+this migration.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'product_pairs' not in tables:
+        op.create_table(
+            'product_pairs',
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('other_id', sa.Integer(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('product_id', 'other_id'),
+        )
+        op.create_index('ix_product_pairs_product_orders', 'product_pairs', ['product_id', 'orders', 'other_id'])
+    if 'related_products' not in tables:
+        op.create_table(
+            'related_products',
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('rank', sa.Integer(), nullable=False),
+            sa.Column('related_id', sa.Integer(), nullable=False),
+            sa.Column('orders', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('product_id', 'rank'),
+        )
+
+
+def downgrade():
+    op.drop_table('related_products')
+    op.drop_index('ix_product_pairs_product_orders', table_name='product_pairs')
+    op.drop_table('product_pairs')
@@ -7,4 +7,8 @@ if __name__ == '__main__':
     # Use 0.0.0.0 in Docker, 127.0.0.1 for local Windows (IPv6 fix)
     host = os.environ.get('FLASK_HOST', '127.0.0.1')
     debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+    # With the reloader only the child process serves; /health is 503 until this finishes
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.warmup import warmup
+        warmup.start(app)
     app.run(host=host, port=5000, debug=debug)
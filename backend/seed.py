@@ -1,13 +1,24 @@
+import argparse
+import random
+from flask_migrate import upgrade
 from app import create_app
 from app.extensions import db
 from app.models import User, Department, Product
+from app.money import to_cents
+
+# Word lists for synthetic product names (so search/typeahead has realistic terms)
+ADJECTIVES = ['Fresh', 'Organic', 'Frozen', 'Smoked', 'Sliced', 'Whole', 'Low Fat', 'Spicy',
+              'Sweet', 'Classic', 'Family Size', 'Mini', 'Premium', 'Wholegrain', 'Roasted']
+NOUNS = ['Milk', 'Cheese', 'Yogurt', 'Butter', 'Chicken', 'Beef', 'Salmon', 'Apple', 'Banana',
+         'Tomato', 'Potato', 'Bread', 'Bagel', 'Croissant', 'Pizza', 'Ice Cream', 'Peas',
+         'Carrots', 'Rice', 'Pasta', 'Cookies', 'Cereal', 'Juice', 'Coffee', 'Tea']
 
 def seed_data():
     app = create_app()
     with app.app_context():
-        # Create all tables (if they don't exist)
-        db.create_all()
-        print("Database tables created/verified.")
+        # Create the schema or bring it up to date (migrations/, same as `flask db upgrade`)
+        upgrade()
+        print("Database schema is up to date.")
         
         # 1. Create Admin
         admin = User.query.filter_by(email='admin@test.com').first()
@@ -53,7 +64,7 @@ def seed_data():
             if not prod:
                 prod = Product(
                     name=name, 
-                    price=price, 
+                    price_cents=to_cents(price),
                     department_id=depts[dept_name].id,
                     image_url=img
                 )
@@ -63,5 +74,59 @@ def seed_data():
         db.session.commit()
         print("Seeding completed successfully!")
 
+def seed_synthetic(products=1000, users=50, departments=10, password='password123', seed=42):
+    """Bulk-insert a synthetic catalog and shoppers (call inside an app context).
+
+    Shoppers are `shopper<N>@test.com` and all share `password`; it is hashed
+    once since pbkdf2 would otherwise dominate seeding time.
+    """
+    rng = random.Random(seed)
+    upgrade()
+
+    dept_ids = [d.id for d in Department.query.all()]
+    start = len(dept_ids)
+    for i in range(start, start + departments):
+        dept = Department(name=f'Aisle {i + 1}')
+        db.session.add(dept)
+        db.session.flush()
+        dept_ids.append(dept.id)
+
+    batch = []
+    for i in range(products):
+        batch.append({
+            "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+            "price_cents": rng.randint(50, 4000),
+            "department_id": rng.choice(dept_ids),
+            "image_url": None,
+        })
+        if len(batch) == 5000:
+            db.session.execute(Product.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Product.__table__.insert(), batch)
+
+    template = User(email='template')
+    template.set_password(password)
+    # Continue numbering after earlier synthetic shoppers
+    offset = User.query.filter(User.email.like('shopper%@test.com')).count()
+    db.session.execute(User.__table__.insert(), [{
+        "email": f"shopper{offset + i}@test.com",
+        "password_hash": template.password_hash,
+        "is_admin": False,
+    } for i in range(users)])
+
+    db.session.commit()
+    print(f"Synthetic data: {departments} departments, {products} products, {users} shoppers "
+          f"(password: {password})")
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Seed the database with sample (and optionally synthetic) data.")
+    parser.add_argument('--products', type=int, default=0, help="extra synthetic products")
+    parser.add_argument('--users', type=int, default=0, help="synthetic shoppers")
+    parser.add_argument('--departments', type=int, default=10, help="synthetic departments")
+    args = parser.parse_args()
+
     seed_data()
+    if args.products or args.users:
+        with create_app().app_context():
+            seed_synthetic(args.products, args.users, args.departments)
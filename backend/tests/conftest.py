@@ -0,0 +1,75 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from config import Config
+from app import create_app
+from app.extensions import db
+from app.models import Department, Product, User
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps on one SQLite file; apps from the same test share it like gunicorn workers do."""
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+
+    def make(**overrides):
+        class TestConfig(Config):
+            TESTING = True
+            SQLALCHEMY_DATABASE_URI = uri
+            SQLALCHEMY_ECHO = False
+            JWT_SECRET_KEY = 'test-jwt-key-long-enough-for-hs256'
+            # Jobs stay queued and passwords are hashed inline: nothing runs behind the test's back
+            JOB_WORKERS = 0
+            PASSWORD_POOL_SIZE = 0
+
+        for name, value in overrides.items():
+            setattr(TestConfig, name, value)
+        app = create_app(TestConfig)
+        with app.app_context():
+            # The primary only: replicas are copies of it (and their bind keys outlive the app)
+            db.create_all(bind_key=None)
+        return app
+
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_headers(app, email, is_admin=False):
+    with app.app_context():
+        user = User(email=email, password_hash='x', is_admin=is_admin)
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id), additional_claims={"is_admin": is_admin})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def user_headers(app):
+    return auth_headers(app, 'shopper@test.com')
+
+
+@pytest.fixture
+def admin_headers(app):
+    return auth_headers(app, 'admin@test.com', is_admin=True)
+
+
+@pytest.fixture
+def catalog(app):
+    """Ids of a small catalog: 'milk' (untracked stock) and 'bread' (one left)."""
+    with app.app_context():
+        dept = Department(name='Grocery')
+        db.session.add(dept)
+        db.session.flush()
+        milk = Product(name='milk', price_cents=199, department_id=dept.id)
+        bread = Product(name='bread', price_cents=250, department_id=dept.id, stock=1)
+        db.session.add_all([milk, bread])
+        db.session.commit()
+        return {'department': dept.id, 'milk': milk.id, 'bread': bread.id}
@@ -0,0 +1,47 @@
+from app.cache import catalog_cache
+from tests.conftest import auth_headers
+
+
+def test_etag_and_not_modified(client, catalog):
+    r = client.get(f"/products/{catalog['milk']}")
+    assert r.status_code == 200 and r.headers['ETag']
+    again = client.get(f"/products/{catalog['milk']}", headers={'If-None-Match': r.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_admin_write_invalidates_own_cache(client, admin_headers, catalog):
+    assert client.get(f"/products/{catalog['milk']}").get_json()['price'] == 1.99
+    r = client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49}, headers=admin_headers)
+    assert r.status_code == 200
+    assert client.get(f"/products/{catalog['milk']}").get_json()['price'] == 2.49
+
+
+def test_other_workers_write_invalidates_memory_cache(make_app, catalog):
+    writer = make_app()
+    reader = make_app(CACHE_BACKEND='memory', CATALOG_CHANGES_SYNC_INTERVAL=0)
+    client = reader.test_client()
+    first = client.get(f"/products/{catalog['milk']}")
+    assert first.get_json()['price'] == 1.99
+
+    r = writer.test_client().put(f"/admin/products/{catalog['milk']}", json={'price': 7.77},
+                                 headers=auth_headers(writer, 'admin@test.com', is_admin=True))
+    assert r.status_code == 200
+
+    # Neither a cached body nor a 304 for the old ETag
+    assert client.get(f"/products/{catalog['milk']}").get_json()['price'] == 7.77
+    stale = client.get(f"/products/{catalog['milk']}", headers={'If-None-Match': first.headers['ETag']})
+    assert stale.status_code == 200
+
+
+def test_own_write_bumps_once(make_app, catalog):
+    app = make_app(CACHE_BACKEND='memory', CATALOG_CHANGES_SYNC_INTERVAL=0)
+    client = app.test_client()
+    client.get('/departments')
+    with app.app_context():
+        before = catalog_cache.version()
+    r = client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49},
+                   headers=auth_headers(app, 'admin@test.com', is_admin=True))
+    assert r.status_code == 200
+    with app.app_context():
+        # Finding its own change in the log afterwards must not invalidate again
+        assert catalog_cache.version() == catalog_cache.version() == before + 1
@@ -0,0 +1,73 @@
+import pytest
+from tests.conftest import auth_headers
+
+
+@pytest.mark.parametrize('quantity', ['abc', -5, 0, 2.5, True, None])
+def test_add_rejects_invalid_quantity(client, user_headers, catalog, quantity):
+    r = client.post('/cart', json={'product_id': catalog['milk'], 'quantity': quantity}, headers=user_headers)
+    assert r.status_code == 400
+    assert client.get('/cart', headers=user_headers).get_json() == []
+
+
+def test_add_requires_product_id(client, user_headers, catalog):
+    assert client.post('/cart', json={'quantity': 1}, headers=user_headers).status_code == 400
+    assert client.post('/cart', data='not json', headers=user_headers).status_code == 400
+
+
+def test_add_unknown_product(client, user_headers, catalog):
+    assert client.post('/cart', json={'product_id': 999}, headers=user_headers).status_code == 404
+
+
+def test_add_accumulates(client, user_headers, catalog):
+    for quantity in (2, 3):
+        r = client.post('/cart', json={'product_id': catalog['milk'], 'quantity': quantity}, headers=user_headers)
+        assert r.status_code == 201
+    assert client.post('/cart', json={'product_id': catalog['milk']}, headers=user_headers).status_code == 201
+    items = client.get('/cart', headers=user_headers).get_json()
+    assert [(item['product_id'], item['quantity']) for item in items] == [(catalog['milk'], 6)]
+
+
+def test_add_error_messages(client, user_headers, catalog):
+    def message(body):
+        return client.post('/cart', json=body, headers=user_headers).get_json()['message']
+
+    assert message({'product_id': catalog['milk'], 'quantity': 'abc'}) == "quantity must be an integer"
+    assert message({'product_id': catalog['milk'], 'quantity': 0}) == "quantity must be at least 1"
+    assert message({'product_id': 'milk'}) == "product_id must be an integer"
+
+
+def test_patch_reports_failing_operation(client, user_headers, catalog):
+    r = client.patch('/cart', json={'operations': [
+        {'op': 'add', 'product_id': catalog['milk']},
+        {'op': 'set', 'product_id': catalog['milk'], 'quantity': -1},
+    ]}, headers=user_headers)
+    assert r.status_code == 400
+    assert r.get_json()['message'] == "operations[1]: quantity must be at least 0"
+
+
+def cart_item(client, headers, product_id):
+    client.post('/cart', json={'product_id': product_id, 'quantity': 2}, headers=headers)
+    return client.get('/cart', headers=headers).get_json()[0]['id']
+
+
+@pytest.mark.parametrize('quantity', ['abc', -1, 2.5, True, [3]])
+def test_put_rejects_invalid_quantity(client, user_headers, catalog, quantity):
+    item_id = cart_item(client, user_headers, catalog['milk'])
+    r = client.put(f'/cart/{item_id}', json={'quantity': quantity}, headers=user_headers)
+    assert r.status_code == 400
+    assert client.get('/cart', headers=user_headers).get_json()[0]['quantity'] == 2
+
+
+def test_put_sets_and_removes(client, user_headers, catalog):
+    item_id = cart_item(client, user_headers, catalog['milk'])
+    assert client.put(f'/cart/{item_id}', json={'quantity': 5}, headers=user_headers).status_code == 200
+    assert client.get('/cart', headers=user_headers).get_json()[0]['quantity'] == 5
+    assert client.put(f'/cart/{item_id}', json={'quantity': 0}, headers=user_headers).status_code == 200
+    assert client.get('/cart', headers=user_headers).get_json() == []
+    assert client.put(f'/cart/{item_id}', json={'quantity': 1}, headers=user_headers).status_code == 404
+
+
+def test_put_other_users_item(app, client, user_headers, catalog):
+    item_id = cart_item(client, user_headers, catalog['milk'])
+    other = auth_headers(app, 'other@test.com')
+    assert client.put(f'/cart/{item_id}', json={'quantity': 1}, headers=other).status_code == 403
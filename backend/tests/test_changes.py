@@ -0,0 +1,69 @@
+import sqlite3
+from app.changes import catalog_changes
+from app.extensions import db
+from app.replicas import replicas
+
+
+def changes(client, since):
+    return client.get(f'/products/changes?since={since}')
+
+
+def test_changes_since_version(client, admin_headers, catalog):
+    start = client.get('/products/changes').get_json()['version']
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49}, headers=admin_headers)
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.99}, headers=admin_headers)
+    client.delete(f"/admin/products/{catalog['bread']}", headers=admin_headers)
+
+    body = changes(client, start).get_json()
+    # Repeated changes to one product collapse into the latest
+    assert [(c['id'], c['action']) for c in body['changes']] == [(catalog['milk'], 'updated'),
+                                                                 (catalog['bread'], 'deleted')]
+    assert body['changes'][0]['data']['price'] == 2.99
+    assert body['changes'][1]['data'] is None
+    assert changes(client, body['version']).get_json()['changes'] == []
+
+
+def test_pruned_version_is_gone(app, client, admin_headers, catalog):
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49}, headers=admin_headers)
+    client.put(f"/admin/products/{catalog['bread']}", json={'price': 3.49}, headers=admin_headers)
+    with app.app_context():
+        catalog_changes.prune(days=-1)
+    assert changes(client, 0).status_code == 410
+    assert changes(client, 'abc').status_code == 400
+
+
+def test_stream_sends_changes(make_app, admin_headers, catalog):
+    app = make_app(CATALOG_CHANGES_GAP_SECONDS=0, CATALOG_STREAM_MAX_SECONDS=0.3,
+                   CATALOG_STREAM_HEARTBEAT=0.1)
+    client = app.test_client()
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49}, headers=admin_headers)
+    body = client.get('/products/changes/stream?since=0').get_data(as_text=True)
+    assert body.startswith('retry: 3000')
+    assert '"action":"updated"' in body.replace(' ', '')
+
+
+def test_log_is_read_from_primary_in_replica_views(make_app, tmp_path, admin_headers, catalog):
+    replica = tmp_path / 'replica.db'
+    app = make_app(DATABASE_REPLICA_URLS=(f'sqlite:///{replica}',), CATALOG_CHANGES_GAP_SECONDS=0)
+    client = app.test_client()
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.49}, headers=admin_headers)
+    # The replica stops here; the primary moves on
+    with app.app_context():
+        version = catalog_changes.current_version()
+        db.engine.dispose()
+    source = sqlite3.connect(tmp_path / 'test.db')
+    source.backup(sqlite3.connect(replica))
+    client.put(f"/admin/products/{catalog['milk']}", json={'price': 2.99}, headers=admin_headers)
+    client.put(f"/admin/products/{catalog['bread']}", json={'price': 3.49}, headers=admin_headers)
+
+    with app.test_request_context():
+        session = db.session()
+        session.info['replica'] = replicas.engines[0]
+        try:
+            latest = catalog_changes.latest(version + 2)
+            result = catalog_changes.read(version)
+        finally:
+            session.info.pop('replica')
+    assert latest == version + 2
+    changed, _, _ = result
+    assert {c.id: c.data['price'] for c in changed} == {catalog['milk']: 2.99, catalog['bread']: 3.49}
@@ -0,0 +1,48 @@
+from app.extensions import db
+from app.models import Product, Purchase
+
+
+def add(client, headers, product_id, quantity=1):
+    r = client.post('/cart', json={'product_id': product_id, 'quantity': quantity}, headers=headers)
+    assert r.status_code == 201
+
+
+def test_checkout_replays_idempotency_key(app, client, user_headers, catalog):
+    add(client, user_headers, catalog['milk'], 2)
+    headers = {**user_headers, 'Idempotency-Key': 'order-1'}
+    first = client.post('/orders/checkout', headers=headers)
+    assert first.status_code == 201
+    assert first.get_json()['total_price'] == 3.98
+    assert 'Idempotent-Replayed' not in first.headers
+
+    # A retry is answered with the same order, even with the cart filled again
+    add(client, user_headers, catalog['milk'])
+    retry = client.post('/orders/checkout', headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json()['order_code'] == first.get_json()['order_code']
+    with app.app_context():
+        assert db.session.query(Purchase).count() == 1
+    assert len(client.get('/cart', headers=user_headers).get_json()) == 1
+
+
+def test_checkout_rejects_bad_idempotency_key(client, user_headers, catalog):
+    add(client, user_headers, catalog['milk'])
+    r = client.post('/orders/checkout', headers={**user_headers, 'Idempotency-Key': 'k' * 65})
+    assert r.status_code == 400
+
+
+def test_checkout_empty_cart(client, user_headers, catalog):
+    assert client.post('/orders/checkout', headers=user_headers).status_code == 400
+
+
+def test_checkout_out_of_stock_keeps_cart(app, client, user_headers, catalog):
+    add(client, user_headers, catalog['milk'])
+    add(client, user_headers, catalog['bread'], 2)
+    r = client.post('/orders/checkout', headers=user_headers)
+    assert r.status_code == 409
+    assert r.get_json()['product_ids'] == [catalog['bread']]
+    assert len(client.get('/cart', headers=user_headers).get_json()) == 2
+    with app.app_context():
+        assert db.session.get(Product, catalog['bread']).stock == 1
+        assert db.session.query(Purchase).count() == 0
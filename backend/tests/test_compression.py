@@ -0,0 +1,42 @@
+import gzip
+import json
+from app.extensions import db
+from app.models import Department, Product
+
+
+def big_catalog(app):
+    with app.app_context():
+        dept = Department(name='Pantry')
+        db.session.add(dept)
+        db.session.flush()
+        db.session.add_all([Product(name=f'product {i}', price_cents=100 + i, department_id=dept.id)
+                            for i in range(100)])
+        db.session.commit()
+
+
+def test_large_response_is_gzipped_with_weak_etag(app, client):
+    big_catalog(app)
+    plain = client.get('/products?limit=100')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.headers['Vary']
+
+    for _ in range(2):  # built, then from the cache
+        r = client.get('/products?limit=100', headers={'Accept-Encoding': 'gzip'})
+        assert r.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(r.data)) == plain.get_json()
+    assert r.headers['ETag'] == f"W/{plain.headers['ETag']}"
+
+    again = client.get('/products?limit=100', headers={'Accept-Encoding': 'gzip', 'If-None-Match': r.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_small_response_is_sent_plain(client, catalog):
+    r = client.get(f"/products/{catalog['milk']}", headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in r.headers and r.get_json()['name'] == 'milk'
+
+
+def test_sparse_and_columnar_lists(client, catalog):
+    items = client.get('/products?fields=id,name').get_json()['items']
+    assert items == [{'id': catalog['milk'], 'name': 'milk'}, {'id': catalog['bread'], 'name': 'bread'}]
+    columns = client.get('/products?fields=id,price&format=columns').get_json()['columns']
+    assert columns == {'id': [catalog['milk'], catalog['bread']], 'price': [1.99, 2.5]}
+    assert client.get('/products?fields=nope').status_code == 400
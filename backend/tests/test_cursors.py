@@ -0,0 +1,71 @@
+import pytest
+from app.pagination import encode_cursor
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('id', 'not-a-cursor'),
+    ('id', encode_cursor('id', 1)),
+    ('id', encode_cursor('id', 'x', 1)),
+    ('id', encode_cursor('id', 1, None)),
+    ('id', encode_cursor('id', True, 1)),
+    ('price', encode_cursor('price', 1.5, 1)),
+    ('name', encode_cursor('name', 1, 1)),
+])
+def test_products_rejects_invalid_cursor(client, catalog, sort, cursor):
+    assert client.get('/products', query_string={'cursor': cursor, 'sort': sort}).status_code == 400
+
+
+def test_products_cursor_must_match_sort(client, catalog):
+    r = client.get('/products', query_string={'cursor': encode_cursor('-price', 199, 1), 'sort': 'price'})
+    assert r.status_code == 400
+
+
+def test_products_pages_with_cursor(client, catalog):
+    first = client.get('/products?limit=1&sort=-price').get_json()
+    assert [item['name'] for item in first['items']] == ['bread']
+    second = client.get('/products', query_string={'limit': 1, 'sort': '-price', 'cursor': first['next_cursor']})
+    assert [item['name'] for item in second.get_json()['items']] == ['milk']
+
+
+@pytest.mark.parametrize('args', [{'min_price': 'abc'}, {'max_price': ''}, {'max_price': '1e400'}])
+def test_products_rejects_invalid_price(client, catalog, args):
+    assert client.get('/products', query_string=args).status_code == 400
+
+
+@pytest.mark.parametrize('cursor', [
+    encode_cursor('milk', [1]),
+    encode_cursor('milk', None),
+    encode_cursor('milk', -1),
+    encode_cursor('milk'),
+])
+def test_search_rejects_invalid_cursor(client, catalog, cursor):
+    assert client.get('/products/search', query_string={'q': 'milk', 'cursor': cursor}).status_code == 400
+
+
+def test_search_cursor_must_match_query(client, catalog):
+    r = client.get('/products/search', query_string={'q': 'milk', 'cursor': encode_cursor('bread', 1)})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize('cursor', [
+    encode_cursor('2024-01-01T00:00:00', None),
+    encode_cursor('2024-01-01T00:00:00', '1'),
+    encode_cursor('2024-01-01T00:00:00', True),
+    encode_cursor('2024-01-01T00:00:00'),
+    encode_cursor(None, 1),
+    encode_cursor('yesterday', 1),
+])
+def test_order_history_rejects_invalid_cursor(client, user_headers, cursor):
+    assert client.get('/orders', query_string={'cursor': cursor}, headers=user_headers).status_code == 400
+
+
+def test_order_history_pages_with_cursor(client, user_headers, catalog):
+    codes = []
+    for _ in range(2):
+        client.post('/cart', json={'product_id': catalog['milk']}, headers=user_headers)
+        codes.append(client.post('/orders/checkout', headers=user_headers).get_json()['order_code'])
+    first = client.get('/orders?limit=1', headers=user_headers).get_json()
+    second = client.get('/orders', query_string={'limit': 1, 'cursor': first['next_cursor']},
+                        headers=user_headers).get_json()
+    assert [page['items'][0]['unique_code'] for page in (first, second)] == codes[::-1]
+    assert second['next_cursor'] is None
@@ -0,0 +1,44 @@
+from sqlalchemy import update
+from app.extensions import db
+from app.models import User
+from tests.conftest import auth_headers
+
+
+def test_role_change_invalidates_cached_tokens(app, client, admin_headers):
+    user_headers = auth_headers(app, 'staff@test.com')
+    assert client.get('/admin/jobs', headers=user_headers).status_code == 403
+    staff_id = client.get('/auth/me', headers=user_headers).get_json()['id']
+
+    assert client.put(f'/admin/users/{staff_id}', json={'is_admin': True}, headers=admin_headers).status_code == 200
+    # Same token, new role: the token's is_admin claim is not what counts
+    assert client.get('/admin/jobs', headers=user_headers).status_code == 200
+
+
+def test_identity_is_cached(app, client, user_headers):
+    assert client.get('/auth/me', headers=user_headers).get_json()['email'] == 'shopper@test.com'
+    with app.app_context():
+        # Behind the ORM's back, so nothing invalidates the cached identity
+        db.session.execute(update(User).where(User.email == 'shopper@test.com').values(email='renamed@test.com'))
+        db.session.commit()
+    assert client.get('/auth/me', headers=user_headers).get_json()['email'] == 'shopper@test.com'
+
+
+def test_deleted_user_is_rejected(app, client, admin_headers):
+    headers = auth_headers(app, 'gone@test.com')
+    user_id = client.get('/auth/me', headers=headers).get_json()['id']
+    assert client.delete(f'/admin/users/{user_id}', headers=admin_headers).status_code == 204
+    assert client.get('/auth/me', headers=headers).status_code == 401
+
+
+def test_demotion_through_another_worker_applies_at_once(make_app, app):
+    admin_headers = auth_headers(app, 'admin@test.com', is_admin=True)
+    boss_headers = auth_headers(app, 'boss@test.com', is_admin=True)
+    reader, writer = make_app(), make_app()
+    client = reader.test_client()
+    assert client.get('/admin/jobs', headers=admin_headers).status_code == 200
+    admin_id = client.get('/auth/me', headers=admin_headers).get_json()['id']
+
+    r = writer.test_client().put(f'/admin/users/{admin_id}', json={'is_admin': False}, headers=boss_headers)
+    assert r.status_code == 200
+    # The reader's identity cache still says admin; the admin check does not trust it
+    assert client.get('/admin/jobs', headers=admin_headers).status_code == 403
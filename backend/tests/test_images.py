@@ -0,0 +1,63 @@
+import os
+from io import BytesIO
+import pytest
+from app.extensions import db
+from app.images import SUPERSEDED, images
+from app.models import Product
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def png(color, size=(600, 300)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(IMAGE_DIR=str(tmp_path / 'images'))
+
+
+def upload(client, headers, product_id, data):
+    return client.post(f'/admin/products/{product_id}/image', data=data, headers=headers,
+                       content_type='application/octet-stream')
+
+
+def test_upload_and_serve_variants(client, admin_headers, catalog):
+    r = upload(client, admin_headers, catalog['milk'], png('red'))
+    assert r.status_code == 200
+    urls = r.get_json()['images']
+
+    thumb = client.get(urls['thumb'], headers={'Accept': 'image/webp,*/*'})
+    assert thumb.mimetype == 'image/webp' and 'Accept' in thumb.headers['Vary']
+    assert 'immutable' in thumb.headers['Cache-Control']
+    assert max(Image.open(BytesIO(thumb.data)).size) == 160
+    assert client.get(urls['card']).mimetype == 'image/jpeg'
+    assert client.get(urls['original']).mimetype == 'image/png'
+
+    again = client.get(urls['thumb'], headers={'Accept': 'image/webp', 'If-None-Match': thumb.headers['ETag']})
+    assert again.status_code == 304
+    assert client.get(f"/images/{catalog['milk']}/huge").status_code == 404
+    assert client.get(f"/images/{catalog['bread']}/thumb").status_code == 404
+
+
+def test_rejects_non_images(app, client, admin_headers, catalog):
+    r = upload(client, admin_headers, catalog['milk'], b'not an image')
+    assert r.status_code == 400
+    with app.app_context():
+        assert db.session.get(Product, catalog['milk']).image_hash is None
+
+
+def test_replaced_image_is_pruned_after_grace_period(app, client, admin_headers, catalog):
+    old = upload(client, admin_headers, catalog['milk'], png('red')).get_json()['image_hash']
+    new = upload(client, admin_headers, catalog['milk'], png('blue')).get_json()['image_hash']
+    product_dir = os.path.join(app.config['IMAGE_DIR'], str(catalog['milk']))
+    # Still there for requests that resolved the old hash
+    assert os.path.isfile(os.path.join(product_dir, old, SUPERSEDED))
+    assert client.get(f"/images/{catalog['milk']}/thumb").status_code == 200
+
+    app.config['IMAGE_PRUNE_GRACE'] = -1
+    with app.app_context():
+        assert images.prune() == 1
+    assert sorted(os.listdir(product_dir)) == [new]
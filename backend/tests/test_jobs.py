@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import select, update
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Department, Job
+from app.pagination import encode_cursor
+
+
+@pytest.fixture
+def tasks(monkeypatch):
+    """Register throwaway handlers on the shared queue for one test."""
+    def register(name, fn):
+        monkeypatch.setitem(jobs.tasks, name, fn)
+    return register
+
+
+def enqueue(app, name, **payload):
+    with app.app_context():
+        job = jobs.enqueue(name, **payload)
+        db.session.commit()
+        return job.id
+
+
+def job_row(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+
+def test_job_commits_with_handler_writes(app, tasks):
+    tasks('test.add_department', lambda title: db.session.add(Department(name=title)))
+    job_id = enqueue(app, 'test.add_department', title='Bakery')
+    with app.app_context():
+        assert jobs.run_pending() == 1
+        assert db.session.execute(select(Department.name)).scalars().all() == ['Bakery']
+    assert job_row(app, job_id).status == 'done'
+
+
+def test_failed_job_retries_then_dead_letters(make_app, tasks):
+    app = make_app(JOB_MAX_ATTEMPTS=2, JOB_BACKOFF_BASE=0)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    tasks('test.fail', fail)
+    job_id = enqueue(app, 'test.fail')
+    with app.app_context():
+        jobs.run_pending(limit=1)
+    job = job_row(app, job_id)
+    assert (job.status, job.attempts, job.last_error) == ('queued', 1, 'RuntimeError: boom')
+    with app.app_context():
+        jobs.run_pending()
+    job = job_row(app, job_id)
+    assert (job.status, job.attempts, len(calls)) == ('dead', 2, 2)
+
+    # Retrying gives it a fresh set of attempts
+    with app.app_context():
+        assert jobs.retry(job_id) == 1
+        db.session.commit()
+    job = job_row(app, job_id)
+    assert (job.status, job.attempts) == ('queued', 0)
+
+
+def test_run_that_lost_its_claim_is_discarded(app, tasks):
+    def reclaimed_meanwhile():
+        # Past JOB_TIMEOUT another worker requeued and claimed the job again
+        with db.engine.begin() as conn:
+            conn.execute(update(Job).where(Job.status == 'running').values(attempts=Job.attempts + 1))
+        db.session.add(Department(name='twice'))
+
+    tasks('test.slow', reclaimed_meanwhile)
+    job_id = enqueue(app, 'test.slow')
+    with app.app_context():
+        assert jobs.run(jobs.claim()) is False
+        assert db.session.query(Department).count() == 0
+    job = job_row(app, job_id)
+    assert (job.status, job.attempts) == ('running', 2)
+
+
+@pytest.mark.parametrize('cursor', [encode_cursor(None), encode_cursor('5'), encode_cursor(True), encode_cursor()])
+def test_list_jobs_rejects_invalid_cursor(client, admin_headers, cursor):
+    assert client.get('/admin/jobs', query_string={'cursor': cursor}, headers=admin_headers).status_code == 400
+
+
+def test_list_jobs_pages_with_cursor(app, client, admin_headers, tasks):
+    tasks('test.noop', lambda: None)
+    ids = [enqueue(app, 'test.noop') for _ in range(3)]
+    first = client.get('/admin/jobs?limit=2', headers=admin_headers).get_json()
+    second = client.get('/admin/jobs', query_string={'limit': 2, 'cursor': first['next_cursor']},
+                        headers=admin_headers).get_json()
+    assert [job['id'] for job in first['items'] + second['items']] == ids[::-1]
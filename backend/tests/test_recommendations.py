@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Department, Product, ProductPair
+
+
+@pytest.fixture
+def products(app):
+    """Ids of four untracked-stock products: a, b, c, d."""
+    with app.app_context():
+        dept = Department(name='Pantry')
+        db.session.add(dept)
+        db.session.flush()
+        rows = {name: Product(name=name, price_cents=100, department_id=dept.id) for name in 'abcd'}
+        db.session.add_all(rows.values())
+        db.session.commit()
+        return {name: product.id for name, product in rows.items()}
+
+
+def buy(client, headers, *product_ids):
+    for product_id in product_ids:
+        client.post('/cart', json={'product_id': product_id}, headers=headers)
+    assert client.post('/orders/checkout', headers=headers).status_code == 201
+
+
+def pair_counts(app):
+    with app.app_context():
+        return {(a, b): n for a, b, n in db.session.execute(
+            select(ProductPair.product_id, ProductPair.other_id, ProductPair.orders))}
+
+
+def related(client, product_id):
+    return [item['id'] for item in client.get(f'/products/{product_id}/related').get_json()['items']]
+
+
+def test_related_products_from_baskets(app, client, user_headers, products):
+    a, b, c, d = products.values()
+    buy(client, user_headers, a, b)
+    buy(client, user_headers, a, b, c)
+    buy(client, user_headers, d)
+    with app.app_context():
+        jobs.run_pending()
+    assert related(client, a) == [b, c]
+    assert related(client, d) == []
+
+    # For a cart: partners of its products, leaving out what is already in it
+    client.post('/cart', json={'product_id': a}, headers=user_headers)
+    items = client.get('/cart/recommendations', headers=user_headers).get_json()['items']
+    assert [item['id'] for item in items] == [b, c]
+
+
+def test_rebuild_counts_baskets_whose_jobs_are_queued_once(app, client, user_headers, products):
+    a, b = products['a'], products['b']
+    buy(client, user_headers, a, b)
+    with app.app_context():
+        jobs.run_pending()
+    # This basket's record_basket job is still queued when the rebuild runs
+    buy(client, user_headers, a, b)
+
+    result = app.test_cli_runner().invoke(args=['recommendations', 'rebuild'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        jobs.run_pending()
+    assert pair_counts(app) == {(a, b): 2, (b, a): 2}
@@ -0,0 +1,41 @@
+from sqlalchemy import update
+from app.extensions import db
+from app.jobs import jobs
+from app.models import Purchase
+from app.reconcile import reconcile_orders
+
+
+def buy(client, headers, product_id, quantity=1):
+    client.post('/cart', json={'product_id': product_id, 'quantity': quantity}, headers=headers)
+    assert client.post('/orders/checkout', headers=headers).status_code == 201
+
+
+def test_orders_and_rollups_reconcile(app, client, user_headers, catalog):
+    buy(client, user_headers, catalog['milk'], 2)
+    buy(client, user_headers, catalog['bread'])
+    with app.app_context():
+        jobs.run_pending()
+    result = app.test_cli_runner().invoke(args=['money', 'reconcile'])
+    assert result.exit_code == 0, result.output
+    assert 'All order totals reconcile' in result.output
+
+
+def test_fix_overwrites_mismatched_totals(app, client, user_headers, catalog):
+    for _ in range(3):
+        buy(client, user_headers, catalog['milk'])
+    with app.app_context():
+        jobs.run_pending()
+        first, _, last = db.session.execute(db.select(Purchase.id).order_by(Purchase.id)).scalars().all()
+        db.session.execute(update(Purchase).where(Purchase.id.in_([first, last])).values(total_cents=1, item_count=5))
+        db.session.commit()
+
+        # One order per batch: mismatches in the first and last batches are both found
+        assert [(m[0], m[2], m[3], m[4], m[5]) for m in reconcile_orders(batch_size=1)] == \
+            [(first, 1, 199, 5, 1), (last, 1, 199, 5, 1)]
+
+    result = app.test_cli_runner().invoke(args=['money', 'reconcile'])
+    assert result.exit_code != 0 and '2 orders and 0 days do not reconcile' in result.output
+    result = app.test_cli_runner().invoke(args=['money', 'reconcile', '--fix'])
+    assert result.exit_code == 0 and 'Fixed 2 orders' in result.output
+    with app.app_context():
+        assert list(reconcile_orders()) == []
@@ -0,0 +1,47 @@
+from sqlalchemy import text
+from app.changes import catalog_changes
+from app.extensions import db
+from app.models import Product
+from app.search import search
+
+
+def rename_without_indexing(app, product_id, name):
+    """An admin write that crashed between its commit and the FTS update."""
+    with app.app_context():
+        db.session.get(Product, product_id).name = name
+        catalog_changes.record('product', 'updated', [product_id])
+        db.session.commit()
+
+
+def found(client, q):
+    return [item['id'] for item in client.get(f'/products/search?q={q}').get_json()['items']]
+
+
+def test_fts_index_catches_up_from_change_log(make_app, catalog):
+    app = make_app(SEARCH_BACKEND='fts5', CATALOG_CHANGES_GAP_SECONDS=0, CATALOG_CHANGES_SYNC_INTERVAL=0)
+    client = app.test_client()
+    assert found(client, 'milk') == [catalog['milk']]
+
+    rename_without_indexing(app, catalog['milk'], 'oat drink')
+    assert found(client, 'oat') == [catalog['milk']]
+    assert found(client, 'milk') == []
+
+
+def test_new_process_syncs_index_left_behind(make_app, catalog):
+    first = make_app(SEARCH_BACKEND='fts5', CATALOG_CHANGES_GAP_SECONDS=0)
+    assert found(first.test_client(), 'bread') == [catalog['bread']]
+    rename_without_indexing(first, catalog['bread'], 'sourdough')
+
+    # Same row count as before, so only the recorded version shows the index is behind
+    second = make_app(SEARCH_BACKEND='fts5', CATALOG_CHANGES_GAP_SECONDS=0)
+    assert found(second.test_client(), 'sourdough') == [catalog['bread']]
+
+
+def test_fts_index_without_version_is_stale(make_app, catalog):
+    app = make_app(SEARCH_BACKEND='fts5')
+    with app.app_context():
+        index = search.backend
+        assert not index.is_stale()
+        db.session.execute(text(f"DELETE FROM {index.state_table}"))
+        db.session.commit()
+        assert index.is_stale()
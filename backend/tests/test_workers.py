@@ -0,0 +1,70 @@
+"""Per-process catalog copies must follow writes made by other workers (two apps on one database)."""
+import time
+from app.search import search
+from app.warmup import warmup
+from tests.conftest import auth_headers
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_snapshot_retired_by_other_workers_write(make_app, catalog):
+    # `catalog` seeded the shared database through the `app` fixture
+    writer = make_app()
+    reader = make_app(CATALOG_CHANGES_SYNC_INTERVAL=0)
+    warmup.run(reader)
+    with reader.app_context():
+        built = warmup.snapshot()
+        assert built is not None and built.products[catalog['milk']].price == 199
+
+    r = writer.test_client().put(f"/admin/products/{catalog['milk']}", json={'price': 7.77},
+                                 headers=auth_headers(writer, 'admin@test.com', is_admin=True))
+    assert r.status_code == 200
+
+    state = reader.extensions['warmup']
+    with reader.app_context():
+        # The change log moves the reader's cache version, which retires the snapshot
+        assert warmup.snapshot() is None
+        wait_for(lambda: state.snapshot is not built and not state.rebuilding)
+        assert warmup.snapshot() is state.snapshot
+        assert state.snapshot.products[catalog['milk']].price == 777
+
+
+def test_snapshot_kept_while_catalog_unchanged(make_app, catalog):
+    reader = make_app(CATALOG_CHANGES_SYNC_INTERVAL=0)
+    warmup.run(reader)
+    with reader.app_context():
+        built = warmup.snapshot()
+        assert built is not None
+        assert warmup.snapshot() is built
+
+
+def test_python_search_index_follows_other_workers(make_app, catalog):
+    writer = make_app(SEARCH_BACKEND='python')
+    reader = make_app(SEARCH_BACKEND='python', CATALOG_CHANGES_SYNC_INTERVAL=0, CACHE_BACKEND='null')
+    client = reader.test_client()
+
+    def names(q):
+        return sorted(item['name'] for item in client.get('/products/search', query_string={'q': q}).get_json()['items'])
+
+    assert names('milk') == ['milk']
+    with reader.app_context():
+        assert search.backend.name == 'python'
+
+    admin = writer.test_client()
+    headers = auth_headers(writer, 'admin@test.com', is_admin=True)
+    r = admin.post('/admin/products', json={'name': 'oat milk', 'price': 2.5, 'department_id': catalog['department']},
+                   headers=headers)
+    assert r.status_code == 201
+    assert admin.put(f"/admin/departments/{catalog['department']}", json={'name': 'Dairy'},
+                     headers=headers).status_code == 200
+    assert admin.delete(f"/admin/products/{catalog['bread']}", headers=headers).status_code in (200, 204)
+
+    assert names('milk') == ['milk', 'oat milk']
+    assert names('dairy') == ['milk', 'oat milk']
+    assert names('grocery') == []
+    assert names('bread') == []
@@ -0,0 +1,4 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py (see README, Production)."""
+from app import create_app
+
+app = create_app()
@@ -4,7 +4,7 @@ import { ShoppingCart, User, LogOut, LayoutGrid, Sun, Moon, Plus, Minus, Trash2
 import { useAuth } from '../context/AuthContext';
 import { useCart } from '../context/CartContext';
 import { useTheme } from '../context/ThemeContext';
-import { cartApi } from '../services/api';
+import { cartApi, productImage } from '../services/api';
 
 const Navbar = () => {
   const { user, logout } = useAuth();
@@ -132,7 +132,7 @@ const Navbar = () => {
                         <div key={item.id} className={`p-3 border-b border-gray-50 dark:border-gray-700 last:border-0 hover:bg-gray-50 dark:hover:bg-gray-700/30 transition-opacity ${updating[item.id] ? 'opacity-50' : ''}`}>
                           <div className="flex items-center gap-3">
                             <img 
-                              src={item.image_url || 'https://placehold.co/60x60?text=Item'} 
+                              src={productImage(item, 'thumb', 'https://placehold.co/60x60?text=Item')} 
                               alt={item.product_name}
                               className="w-12 h-12 rounded-lg object-cover bg-gray-100 dark:bg-gray-700 flex-shrink-0"
                             />
@@ -18,15 +18,11 @@ export const CartProvider = ({ children }) => {
       return;
     }
     try {
-      const res = await cartApi.getCart();
-      const items = res.data || [];
-      setCartItems(items);
-      // Sum up all quantities for cart count
-      const totalItems = items.reduce((sum, item) => sum + item.quantity, 0);
-      setCartCount(totalItems);
-      // Calculate total price
-      const total = items.reduce((sum, item) => sum + item.subtotal, 0);
-      setCartTotal(total);
+      // Totals come from the server (summed in integer cents), not from float subtotals
+      const [res, summary] = await Promise.all([cartApi.getCart(), cartApi.getSummary()]);
+      setCartItems(res.data || []);
+      setCartCount(summary.data.units);
+      setCartTotal(summary.data.total);
     } catch (err) {
       console.error('Failed to fetch cart', err);
       setCartItems([]);
@@ -35,12 +31,19 @@ export const CartProvider = ({ children }) => {
     }
   }, [user]);
 
+  // PATCH /cart already returns the new cart with server-side totals
+  const syncCart = useCallback(({ items, units, total }) => {
+    setCartItems(items);
+    setCartCount(units);
+    setCartTotal(total);
+  }, []);
+
   useEffect(() => {
     refreshCartCount();
   }, [refreshCartCount]);
 
   return (
-    <CartContext.Provider value={{ cartItems, cartCount, cartTotal, refreshCartCount }}>
+    <CartContext.Provider value={{ cartItems, cartCount, cartTotal, refreshCartCount, syncCart }}>
       {children}
     </CartContext.Provider>
   );
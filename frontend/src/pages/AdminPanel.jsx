@@ -1,14 +1,16 @@
 import React, { useState, useEffect } from 'react';
-import api from '../services/api';
+import api, { adminApi } from '../services/api';
 import { Plus, Edit, Trash2, Package, FolderTree, X } from 'lucide-react';
 
 const AdminPanel = () => {
   const [activeTab, setActiveTab] = useState('products');
   const [items, setItems] = useState([]);
   const [departments, setDepartments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showModal, setShowModal] = useState(false);
   const [editingItem, setEditingItem] = useState(null);
+  const [imageFile, setImageFile] = useState(null);
 
   // Form states
   const [formData, setFormData] = useState({
@@ -26,12 +28,14 @@ const AdminPanel = () => {
     try {
       setLoading(true);
       setItems([]); // Clear items immediately to prevent type mismatch during tab switch
+      setNextCursor(null);
       if (activeTab === 'products') {
         const [prodRes, deptRes] = await Promise.all([
-          api.get('/products'),
+          api.get('/products', { params: { limit: 200 } }),
           api.get('/departments')
         ]);
-        setItems(prodRes.data);
+        setItems(prodRes.data.items);
+        setNextCursor(prodRes.data.next_cursor);
         setDepartments(deptRes.data);
       } else {
         const res = await api.get('/departments');
@@ -44,7 +48,18 @@ const AdminPanel = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    try {
+      const res = await api.get('/products', { params: { limit: 200, cursor: nextCursor } });
+      setItems(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error('Failed to fetch more products', err);
+    }
+  };
+
   const handleOpenModal = (item = null) => {
+    setImageFile(null);
     if (item) {
       setEditingItem(item);
       setFormData({
@@ -65,10 +80,12 @@ const AdminPanel = () => {
     const endpoint = activeTab === 'products' ? '/admin/products' : '/admin/departments';
     
     try {
-      if (editingItem) {
-        await api.put(`${endpoint}/${editingItem.id}`, formData);
-      } else {
-        await api.post(endpoint, formData);
+      const res = editingItem
+        ? await api.put(`${endpoint}/${editingItem.id}`, formData)
+        : await api.post(endpoint, formData);
+      // Stored locally with thumbnails, served from /images/<id>/<size>
+      if (activeTab === 'products' && imageFile) {
+        await adminApi.uploadImage(res.data.id, imageFile);
       }
       setShowModal(false);
       fetchData();
@@ -180,6 +197,16 @@ const AdminPanel = () => {
             </tbody>
           </table>
         </div>
+        {activeTab === 'products' && nextCursor && !loading && (
+          <div className="p-6 border-t border-gray-50 dark:border-gray-700 text-center">
+            <button
+              onClick={handleLoadMore}
+              className="text-green-600 dark:text-green-400 font-bold hover:underline"
+            >
+              Load more products
+            </button>
+          </div>
+        )}
       </div>
 
       {/* Modal */}
@@ -242,6 +269,15 @@ const AdminPanel = () => {
                       placeholder="https://..."
                     />
                   </div>
+                  <div>
+                    <label className="block text-sm font-bold text-gray-700 dark:text-gray-300 mb-2 uppercase tracking-wide">Upload Image</label>
+                    <input 
+                      type="file"
+                      accept="image/jpeg,image/png,image/gif,image/webp,image/avif"
+                      onChange={e => setImageFile(e.target.files[0] || null)}
+                      className="w-full text-sm text-gray-600 dark:text-gray-300"
+                    />
+                  </div>
                 </>
               )}
 
@@ -1,14 +1,15 @@
 import React, { useState, useEffect } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
-import { cartApi } from '../services/api';
+import { cartApi, productImage } from '../services/api';
 import { useCart } from '../context/CartContext';
 import { Trash2, Plus, Minus, ArrowRight, ShoppingBag } from 'lucide-react';
 
 const Cart = () => {
   const [cartItems, setCartItems] = useState([]);
+  const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
-  const { refreshCartCount } = useCart();
+  const { syncCart } = useCart();
 
   useEffect(() => {
     fetchCart();
@@ -17,8 +18,10 @@ const Cart = () => {
   const fetchCart = async () => {
     try {
       setLoading(true);
-      const res = await cartApi.getCart();
+      // The total is summed by the server in integer cents
+      const [res, summary] = await Promise.all([cartApi.getCart(), cartApi.getSummary()]);
       setCartItems(res.data);
+      setTotal(summary.data.total);
     } catch (err) {
       console.error('Failed to fetch cart', err);
     } finally {
@@ -26,32 +29,26 @@ const Cart = () => {
     }
   };
 
-  const updateQuantity = async (itemId, currentQty, delta) => {
-    const newQty = currentQty + delta;
-    if (newQty < 1) return;
-    
+  // One PATCH updates the cart and returns it with totals computed by the server
+  const applyOperations = async (operations) => {
     try {
-      await cartApi.updateQuantity(itemId, newQty);
-      setCartItems(prev => prev.map(item => 
-        item.id === itemId ? { ...item, quantity: newQty, subtotal: item.price * newQty } : item
-      ));
-      refreshCartCount(); // Update navbar count
+      const res = await cartApi.patchCart(operations);
+      setCartItems(res.data.items);
+      setTotal(res.data.total);
+      syncCart(res.data); // Update navbar count
     } catch (err) {
-      console.error('Failed to update quantity', err);
+      console.error('Failed to update cart', err);
     }
   };
 
-  const removeItem = async (itemId) => {
-    try {
-      await cartApi.removeItem(itemId);
-      setCartItems(prev => prev.filter(item => item.id !== itemId));
-      refreshCartCount();
-    } catch (err) {
-      console.error('Failed to remove item', err);
-    }
+  const updateQuantity = (productId, currentQty, delta) => {
+    if (currentQty + delta < 1) return;
+    applyOperations([{ op: 'add', product_id: productId, quantity: delta }]);
   };
 
-  const total = cartItems.reduce((sum, item) => sum + item.subtotal, 0);
+  const removeItem = (productId) => {
+    applyOperations([{ op: 'remove', product_id: productId }]);
+  };
 
   if (loading) return <div className="text-center py-20 text-gray-500 dark:text-gray-400">Loading your cart...</div>;
 
@@ -85,7 +82,7 @@ const Cart = () => {
             <div key={item.id} className="bg-white dark:bg-gray-800 p-4 md:p-6 rounded-2xl border border-gray-100 dark:border-gray-700 flex items-center gap-4 md:gap-6 hover:shadow-lg transition-all">
               <div className="w-24 h-24 bg-gray-50 dark:bg-gray-700 rounded-xl overflow-hidden flex-shrink-0">
                 <img 
-                  src={item.image_url || 'https://placehold.co/400x400?text=Product'} 
+                  src={productImage(item, 'thumb', 'https://placehold.co/400x400?text=Product')} 
                   alt={item.product_name} 
                   className="w-full h-full object-cover"
                 />
@@ -98,21 +95,21 @@ const Cart = () => {
                 <div className="flex items-center gap-4 mt-3">
                   <div className="flex items-center bg-gray-50 dark:bg-gray-700 rounded-lg p-1">
                     <button 
-                      onClick={() => updateQuantity(item.id, item.quantity, -1)}
+                      onClick={() => updateQuantity(item.product_id, item.quantity, -1)}
                       className="p-1 hover:bg-white dark:hover:bg-gray-600 rounded-md transition-colors text-gray-500 dark:text-gray-400"
                     >
                       <Minus size={16} />
                     </button>
                     <span className="w-8 text-center font-bold text-gray-700 dark:text-gray-200">{item.quantity}</span>
                     <button 
-                      onClick={() => updateQuantity(item.id, item.quantity, 1)}
+                      onClick={() => updateQuantity(item.product_id, item.quantity, 1)}
                       className="p-1 hover:bg-white dark:hover:bg-gray-600 rounded-md transition-colors text-gray-500 dark:text-gray-400"
                     >
                       <Plus size={16} />
                     </button>
                   </div>
                   <button 
-                    onClick={() => removeItem(item.id)}
+                    onClick={() => removeItem(item.product_id)}
                     className="text-gray-400 hover:text-red-500 dark:hover:text-red-400 transition-colors p-1"
                   >
                     <Trash2 size={20} />
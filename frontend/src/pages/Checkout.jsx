@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { cartApi, orderApi } from '../services/api';
 import { useCart } from '../context/CartContext';
@@ -6,9 +6,12 @@ import { CheckCircle, Package, ArrowLeft, CreditCard } from 'lucide-react';
 
 const Checkout = () => {
   const [cartItems, setCartItems] = useState([]);
+  const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(true);
   const [processing, setProcessing] = useState(false);
   const [orderComplete, setOrderComplete] = useState(null);
+  // One key per checkout attempt - double clicks and retries hit the same order
+  const idempotencyKeyRef = useRef(crypto.randomUUID());
   const navigate = useNavigate();
   const { refreshCartCount } = useCart();
 
@@ -18,12 +21,13 @@ const Checkout = () => {
 
   const fetchCart = async () => {
     try {
-      const res = await cartApi.getCart();
+      const [res, summary] = await Promise.all([cartApi.getCart(), cartApi.getSummary()]);
       if (res.data.length === 0 && !orderComplete) {
         navigate('/cart');
         return;
       }
       setCartItems(res.data);
+      setTotal(summary.data.total);
     } catch (err) {
       console.error('Failed to fetch cart', err);
     } finally {
@@ -34,7 +38,7 @@ const Checkout = () => {
   const handleConfirmPurchase = async () => {
     try {
       setProcessing(true);
-      const res = await orderApi.checkout();
+      const res = await orderApi.checkout(idempotencyKeyRef.current);
       setOrderComplete(res.data);
       refreshCartCount();
     } catch (err) {
@@ -44,8 +48,6 @@ const Checkout = () => {
     }
   };
 
-  const total = cartItems.reduce((sum, item) => sum + item.subtotal, 0);
-
   if (loading) return <div className="text-center py-20 text-gray-500 dark:text-gray-400">Preparing checkout...</div>;
 
   if (orderComplete) {
@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { productApi, cartApi } from '../services/api';
+import { productApi, cartApi, productImage } from '../services/api';
 import { useAuth } from '../context/AuthContext';
 import { useCart } from '../context/CartContext';
 import { ShoppingCart, Plus, Search, Check } from 'lucide-react';
@@ -7,16 +7,23 @@ import { ShoppingCart, Plus, Search, Check } from 'lucide-react';
 const Home = () => {
   const [departments, setDepartments] = useState([]);
   const [products, setProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [filteredProducts, setFilteredProducts] = useState([]);
   const [searchTerm, setSearchTerm] = useState('');
   const [selectedDept, setSelectedDept] = useState(null);
   const [loading, setLoading] = useState(true);
   const [cartLoading, setCartLoading] = useState({});
+  // Catalog change version the loaded lists are current as of (see the change stream below)
+  const [catalogVersion, setCatalogVersion] = useState(null);
   const [addedToasts, setAddedToasts] = useState([]);
   const addedToastTimeoutsRef = useRef([]);
   const { user } = useAuth();
   const { refreshCartCount } = useCart();
   const shopSectionRef = useRef(null);
+  // Read by the change stream handler, which outlives renders
+  const listRef = useRef({ selectedDept: null, complete: false });
+  listRef.current = { selectedDept, complete: !nextCursor };
 
   const scrollToShop = () => {
     shopSectionRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -27,22 +34,41 @@ const Home = () => {
   }, []);
 
   useEffect(() => {
-    const filtered = products.filter(p => 
-      p.name.toLowerCase().includes(searchTerm.toLowerCase())
-    );
-    setFilteredProducts(filtered);
-  }, [searchTerm, products]);
+    const term = searchTerm.trim();
+    if (!term) {
+      setFilteredProducts(products);
+      return;
+    }
+    // Debounce typeahead - the server does the matching and ranking
+    let cancelled = false;
+    const timeoutId = setTimeout(async () => {
+      try {
+        const res = await productApi.searchProducts(term, { department_id: selectedDept || undefined });
+        if (!cancelled) setFilteredProducts(res.data.items);
+      } catch (err) {
+        console.error('Failed to search products', err);
+      }
+    }, 200);
+    return () => {
+      cancelled = true;
+      clearTimeout(timeoutId);
+    };
+  }, [searchTerm, products, selectedDept]);
 
   const fetchInitialData = async () => {
     try {
       setLoading(true);
+      // Version first: a change made while the lists load is then replayed, not missed
+      const versionRes = await productApi.getChanges();
       const [deptsRes, productsRes] = await Promise.all([
         productApi.getDepartments(),
         productApi.getProducts()
       ]);
       setDepartments(deptsRes.data);
-      setProducts(productsRes.data);
-      setFilteredProducts(productsRes.data);
+      setProducts(productsRes.data.items);
+      setFilteredProducts(productsRes.data.items);
+      setNextCursor(productsRes.data.next_cursor);
+      setCatalogVersion(versionRes.data.version);
     } catch (err) {
       console.error('Failed to fetch data', err);
     } finally {
@@ -50,6 +76,60 @@ const Home = () => {
     }
   };
 
+  // Keep the loaded catalog current from the change stream instead of refetching it
+  useEffect(() => {
+    if (catalogVersion === null) return;
+    const apply = ({ type, action, id, data }) => {
+      if (type === 'department') {
+        setDepartments(prev => action === 'deleted'
+          ? prev.filter(d => d.id !== id)
+          : prev.some(d => d.id === id) ? prev.map(d => (d.id === id ? data : d)) : [...prev, data]);
+        return;
+      }
+      const { selectedDept, complete } = listRef.current;
+      setProducts(prev => {
+        if (action === 'deleted') return prev.filter(p => p.id !== id);
+        if (prev.some(p => p.id === id)) return prev.map(p => (p.id === id ? data : p));
+        // New products go at the end (id order), but only once the whole list is loaded
+        return complete && (!selectedDept || data.department_id === selectedDept) ? [...prev, data] : prev;
+      });
+    };
+
+    let since = catalogVersion;
+    let pollId = null;
+    const source = new EventSource(productApi.changeStreamUrl(catalogVersion));
+    source.onmessage = (e) => {
+      const change = JSON.parse(e.data);
+      since = change.version;
+      apply(change);
+    };
+    // Too far behind the change log: load the catalog again
+    source.addEventListener('reset', () => {
+      source.close();
+      fetchInitialData();
+    });
+    // Refused (503, too many streams) or unsupported: catch up with the delta endpoint instead
+    source.onerror = () => {
+      if (source.readyState !== EventSource.CLOSED || pollId) return;
+      pollId = setInterval(async () => {
+        try {
+          const res = await productApi.getChanges(since);
+          res.data.changes.forEach(apply);
+          since = res.data.version;
+        } catch (err) {
+          if (err.response?.status === 410) {
+            clearInterval(pollId);
+            fetchInitialData();
+          }
+        }
+      }, 30000);
+    };
+    return () => {
+      source.close();
+      clearInterval(pollId);
+    };
+  }, [catalogVersion]);
+
   const handleDeptSelect = async (deptId) => {
     // Toggle: clicking same department again shows all products
     const newDeptId = selectedDept === deptId ? null : deptId;
@@ -64,8 +144,9 @@ const Home = () => {
       // FIX: Removed the "if (products.length === 0) setLoading(true)" 
       // This was causing flicker when switching away from empty departments (Frozen Foods)
       
-      const res = await productApi.getProducts(newDeptId);
-      setProducts(res.data);
+      const res = await productApi.getProducts({ department_id: newDeptId || undefined });
+      setProducts(res.data.items);
+      setNextCursor(res.data.next_cursor);
       
       // After products update, restore scroll position if page is tall enough
       requestAnimationFrame(() => {
@@ -80,6 +161,23 @@ const Home = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await productApi.getProducts({
+        department_id: selectedDept || undefined,
+        cursor: nextCursor
+      });
+      setProducts(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error('Failed to fetch more products', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAddToCart = async (productId) => {
     if (!user) {
       alert('Please login to add items to cart');
@@ -212,7 +310,7 @@ const Home = () => {
               <div key={product.id} className="group bg-white dark:bg-gray-800 rounded-2xl border border-gray-100 dark:border-gray-700 overflow-hidden hover:shadow-xl hover:border-green-100 dark:hover:border-green-900 transition-all flex flex-col">
                 <div className="aspect-square relative overflow-hidden bg-gray-50 dark:bg-gray-900">
                   <img 
-                    src={product.image_url || 'https://placehold.co/400x400?text=Product'} 
+                    src={productImage(product, 'card', 'https://placehold.co/400x400?text=Product')} 
                     alt={product.name}
                     className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-500"
                   />
@@ -256,6 +354,18 @@ const Home = () => {
             <p className="text-gray-500 dark:text-gray-400 mt-2">Try searching for something else or selecting a different department</p>
           </div>
         )}
+
+        {!loading && nextCursor && !searchTerm.trim() && (
+          <div className="flex justify-center mt-10">
+            <button
+              onClick={handleLoadMore}
+              disabled={loadingMore}
+              className="bg-white dark:bg-gray-800 text-green-700 dark:text-green-300 font-bold px-8 py-3 rounded-xl border-2 border-green-100 dark:border-green-900 hover:bg-green-50 dark:hover:bg-green-900/20 transition-all disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </section>
 
       {/* Added to cart toasts – one per add, stack upward */}
@@ -5,6 +5,8 @@ import { History, Calendar, Tag, ChevronDown, ChevronUp, PackageCheck } from 'lu
 
 const Profile = () => {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [expandedOrder, setExpandedOrder] = useState(null);
   const [orderDetails, setOrderDetails] = useState({});
@@ -17,7 +19,8 @@ const Profile = () => {
   const fetchHistory = async () => {
     try {
       const res = await orderApi.getHistory();
-      setOrders(res.data);
+      setOrders(res.data.items);
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       console.error('Failed to fetch order history', err);
     } finally {
@@ -25,6 +28,20 @@ const Profile = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await orderApi.getHistory({ cursor: nextCursor });
+      setOrders(prev => [...prev, ...res.data.items]);
+      setNextCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error('Failed to fetch more orders', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const toggleOrder = async (code) => {
     if (expandedOrder === code) {
       setExpandedOrder(null);
@@ -78,6 +95,7 @@ const Profile = () => {
                   <div>
                     <p className="font-mono text-xs font-bold text-gray-400 dark:text-gray-500 uppercase tracking-widest">Order Code</p>
                     <p className="font-bold text-gray-800 dark:text-gray-100">{order.unique_code.substring(0, 8).toUpperCase()}</p>
+                    <p className="text-xs text-gray-500 dark:text-gray-400">{order.item_count} {order.item_count === 1 ? 'item' : 'items'}</p>
                   </div>
                 </div>
 
@@ -127,6 +145,18 @@ const Profile = () => {
               )}
             </div>
           ))}
+
+          {nextCursor && (
+            <div className="flex justify-center mt-10">
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="bg-white dark:bg-gray-800 text-green-700 dark:text-green-300 font-bold px-8 py-3 rounded-xl border-2 border-green-100 dark:border-green-900 hover:bg-green-50 dark:hover:bg-green-900/20 transition-all disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load More'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
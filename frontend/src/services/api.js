@@ -22,8 +22,35 @@ export const authApi = {
 
 export const productApi = {
   getDepartments: () => api.get('/departments'),
-  getProducts: (deptId) => api.get('/products', { params: { department_id: deptId } }),
+  // Paginated: pass { department_id, sort, cursor, limit }; response is { items, next_cursor }
+  getProducts: (params = {}) => api.get('/products', { params }),
+  searchProducts: (q, params = {}) => api.get('/products/search', { params: { q, ...params } }),
   getProduct: (id) => api.get(`/products/${id}`),
+  // Catalog changes after a version: { version, changes, has_more }; without `since` only the current version
+  getChanges: (since, params = {}) => api.get('/products/changes', { params: { since, ...params } }),
+  // Server-Sent Events for the same changes (EventSource resumes from the last event id by itself)
+  changeStreamUrl: (since) => `${api.defaults.baseURL}/products/changes/stream?since=${since}`,
+  // Frequently bought together; response is { items }
+  getRelated: (id, limit) => api.get(`/products/${id}/related`, { params: { limit } }),
+};
+
+export const adminApi = {
+  // Multipart upload; the server stores the original and generates the thumbnails
+  uploadImage: (productId, file) => {
+    const form = new FormData();
+    form.append('image', file);
+    return api.post(`/admin/products/${productId}/image`, form);
+  },
+};
+
+// Locally stored thumbnail (content-hashed URL, cached for a year) when the product has one,
+// otherwise its external image_url. size: 'thumb' (160px), 'card' (400px), 'large' (1200px)
+export const productImage = (item, size, placeholder) => {
+  if (item.image_hash) {
+    const productId = item.product_id ?? item.id;
+    return `${api.defaults.baseURL}/images/${productId}/${size}?v=${item.image_hash}`;
+  }
+  return item.image_url || placeholder;
 };
 
 export const cartApi = {
@@ -32,11 +59,18 @@ export const cartApi = {
   updateQuantity: (itemId, quantity) => api.put(`/cart/${itemId}`, { quantity }),
   removeItem: (itemId) => api.delete(`/cart/${itemId}`),
   clearCart: () => api.delete('/cart'),
+  // Batch of { op: 'add' | 'set' | 'remove', product_id, quantity }; returns { items, lines, units, total }
+  patchCart: (operations) => api.patch('/cart', { operations }),
+  getSummary: () => api.get('/cart/summary'),
+  getRecommendations: (limit) => api.get('/cart/recommendations', { params: { limit } }),
 };
 
 export const orderApi = {
-  checkout: () => api.post('/orders/checkout'),
-  getHistory: () => api.get('/orders'),
+  // Reuse the same key when retrying so the server never creates a duplicate order
+  checkout: (idempotencyKey) => api.post('/orders/checkout', null, {
+    headers: { 'Idempotency-Key': idempotencyKey },
+  }),
+  getHistory: (params = {}) => api.get('/orders', { params }),
   getOrderDetails: (code) => api.get(`/orders/${code}`),
 };
 